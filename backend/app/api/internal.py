@@ -0,0 +1,62 @@
+from typing import Dict
+
+from fastapi import APIRouter, Request
+
+from app.config import settings
+from app.database import async_engine, async_replica_engine, engine, replica_engine
+from app.services.calc_timing import calc_timing_histogram
+from app.services.db_pool import (
+    async_pool_wait_stats,
+    async_replica_pool_wait_stats,
+    engine_pool_metrics,
+    pool_wait_stats,
+    replica_pool_wait_stats,
+)
+from app.services.product_configurator import product_configurator_cache
+
+router = APIRouter(prefix="/internal", tags=["Internal"])
+
+
+@router.get("/metrics/calc-timing")
+def get_calc_timing_metrics() -> Dict:
+    """Per-phase duration histograms (milliseconds) and SQL statement counts of recorded quote calculations."""
+    return {
+        "enabled": settings.CALC_TIMING_ENABLED,
+        "phases": calc_timing_histogram.snapshot(),
+    }
+
+
+@router.delete("/metrics/calc-timing", status_code=204)
+def reset_calc_timing_metrics():
+    """Clears the recorded calculation timings."""
+    calc_timing_histogram.reset()
+
+
+@router.get("/metrics/configurator-cache")
+def get_configurator_cache_metrics() -> Dict:
+    """Size and hit/miss counters of the product configurator cache."""
+    return product_configurator_cache.stats()
+
+
+@router.get("/metrics/db-pool")
+def get_db_pool_metrics() -> Dict:
+    """
+    Connections checked out / idle / in overflow right now, and how long checkouts waited
+    for one, for the sync pool (CRUD routers), the async pool (/quote-process) and, when
+    a read replica is configured, its sync and async pools.
+    """
+    return engine_pool_metrics(engine, async_engine, replica_engine, async_replica_engine)
+
+
+@router.delete("/metrics/db-pool", status_code=204)
+def reset_db_pool_metrics():
+    """Clears the checkout wait counters."""
+    for wait_stats in (pool_wait_stats, async_pool_wait_stats, replica_pool_wait_stats, async_replica_pool_wait_stats):
+        wait_stats.reset()
+
+
+@router.get("/catalog")
+def get_catalog_state(request: Request) -> Dict:
+    """Version of the in-process catalog snapshots; it grows with every applied change notification."""
+    handler = getattr(request.app.state, "catalog_handler", None)
+    return {"version": handler.version if handler else None}
@@ -4,6 +4,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query, Path
 from sqlmodel import Session, select, SQLModel
 from app.database import get_session
 from app.models import Material, MaterialBase, UnitType
+from app.services.pricing_plan import pricing_plan_cache
 
 router = APIRouter()
 
@@ -50,4 +51,5 @@ def delete_material(
         raise HTTPException(status_code=404, detail="Material not found")
     session.delete(material)
     session.commit()
+    pricing_plan_cache.clear()
     return {"message": "Material deleted successfully"}
@@ -4,6 +4,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query, Path
 from sqlmodel import Session, select, SQLModel
 from app.database import get_session
 from app.models import ProductMaterial, ProductMaterialBase, Product, Material
+from app.services.pricing_plan import pricing_plan_cache
 
 router = APIRouter()
 
@@ -33,6 +34,7 @@ def create_product_material(
     session.add(db_product_material)
     session.commit()
     session.refresh(db_product_material)
+    pricing_plan_cache.invalidate_product(db_product_material.product_id)
     return db_product_material
 
 @router.get("/products/{product_id}/materials/", response_model=List[ProductMaterial], tags=["Product Materials"])
@@ -87,6 +89,7 @@ def update_product_material(
     session.add(db_product_material)
     session.commit()
     session.refresh(db_product_material)
+    pricing_plan_cache.invalidate_product(db_product_material.product_id)
     return db_product_material
 
 @router.delete("/product_materials/{product_material_id}", response_model=dict, tags=["Product Materials"])
@@ -99,6 +102,8 @@ def delete_product_material(
     db_product_material = session.get(ProductMaterial, product_material_id)
     if not db_product_material:
         raise HTTPException(status_code=404, detail="ProductMaterial not found")
+    product_id = db_product_material.product_id
     session.delete(db_product_material)
     session.commit()
+    pricing_plan_cache.invalidate_product(product_id)
     return {"message": "ProductMaterial deleted successfully"}
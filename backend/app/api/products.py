@@ -4,6 +4,8 @@ from fastapi import APIRouter, Depends, HTTPException, Query, Path
 from sqlmodel import Session, select, SQLModel
 from app.database import get_session
 from app.models import Product, ProductBase, UnitType
+from app.services.pricing_plan import pricing_plan_cache
+from app.services.product_configurator import product_configurator_cache
 
 router = APIRouter()
 
@@ -46,4 +48,6 @@ def delete_product(
         raise HTTPException(status_code=404, detail="Product not found")
     session.delete(product)
     session.commit()
+    pricing_plan_cache.invalidate_product(product_id)
+    product_configurator_cache.invalidate(product_id)
     return {"message": "Product deleted successfully"}
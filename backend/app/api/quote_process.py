@@ -1,69 +1,188 @@
-from typing import List, Optional
+import hashlib
+from typing import Dict, List, Optional
 from decimal import Decimal
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlmodel import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from sqlmodel.ext.asyncio.session import AsyncSession
 from pydantic import BaseModel
 
-from app.database import get_session
-from app.models import Quote, QuoteType, ProductRole, CalculatedQuote
+from app.config import settings
+from app.database import async_engine, get_async_read_session, get_async_session
+from app.models import Quote, QuoteType, ProductRole, CalculatedQuote, CalculatedQuoteBase
 from app.services.quote_process import (
-    QuoteProcessService,
     QuotePreview,
     CategoryPreview,
     ProductPreview,
     MaterializedProductEntry,
     FullQuote,  # Import the FullQuote model
+    BatchCalculationSummary,
+    QuotePage,
+    QuoteOperation,
 )
+from app.services.quote_calculator import QuoteCalculator
+from app.services.pricing_plan import pricing_plan_cache
+from app.services.quote_aggregate import quote_aggregate_cache
+from app.services.product_configurator import product_configurator_cache
+from app.services.calc_timing import record_calc_timing
+from app.services.quote_process_async import AsyncQuoteProcessService
 
 router = APIRouter(prefix="/quote-process", tags=["Quote Process"])
 
-def get_quote_process_service(session: Session = Depends(get_session)) -> QuoteProcessService:
-    return QuoteProcessService(session=session)
+def _make_service(request: Request, session: AsyncSession, populate_caches: bool = True) -> AsyncQuoteProcessService:
+    return AsyncQuoteProcessService(
+        session=session,
+        calculator=QuoteCalculator(
+            plan_cache=pricing_plan_cache, aggregate_cache=quote_aggregate_cache, populate_caches=populate_caches,
+        ),
+        configurator_cache=product_configurator_cache,
+        ui_state_buffer=getattr(request.app.state, "ui_state_buffer", None),
+        populate_caches=populate_caches,
+    )
+
+def get_quote_process_service(request: Request, session: AsyncSession = Depends(get_async_session)) -> AsyncQuoteProcessService:
+    return _make_service(request, session)
+
+def get_read_quote_process_service(request: Request, session: AsyncSession = Depends(get_async_read_session)) -> AsyncQuoteProcessService:
+    """
+    Service for routes that only read; served from the read replica when one is configured.
+    Replica rows can lag behind a catalog invalidation, so they only read the shared caches.
+    """
+    return _make_service(request, session, populate_caches=session.bind is async_engine)
+
+def make_etag(*parts) -> str:
+    """Strong ETag over the values a response is derived from."""
+    return '"' + hashlib.sha256(repr(parts).encode()).hexdigest()[:32] + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison, so W/ prefixes are ignored."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (candidate.strip() for candidate in if_none_match.split(","))
+    return any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+def not_modified(request: Request, response: Response, etag: Optional[str]) -> Optional[Response]:
+    """Sets the ETag on `response` and returns a 304 if the client already has this version."""
+    if etag is None:
+        return None
+    response.headers["ETag"] = etag
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+def catalog_version(request: Request) -> Optional[str]:
+    """Current catalog version, or None while catalog changes are not being tracked."""
+    handler = getattr(request.app.state, "catalog_handler", None)
+    return handler.catalog_version if handler is not None else None
+
+def calc_timing_enabled(
+    x_calc_timing: Optional[str] = Header(None, description="Send any value to get per-phase timings in the X-Calc-Timing response header"),
+) -> bool:
+    return settings.CALC_TIMING_ENABLED or x_calc_timing is not None
+
+def if_match_version(
+    if_match: Optional[str] = Header(None, description='Quote version the edit is based on, e.g. "3"; fails with 412 if the quote has changed'),
+) -> Optional[int]:
+    """Parses If-Match into an expected quote version; None (or *) makes the edit unconditional."""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    try:
+        return int(if_match.strip().removeprefix("W/").strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"If-Match must be a quote version, got {if_match}")
 
 @router.get("/quotes", response_model=List[QuotePreview])
-def list_quotes(
+async def list_quotes(
     quote_type: Optional[QuoteType] = Query(None, description="Filter by quote type"),
     offset: int = 0,
     limit: int = Query(default=100, le=500),
-    service: QuoteProcessService = Depends(get_quote_process_service),
+    service: AsyncQuoteProcessService = Depends(get_read_quote_process_service),
 ):
     """List all quotes, with optional filtering and pagination."""
-    return service.get_quotes(quote_type=quote_type, offset=offset, limit=limit)
+    return await service.get_quotes(quote_type=quote_type, offset=offset, limit=limit)
+
+@router.get("/quotes/page", response_model=QuotePage)
+async def list_quotes_page(
+    quote_type: Optional[QuoteType] = Query(None, description="Filter by quote type"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; omit for the first page"),
+    limit: int = Query(default=100, le=500),
+    service: AsyncQuoteProcessService = Depends(get_read_quote_process_service),
+):
+    """List quotes newest first with cursor pagination, which stays fast on deep pages."""
+    try:
+        return await service.get_quotes_page(quote_type=quote_type, cursor=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/quotes/stale", response_model=List[QuotePreview])
+async def list_stale_quotes(
+    material_id: List[int] = Query(default=[], description="Materials whose price or cull rate changed"),
+    product_id: List[int] = Query(default=[], description="Products whose labor or materials changed"),
+    variation_option_id: List[int] = Query(default=[], description="Variation options whose labor or materials changed"),
+    offset: int = 0,
+    limit: int = Query(default=100, le=500),
+    service: AsyncQuoteProcessService = Depends(get_read_quote_process_service),
+):
+    """List calculated quotes that need repricing after the given catalog changes."""
+    try:
+        return await service.get_stale_quotes(
+            material_ids=material_id, product_ids=product_id, variation_option_ids=variation_option_id,
+            offset=offset, limit=limit,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/quotes/{quote_id}", response_model=Quote)
-def get_quote(
+async def get_quote(
     quote_id: int,
-    service: QuoteProcessService = Depends(get_quote_process_service),
+    service: AsyncQuoteProcessService = Depends(get_read_quote_process_service),
 ):
     """Get a single quote by its ID."""
     try:
-        return service.get_quote_by_id(quote_id=quote_id)
+        return await service.get_quote_by_id(quote_id=quote_id)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 @router.post("/quotes", response_model=Quote) # Changed to return full Quote model
-def create_quote(
+async def create_quote(
     name: str,
     quote_type: QuoteType,
     description: Optional[str] = None,
     config_id: int = 1, # Assuming a default config_id
-    service: QuoteProcessService = Depends(get_quote_process_service),
+    service: AsyncQuoteProcessService = Depends(get_quote_process_service),
 ):
     """Create a new quote."""
     try:
-        return service.create_quote(name=name, description=description, quote_type=quote_type, config_id=config_id)
+        return await service.create_quote(name=name, description=description, quote_type=quote_type, config_id=config_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/quotes/{quote_id}/clone", response_model=Quote)
+async def clone_quote(
+    quote_id: int,
+    name: Optional[str] = Query(None, description="Name of the copy; defaults to 'Copy of <name>'"),
+    include_calculation: bool = Query(False, description="Also copy the stored calculation"),
+    service: AsyncQuoteProcessService = Depends(get_quote_process_service),
+):
+    """Copy a quote with its product entries and selected options."""
+    try:
+        return await service.clone_quote(quote_id=quote_id, name=name, include_calculation=include_calculation)
+    except HTTPException as e:
+        raise e
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.put("/quotes/{quote_id}/ui-state", response_model=Quote)
-def update_quote_ui_state(
+async def update_quote_ui_state(
     quote_id: int,
     ui_state: str,
-    service: QuoteProcessService = Depends(get_quote_process_service),
+    expected_version: Optional[int] = Depends(if_match_version),
+    service: AsyncQuoteProcessService = Depends(get_quote_process_service),
 ):
     """Update the UI state of a quote."""
     try:
-        return service.update_quote_ui_state(quote_id=quote_id, ui_state=ui_state)
+        await service.check_quote_version(quote_id, expected_version)
+        return await service.update_quote_ui_state(quote_id=quote_id, ui_state=ui_state)
     except HTTPException as e:
         raise e # Re-raise HTTPException directly
     except ValueError as e: # Catch other potential errors like quote not found from service
@@ -71,73 +190,93 @@ def update_quote_ui_state(
 
 
 @router.put("/quotes/{quote_id}/status", response_model=Quote)
-def set_quote_status(
+async def set_quote_status(
     quote_id: int,
     status: str,
-    service: QuoteProcessService = Depends(get_quote_process_service),
+    expected_version: Optional[int] = Depends(if_match_version),
+    service: AsyncQuoteProcessService = Depends(get_quote_process_service),
 ):
     """Set the status of a quote."""
     try:
-        return service.set_quote_status(quote_id=quote_id, status=status)
+        await service.check_quote_version(quote_id, expected_version)
+        return await service.set_quote_status(quote_id=quote_id, status=status)
     except HTTPException as e:
         raise e
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/categories", response_model=List[CategoryPreview])
-def list_categories(
+async def list_categories(
+    request: Request,
+    response: Response,
     category_type: Optional[str] = Query(None, description="Filter by category type"),
     offset: int = 0,
     limit: int = Query(default=100, le=500),
-    service: QuoteProcessService = Depends(get_quote_process_service),
+    service: AsyncQuoteProcessService = Depends(get_read_quote_process_service),
 ):
     """List product categories."""
-    return service.get_categories_previews(category_type=category_type, offset=offset, limit=limit)
+    version = catalog_version(request)
+    etag = make_etag("categories", version, category_type, offset, limit) if version else None
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+    return await service.get_categories_previews(category_type=category_type, offset=offset, limit=limit)
 
 @router.get("/categories/{category_name}/products", response_model=List[ProductPreview])
-def list_products_in_category(
+async def list_products_in_category(
+    request: Request,
+    response: Response,
     category_name: str,
     offset: int = 0,
     limit: int = Query(default=100, le=500),
-    service: QuoteProcessService = Depends(get_quote_process_service),
+    service: AsyncQuoteProcessService = Depends(get_read_quote_process_service),
 ):
     """List products within a specific category."""
-    return service.get_products_previews(category_name=category_name, offset=offset, limit=limit)
+    version = catalog_version(request)
+    etag = make_etag("category-products", version, category_name, offset, limit) if version else None
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+    return await service.get_products_previews(category_name=category_name, offset=offset, limit=limit)
 
 @router.post("/quotes/{quote_id}/product-entries", response_model=MaterializedProductEntry)
-def add_product_to_quote(
+async def add_product_to_quote(
     quote_id: int,
     product_id: int,
     quantity: Decimal,
     role: ProductRole,
-    service: QuoteProcessService = Depends(get_quote_process_service),
+    expected_version: Optional[int] = Depends(if_match_version),
+    service: AsyncQuoteProcessService = Depends(get_quote_process_service),
 ):
     """Add a product entry to a quote."""
     try:
-        return service.add_quote_product_entry(quote_id=quote_id, product_id=product_id, quantity=quantity, role=role)
+        await service.check_quote_version(quote_id, expected_version)
+        return await service.add_quote_product_entry(quote_id=quote_id, product_id=product_id, quantity=quantity, role=role)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/quotes/{quote_id}/product-entries", response_model=List[MaterializedProductEntry])
-def list_quote_product_entries(
+async def list_quote_product_entries(
     quote_id: int,
     role: Optional[ProductRole] = Query(None, description="Filter by product role"),
     offset: int = 0,
     limit: int = Query(default=100, le=500),
-    service: QuoteProcessService = Depends(get_quote_process_service),
+    service: AsyncQuoteProcessService = Depends(get_read_quote_process_service),
 ):
     """List product entries for a quote."""
-    return service.get_quote_product_entries(quote_id=quote_id, role=role, offset=offset, limit=limit)
+    return await service.get_quote_product_entries(quote_id=quote_id, role=role, offset=offset, limit=limit)
 
 @router.delete("/quotes/{quote_id}/product-entries/{product_entry_id}", status_code=204)
-def remove_product_from_quote(
+async def remove_product_from_quote(
     quote_id: int,
     product_entry_id: int,
-    service: QuoteProcessService = Depends(get_quote_process_service),
+    expected_version: Optional[int] = Depends(if_match_version),
+    service: AsyncQuoteProcessService = Depends(get_quote_process_service),
 ):
     """Remove a product entry from a quote."""
     try:
-        service.delete_quote_product_entry(quote_id=quote_id, product_entry_id=product_entry_id)
+        await service.check_quote_version(quote_id, expected_version)
+        await service.delete_quote_product_entry(quote_id=quote_id, product_entry_id=product_entry_id)
         return None # No content response for 204
     except HTTPException as e:
         raise e # Re-raise HTTPException directly from service (e.g., 404 if not found)
@@ -146,37 +285,88 @@ def remove_product_from_quote(
 
 
 @router.get("/product-entries/{product_entry_id}", response_model=MaterializedProductEntry)
-def get_materialized_product_entry(
+async def get_materialized_product_entry(
     product_entry_id: int,
-    service: QuoteProcessService = Depends(get_quote_process_service),
+    service: AsyncQuoteProcessService = Depends(get_read_quote_process_service),
 ):
     """Get a single materialized product entry."""
     try:
-        return service.get_quote_product_entry(product_entry_id=product_entry_id)
+        return await service.get_quote_product_entry(product_entry_id=product_entry_id)
     except HTTPException as e: # Catch 404 from service
         raise e
 
 
+class BulkVariationSelectionRequest(BaseModel):
+    # Entry id -> complete set of option ids that should be selected afterwards
+    selections: Dict[int, List[int]]
+
+@router.put("/product-entries/variations", response_model=List[MaterializedProductEntry])
+async def set_product_entries_variations(
+    body: BulkVariationSelectionRequest,
+    expected_version: Optional[int] = Depends(if_match_version),
+    service: AsyncQuoteProcessService = Depends(get_quote_process_service),
+):
+    """
+    Replace the selected options of several product entries in one transaction.
+    If-Match applies to every quote owning one of the entries.
+    """
+    try:
+        await service.check_entries_quote_version(list(body.selections), expected_version)
+        return await service.set_quote_product_variations(selections=body.selections)
+    except HTTPException as e:
+        raise e
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.put("/product-entries/{product_entry_id}/variations", response_model=MaterializedProductEntry)
+async def set_product_entry_variations(
+    product_entry_id: int,
+    variation_option_ids: List[int],
+    expected_version: Optional[int] = Depends(if_match_version),
+    service: AsyncQuoteProcessService = Depends(get_quote_process_service),
+):
+    """Replace the selected options of a product entry with the given set."""
+    try:
+        await service.check_entry_quote_version(product_entry_id, expected_version)
+        return (await service.set_quote_product_variations(selections={product_entry_id: variation_option_ids}))[0]
+    except HTTPException as e:
+        raise e
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.put("/product-entries/{product_entry_id}/variations/{variation_option_id}", response_model=MaterializedProductEntry)
-def set_product_variation_option(
+async def set_product_variation_option(
     product_entry_id: int,
     variation_option_id: int,
-    service: QuoteProcessService = Depends(get_quote_process_service),
+    expected_version: Optional[int] = Depends(if_match_version),
+    service: AsyncQuoteProcessService = Depends(get_quote_process_service),
 ):
     """Set or toggle a variation option for a product entry."""
     try:
-        return service.set_quote_product_variation_option(product_entry_id=product_entry_id, variation_option_id=variation_option_id)
+        await service.check_entry_quote_version(product_entry_id, expected_version)
+        return await service.set_quote_product_variation_option(product_entry_id=product_entry_id, variation_option_id=variation_option_id)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/quotes/{quote_id}/calculate", response_model=CalculatedQuote)
-def calculate_quote_totals(
+async def calculate_quote_totals(
     quote_id: int,
-    service: QuoteProcessService = Depends(get_quote_process_service),
+    response: Response,
+    force: bool = Query(False, description="Recalculate even if the inputs are unchanged"),
+    timing_enabled: bool = Depends(calc_timing_enabled),
+    expected_version: Optional[int] = Depends(if_match_version),
+    service: AsyncQuoteProcessService = Depends(get_quote_process_service),
 ):
     """Calculate the totals for a quote."""
     try:
-        return service.calculate_quote(quote_id=quote_id)
+        await service.check_quote_version(quote_id, expected_version)
+        with record_calc_timing(timing_enabled) as timing:
+            calculated_quote = await service.calculate_quote(quote_id=quote_id, force=force)
+        if timing:
+            response.headers["X-Calc-Timing"] = timing.header_value()
+        return calculated_quote
+    except HTTPException as e:
+        raise e
     except ValueError as e: # Or any specific exception your calculator might raise for invalid state
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e: # Catch-all for unexpected errors during calculation
@@ -184,55 +374,149 @@ def calculate_quote_totals(
         raise HTTPException(status_code=500, detail="An error occurred during quote calculation.")
 
 
+class QuoteOperationsRequest(BaseModel):
+    operations: List[QuoteOperation]
+    calculate: bool = False # Calculate the quote after the last operation, in the same transaction
+    force: bool = False
+
+@router.post("/quotes/{quote_id}/operations", response_model=FullQuote)
+async def apply_quote_operations(
+    quote_id: int,
+    body: QuoteOperationsRequest,
+    response: Response,
+    timing_enabled: bool = Depends(calc_timing_enabled),
+    expected_version: Optional[int] = Depends(if_match_version),
+    service: AsyncQuoteProcessService = Depends(get_quote_process_service),
+):
+    """Apply an ordered list of edits to a quote in one transaction and return the full quote."""
+    try:
+        await service.check_quote_version(quote_id, expected_version)
+        with record_calc_timing(timing_enabled and body.calculate) as timing:
+            full_quote = await service.apply_quote_operations(
+                quote_id=quote_id, operations=body.operations, calculate=body.calculate, force=body.force,
+            )
+        if timing:
+            response.headers["X-Calc-Timing"] = timing.header_value()
+        return full_quote
+    except HTTPException as e:
+        raise e
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/quotes/calculate", response_model=BatchCalculationSummary)
+async def calculate_many_quotes(
+    quote_ids: List[int],
+    response: Response,
+    force: bool = Query(False, description="Recalculate even if the inputs are unchanged"),
+    timing_enabled: bool = Depends(calc_timing_enabled),
+    service: AsyncQuoteProcessService = Depends(get_quote_process_service),
+):
+    """Recalculate several quotes at once, e.g. after a supplier price change."""
+    try:
+        with record_calc_timing(timing_enabled) as timing:
+            summary = await service.calculate_quotes(quote_ids=quote_ids, force=force)
+        if timing:
+            response.headers["X-Calc-Timing"] = timing.header_value()
+        return summary
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="An error occurred during batch quote calculation.")
+
+
+@router.api_route("/quotes/{quote_id}/calculate/preview", methods=["GET", "POST"], response_model=CalculatedQuoteBase)
+async def preview_quote_totals(
+    quote_id: int,
+    response: Response,
+    timing_enabled: bool = Depends(calc_timing_enabled),
+    service: AsyncQuoteProcessService = Depends(get_read_quote_process_service),
+):
+    """Calculate the totals for a quote without saving them or changing its status."""
+    try:
+        with record_calc_timing(timing_enabled) as timing:
+            preview = await service.preview_quote(quote_id=quote_id)
+        if timing:
+            response.headers["X-Calc-Timing"] = timing.header_value()
+        return preview
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="An error occurred during quote calculation.")
+
+
 @router.get("/quotes/{quote_id}/calculate", response_model=Optional[CalculatedQuote])
-def get_calculated_quote_details(
+async def get_calculated_quote_details(
+    request: Request,
+    response: Response,
     quote_id: int,
-    service: QuoteProcessService = Depends(get_quote_process_service),
+    service: AsyncQuoteProcessService = Depends(get_read_quote_process_service),
 ):
     """Get the calculated details of a quote if available."""
-    calculated_quote = service.get_calculated_quote(quote_id=quote_id)
+    calculated_quote = await service.get_calculated_quote(quote_id=quote_id)
     if not calculated_quote:
         # You might return 404 if no calculation exists, or an empty object/specific response
         # For now, returning None which FastAPI handles with the Optional response model
         return None
+    etag = make_etag(
+        "calculated", calculated_quote.id, calculated_quote.calculated_at, calculated_quote.input_fingerprint,
+    )
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
     return calculated_quote
 
 @router.get("/products/by-category-type/{category_type}", response_model=List[ProductPreview])
-def list_products_by_category_type(
+async def list_products_by_category_type(
+    request: Request,
+    response: Response,
     category_type: str,
     offset: int = 0,
     limit: int = Query(default=100, le=500),
-    service: QuoteProcessService = Depends(get_quote_process_service),
+    service: AsyncQuoteProcessService = Depends(get_read_quote_process_service),
 ):
     """List products within all categories of a given type."""
-    return service.get_products_previews_by_category_type(category_type=category_type, offset=offset, limit=limit)
+    version = catalog_version(request)
+    etag = make_etag("category-type-products", version, category_type, offset, limit) if version else None
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+    return await service.get_products_previews_by_category_type(category_type=category_type, offset=offset, limit=limit)
 
 class UpdateQuoteProductEntryRequest(BaseModel):
     quantity: Optional[Decimal] = None
     notes: Optional[str] = None
 
 @router.put("/product-entries/{product_entry_id}", response_model=MaterializedProductEntry)
-def update_quote_product_entry(
+async def update_quote_product_entry(
     product_entry_id: int,
     body: UpdateQuoteProductEntryRequest,
-    service: QuoteProcessService = Depends(get_quote_process_service),
+    expected_version: Optional[int] = Depends(if_match_version),
+    service: AsyncQuoteProcessService = Depends(get_quote_process_service),
 ):
     """Update quantity and/or notes for a quote product entry."""
     try:
-        return service.update_quote_product_entry(product_entry_id=product_entry_id, quantity=body.quantity, notes=body.notes)
+        await service.check_entry_quote_version(product_entry_id, expected_version)
+        return await service.update_quote_product_entry(product_entry_id=product_entry_id, quantity=body.quantity, notes=body.notes)
     except HTTPException as e:
         raise e
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/quotes/{quote_id}/full", response_model=FullQuote)
-def get_full_quote(
+async def get_full_quote(
+    request: Request,
+    response: Response,
     quote_id: int,
-    service: QuoteProcessService = Depends(get_quote_process_service),
+    service: AsyncQuoteProcessService = Depends(get_read_quote_process_service),
 ):
     """Return quote with all materialised product-entries."""
     try:
-        return service.get_full_quote(quote_id=quote_id)
+        # Validate against the quote's timestamp and the catalog version before materializing
+        version = catalog_version(request)
+        if version:
+            etag = make_etag("full", quote_id, await service.get_quote_updated_at(quote_id), version)
+            cached = not_modified(request, response, etag)
+            if cached:
+                return cached
+        return await service.get_full_quote(quote_id=quote_id)
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -4,6 +4,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query, Path
 from sqlmodel import Session, select, SQLModel
 from app.database import get_session
 from app.models import QuoteProductEntry, QuoteProductEntryBase, Quote, Product # Needed for validation/linking
+from app.services.quote_process import touch_quote
 
 router = APIRouter()
 
@@ -23,6 +24,7 @@ def create_quote_product_entry(
 
     db_entry = QuoteProductEntry.model_validate(quote_product_entry)
     session.add(db_entry)
+    touch_quote(db_quote)
     session.commit()
     session.refresh(db_entry)
     return db_entry
@@ -66,11 +68,15 @@ def update_quote_product_entry(
         new_quote = session.get(Quote, entry_update.quote_id)
         if not new_quote:
             raise HTTPException(status_code=404, detail=f"New Quote with id {entry_update.quote_id} not found")
+        touch_quote(new_quote)
     if entry_update.product_id != db_entry.product_id:
         new_product = session.get(Product, entry_update.product_id)
         if not new_product:
             raise HTTPException(status_code=404, detail=f"New Product with id {entry_update.product_id} not found")
             
+    old_quote = session.get(Quote, db_entry.quote_id)
+    if old_quote:
+        touch_quote(old_quote)
     update_data = entry_update.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_entry, key, value)
@@ -89,6 +95,9 @@ def delete_quote_product_entry(
     entry = session.get(QuoteProductEntry, entry_id)
     if not entry:
         raise HTTPException(status_code=404, detail="QuoteProductEntry not found")
+    quote = session.get(Quote, entry.quote_id)
+    if quote:
+        touch_quote(quote)
     session.delete(entry)
     session.commit()
     return {"message": "QuoteProductEntry deleted successfully"}
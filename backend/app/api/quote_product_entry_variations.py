@@ -5,11 +5,18 @@ from sqlmodel import Session, select, SQLModel
 from app.database import get_session
 from app.models import (
     QuoteProductEntryVariation, QuoteProductEntryVariationBase,
-    QuoteProductEntry, VariationOption # Needed for validation/linking
+    Quote, QuoteProductEntry, VariationOption # Needed for validation/linking
 )
+from app.services.quote_process import touch_quote
 
 router = APIRouter()
 
+def touch_entry_quote(session: Session, entry: QuoteProductEntry) -> None:
+    """Bumps the quote owning `entry`, since its selected options are part of the quote."""
+    quote = session.get(Quote, entry.quote_id)
+    if quote:
+        touch_quote(quote)
+
 @router.post("/quote_product_entry_variations/", response_model=QuoteProductEntryVariation, tags=["Quote Product Entry Variations"])
 def create_quote_product_entry_variation(
     *,
@@ -39,6 +46,7 @@ def create_quote_product_entry_variation(
 
     db_qpev = QuoteProductEntryVariation.model_validate(qpev)
     session.add(db_qpev)
+    touch_entry_quote(session, db_qpe)
     session.commit()
     session.refresh(db_qpev)
     return db_qpev
@@ -81,6 +89,9 @@ def delete_quote_product_entry_variation(
     qpev = session.get(QuoteProductEntryVariation, qpev_id)
     if not qpev:
         raise HTTPException(status_code=404, detail="QuoteProductEntryVariation not found")
+    entry = session.get(QuoteProductEntry, qpev.quote_product_entry_id)
+    if entry:
+        touch_entry_quote(session, entry)
     session.delete(qpev)
     session.commit()
     return {"message": "QuoteProductEntryVariation deleted successfully"}
@@ -1,10 +1,11 @@
 \
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Query, Path
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Path, Request, Response
 from sqlmodel import Session, select, SQLModel
-from app.database import get_session
+from app.database import get_read_session, get_session
 from app.models import Quote, QuoteBase, CalculatedQuote, QuoteConfig # QuoteConfig for validation
 from app.services.quote_calculator import QuoteCalculator
+from app.services.quote_pagination import encode_quote_cursor, order_quotes
 
 router = APIRouter()
 
@@ -24,24 +25,38 @@ def create_quote(*, session: Session = Depends(get_session), quote: QuoteBase):
 @router.get("/quotes/", response_model=List[Quote], tags=["Quotes"])
 def read_quotes(
     *,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
+    response: Response,
     offset: int = 0,
-    limit: int = Query(default=100, le=100)
+    limit: int = Query(default=100, le=100),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page; replaces offset")
 ):
-    quotes = session.exec(select(Quote).offset(offset).limit(limit)).all()
+    # Newest first; the X-Next-Cursor header continues the listing without a deep OFFSET
+    try:
+        statement = order_quotes(select(Quote), cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not cursor:
+        statement = statement.offset(offset)
+    quotes = session.exec(statement.limit(limit + 1)).all()
+    if len(quotes) > limit:
+        quotes = quotes[:limit]
+        response.headers["X-Next-Cursor"] = encode_quote_cursor(quotes[-1])
     return quotes
 
 @router.get("/quotes/{quote_id}", response_model=Quote, tags=["Quotes"])
-def read_quote(*, session: Session = Depends(get_session), quote_id: int = Path(...)):
+def read_quote(*, session: Session = Depends(get_read_session), request: Request, quote_id: int = Path(...)):
     quote = session.get(Quote, quote_id)
     if not quote:
         raise HTTPException(status_code=404, detail="Quote not found")
-    return quote
+    ui_state_buffer = getattr(request.app.state, "ui_state_buffer", None)
+    return ui_state_buffer.overlay(quote) if ui_state_buffer is not None else quote
 
 @router.put("/quotes/{quote_id}", response_model=Quote, tags=["Quotes"])
 def update_quote(
     *,
     session: Session = Depends(get_session),
+    request: Request,
     quote_id: int = Path(...),
     quote_update: QuoteBase 
 ):
@@ -57,6 +72,9 @@ def update_quote(
     update_data = quote_update.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_quote, key, value)
+    ui_state_buffer = getattr(request.app.state, "ui_state_buffer", None)
+    if ui_state_buffer is not None and "ui_state" in update_data:
+        ui_state_buffer.discard(quote_id) # The direct write supersedes a buffered value
     
     session.add(db_quote)
     session.commit()
@@ -0,0 +1,56 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import BaseModel
+from sqlmodel import Session, select
+
+from app.database import get_session
+from app.models import RepricingJob
+from app.services.repricing_jobs import RepricingJobRunner, RepricingQueueFull
+
+router = APIRouter(prefix="/repricing-jobs", tags=["Repricing Jobs"])
+
+
+class RepricingJobCreate(BaseModel):
+    quote_ids: List[int]
+    force: bool = False
+
+
+def get_repricing_runner(request: Request) -> RepricingJobRunner:
+    runner = getattr(request.app.state, "repricing_runner", None)
+    if runner is None:
+        raise HTTPException(status_code=503, detail="Repricing jobs are not available.")
+    return runner
+
+
+@router.post("", response_model=RepricingJob, status_code=202)
+def create_repricing_job(
+    job_in: RepricingJobCreate,
+    runner: RepricingJobRunner = Depends(get_repricing_runner),
+):
+    """Queue a background recalculation of the given quotes."""
+    try:
+        return runner.enqueue(quote_ids=job_in.quote_ids, force=job_in.force)
+    except RepricingQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("", response_model=List[RepricingJob])
+def list_repricing_jobs(
+    offset: int = 0,
+    limit: int = Query(default=20, le=100),
+    session: Session = Depends(get_session),
+):
+    """List repricing jobs, newest first."""
+    return session.exec(select(RepricingJob).order_by(RepricingJob.id.desc()).offset(offset).limit(limit)).all()
+
+
+@router.get("/{job_id}", response_model=RepricingJob)
+def get_repricing_job(job_id: int, session: Session = Depends(get_session)):
+    """Get the status and progress of a repricing job."""
+    job = session.get(RepricingJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Repricing job not found")
+    return job
@@ -3,6 +3,8 @@ from fastapi import APIRouter, Depends, HTTPException, Query, Path
 from sqlmodel import Session, select, SQLModel
 from app.database import get_session
 from app.models import UnitType, UnitTypeBase
+from app.services.pricing_plan import pricing_plan_cache
+from app.services.product_configurator import product_configurator_cache
 
 router = APIRouter()
 
@@ -42,4 +44,6 @@ def delete_unit_type(
         raise HTTPException(status_code=404, detail="UnitType not found")
     session.delete(unit_type)
     session.commit()
+    pricing_plan_cache.clear()
+    product_configurator_cache.clear()
     return {"message": "UnitType deleted successfully"}
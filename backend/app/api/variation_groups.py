@@ -4,6 +4,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query, Path
 from sqlmodel import Session, select, SQLModel
 from app.database import get_session
 from app.models import VariationGroup, VariationGroupBase, Product # Product needed for validation/linking
+from app.services.product_configurator import product_configurator_cache
 
 router = APIRouter()
 
@@ -32,6 +33,7 @@ def create_variation_group(
     session.add(db_variation_group)
     session.commit()
     session.refresh(db_variation_group)
+    product_configurator_cache.invalidate(db_variation_group.product_id)
     return db_variation_group
 
 @router.get("/products/{product_id}/variation_groups/", response_model=List[VariationGroup], tags=["Variation Groups"])
@@ -74,6 +76,7 @@ def update_variation_group(
         if not new_product:
             raise HTTPException(status_code=404, detail=f"New product with id {variation_group_update.product_id} not found")
     
+    previous_product_id = db_variation_group.product_id
     update_data = variation_group_update.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_variation_group, key, value)
@@ -81,6 +84,8 @@ def update_variation_group(
     session.add(db_variation_group)
     session.commit()
     session.refresh(db_variation_group)
+    product_configurator_cache.invalidate(previous_product_id)
+    product_configurator_cache.invalidate(db_variation_group.product_id)
     return db_variation_group
     
 
@@ -93,6 +98,8 @@ def delete_variation_group(
     variation_group = session.get(VariationGroup, variation_group_id)
     if not variation_group:
         raise HTTPException(status_code=404, detail="VariationGroup not found")
+    product_id = variation_group.product_id
     session.delete(variation_group)
     session.commit()
+    product_configurator_cache.invalidate(product_id)
     return {"message": "VariationGroup deleted successfully"}
@@ -7,6 +7,7 @@ from app.models import (
     VariationOptionMaterial, VariationOptionMaterialBase, 
     VariationOption, Material
 )
+from app.services.pricing_plan import pricing_plan_cache
 
 router = APIRouter()
 
@@ -37,6 +38,7 @@ def create_variation_option_material(
     session.add(db_vom)
     session.commit()
     session.refresh(db_vom)
+    pricing_plan_cache.invalidate_option(db_vom.variation_option_id)
     return db_vom
 
 @router.get("/variation_options/{variation_option_id}/materials/", response_model=List[VariationOptionMaterial], tags=["Variation Option Materials"])
@@ -90,6 +92,7 @@ def update_variation_option_material(
     session.add(db_vom)
     session.commit()
     session.refresh(db_vom)
+    pricing_plan_cache.invalidate_option(db_vom.variation_option_id)
     return db_vom
     
 @router.delete("/variation_option_materials/{vom_id}", response_model=dict, tags=["Variation Option Materials"])
@@ -101,6 +104,8 @@ def delete_variation_option_material(
     vom = session.get(VariationOptionMaterial, vom_id)
     if not vom:
         raise HTTPException(status_code=404, detail="VariationOptionMaterial not found")
+    variation_option_id = vom.variation_option_id
     session.delete(vom)
     session.commit()
+    pricing_plan_cache.invalidate_option(variation_option_id)
     return {"message": "VariationOptionMaterial deleted successfully"}
@@ -4,9 +4,17 @@ from fastapi import APIRouter, Depends, HTTPException, Query, Path
 from sqlmodel import Session, select, SQLModel
 from app.database import get_session
 from app.models import VariationOption, VariationOptionBase, VariationGroup # VariationGroup needed
+from app.services.pricing_plan import pricing_plan_cache
+from app.services.product_configurator import product_configurator_cache
 
 router = APIRouter()
 
+def _invalidate_configurator(session: Session, variation_group_id: int) -> None:
+    # Configurator trees are cached per product, so drop the tree of the option's product
+    variation_group = session.get(VariationGroup, variation_group_id)
+    if variation_group:
+        product_configurator_cache.invalidate(variation_group.product_id)
+
 @router.post("/variation_options/", response_model=VariationOption, tags=["Variation Options"])
 def create_variation_option(
     *, 
@@ -21,6 +29,7 @@ def create_variation_option(
     session.add(db_variation_option)
     session.commit()
     session.refresh(db_variation_option)
+    _invalidate_configurator(session, db_variation_option.variation_group_id)
     return db_variation_option
 
 @router.get("/variation_groups/{variation_group_id}/options/", response_model=List[VariationOption], tags=["Variation Options"])
@@ -63,6 +72,7 @@ def update_variation_option(
         if not new_group:
             raise HTTPException(status_code=404, detail=f"New VariationGroup with id {variation_option_update.variation_group_id} not found")
 
+    previous_group_id = db_variation_option.variation_group_id
     update_data = variation_option_update.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_variation_option, key, value)
@@ -70,6 +80,9 @@ def update_variation_option(
     session.add(db_variation_option)
     session.commit()
     session.refresh(db_variation_option)
+    pricing_plan_cache.invalidate_option(variation_option_id)
+    _invalidate_configurator(session, previous_group_id)
+    _invalidate_configurator(session, db_variation_option.variation_group_id)
     return db_variation_option
 
 @router.delete("/variation_options/{variation_option_id}", response_model=dict, tags=["Variation Options"])
@@ -81,6 +94,9 @@ def delete_variation_option(
     variation_option = session.get(VariationOption, variation_option_id)
     if not variation_option:
         raise HTTPException(status_code=404, detail="VariationOption not found")
+    variation_group_id = variation_option.variation_group_id
     session.delete(variation_option)
     session.commit()
+    pricing_plan_cache.invalidate_option(variation_option_id)
+    _invalidate_configurator(session, variation_group_id)
     return {"message": "VariationOption deleted successfully"}
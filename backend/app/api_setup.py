@@ -13,7 +13,9 @@ from app.api import (
     quotes,
     quote_product_entries,
     quote_product_entry_variations,
-    quote_process # Added quote_process router
+    quote_process, # Added quote_process router
+    repricing_jobs,
+    internal,
 )
 
 router = APIRouter()
@@ -31,6 +33,8 @@ router.include_router(quotes.router)
 router.include_router(quote_product_entries.router)
 router.include_router(quote_product_entry_variations.router)
 router.include_router(quote_process.router) # Added quote_process router
+router.include_router(repricing_jobs.router)
+router.include_router(internal.router)
 
 # Placeholder for other CRUD operations (PUT, DELETE) and more complex endpoints
 # These will be added as development progresses.
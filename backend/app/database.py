@@ -1,62 +1,217 @@
-from sqlmodel import create_engine, Session, SQLModel # Ensure SQLModel is imported
+from typing import Dict
+
+from fastapi import Request
+from sqlmodel import Session, SQLModel # Ensure SQLModel is imported
+from sqlmodel.ext.asyncio.session import AsyncSession
+
 from .config import settings
-from sqlalchemy import text
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+from app.services.db_pool import (
+    async_replica_pool_wait_stats,
+    create_pooled_async_engine,
+    create_pooled_engine,
+    replica_pool_wait_stats,
+)
+from app.services.read_routing import read_your_writes
+from app.services.schema_migrations import Migration, migrate_schema
 
 # The database URL is loaded from the .env file via settings
 DATABASE_URL = settings.DATABASE_URL
 
-engine = create_engine(DATABASE_URL, echo=True) # echo=True for logging SQL queries, can be removed in production
+engine = create_pooled_engine(
+    DATABASE_URL,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    statement_timeout_ms=settings.DB_STATEMENT_TIMEOUT_MS,
+    echo=settings.DB_ECHO,
+)
+
+# Same pool settings, for the async routes; each process holds both pools
+async_engine = create_pooled_async_engine(
+    settings.ASYNC_DATABASE_URL,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    statement_timeout_ms=settings.DB_STATEMENT_TIMEOUT_MS,
+    echo=settings.DB_ECHO,
+)
+
+# Read-only routes use the replica when DATABASE_REPLICA_URL is set; otherwise these are the primary engines
+if settings.DATABASE_REPLICA_URL:
+    replica_engine = create_pooled_engine(
+        settings.DATABASE_REPLICA_URL,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        statement_timeout_ms=settings.DB_STATEMENT_TIMEOUT_MS,
+        echo=settings.DB_ECHO,
+        wait_stats=replica_pool_wait_stats,
+    )
+    async_replica_engine = create_pooled_async_engine(
+        settings.ASYNC_DATABASE_REPLICA_URL,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        statement_timeout_ms=settings.DB_STATEMENT_TIMEOUT_MS,
+        echo=settings.DB_ECHO,
+        wait_stats=async_replica_pool_wait_stats,
+    )
+else:
+    replica_engine = engine
+    async_replica_engine = async_engine
+
+read_your_writes.sticky_seconds = settings.DB_REPLICA_STICKY_SECONDS
 
 def get_session():
     with Session(engine) as session:
+        yield read_your_writes.watch(session)
+
+async def get_async_session():
+    # Loaded attributes stay usable after commit, since lazy loads cannot run outside the session's greenlet
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        read_your_writes.watch(session.sync_session)
         yield session
 
-# Function to run basic migrations
-def run_migrations():
-    """Run basic database migrations."""
-    with Session(engine) as session:
-        try:
-            # Migration 1: Make material.unit_type_id optional (nullable) and set default
-            # Check if the column exists and is not nullable
-            result = session.exec(text("""
-                SELECT column_name, is_nullable, column_default 
-                FROM information_schema.columns 
-                WHERE table_name = 'material' AND column_name = 'unit_type_id'
-            """)).first()
-            
-            if result and result.is_nullable == 'NO':
-                print("Running migration: Making material.unit_type_id nullable...")
-                session.exec(text("ALTER TABLE material ALTER COLUMN unit_type_id DROP NOT NULL"))
-                session.commit()
-                print("Migration completed: material.unit_type_id is now nullable")
-            elif result:
-                print("Migration already applied: material.unit_type_id is already nullable")
-            else:
-                print("No migration needed: material.unit_type_id column does not exist yet")
-            
-            # Migration 2: Set default value for unit_type_id
-            if result and (result.column_default is None or '1' not in str(result.column_default)):
-                print("Running migration: Setting default value for material.unit_type_id...")
-                session.exec(text("ALTER TABLE material ALTER COLUMN unit_type_id SET DEFAULT 1"))
-                session.commit()
-                print("Migration completed: material.unit_type_id default set to 1")
-            elif result and result.column_default:
-                print("Migration already applied: material.unit_type_id already has a default value")
-                
-        except Exception as e:
-            print(f"Migration error: {e}")
-            session.rollback()
-
-# Function to create database tables (if they don't exist)
-# This should be called once at application startup
-# For a more robust solution, consider using Alembic for migrations
-def create_db_and_tables():
-    # Import all models here before calling SQLModel.metadata.create_all
+def reads_from_primary(request: Request) -> bool:
+    """True when the quote or product entry in the path was written recently through this process."""
+    # Raw path values; invalid ones are rejected by the route's own validation
+    quote_id = str(request.path_params.get("quote_id", ""))
+    product_entry_id = str(request.path_params.get("product_entry_id", ""))
+    return read_your_writes.recently_written(
+        quote_id=int(quote_id) if quote_id.isdigit() else None,
+        product_entry_id=int(product_entry_id) if product_entry_id.isdigit() else None,
+    )
+
+def get_read_session(request: Request):
+    """Session for read-only routes: the replica, or the primary right after a write to the same quote."""
+    with Session(engine if reads_from_primary(request) else replica_engine) as session:
+        yield session
+
+async def get_async_read_session(request: Request):
+    """Async counterpart of get_read_session."""
+    bind = async_engine if reads_from_primary(request) else async_replica_engine
+    async with AsyncSession(bind, expire_on_commit=False) as session:
+        yield session
+
+# (index name, table, column) for the material/option -> entry -> quote reverse lookups.
+# Names match what SQLModel generates for `index=True` on new databases.
+REVERSE_DEPENDENCY_INDEXES = [
+    ("ix_product_material_material_id", "product_material", "material_id"),
+    ("ix_variation_option_material_material_id", "variation_option_material", "material_id"),
+    ("ix_quote_product_entry_product_id", "quote_product_entry", "product_id"),
+    ("ix_quote_product_entry_variation_variation_option_id", "quote_product_entry_variation", "variation_option_id"),
+]
+
+# Foreign keys not covered by the leading column of another index.
+# Names match what SQLModel generates for `index=True` on new databases.
+FOREIGN_KEY_INDEXES = [
+    ("ix_quote_product_entry_quote_id", "quote_product_entry", "quote_id"),
+    ("ix_product_product_category_link_product_category_id", "product_product_category_link", "product_category_id"),
+]
+
+def _columns(connection: Connection, table_name: str) -> Dict[str, dict]:
+    """Reflected columns of a table by name; empty if the table does not exist."""
+    inspector = inspect(connection)
+    if not inspector.has_table(table_name):
+        return {}
+    return {column["name"]: column for column in inspector.get_columns(table_name)}
+
+def _make_material_unit_type_nullable(connection: Connection) -> None:
+    column = _columns(connection, "material").get("unit_type_id")
+    if connection.dialect.name == "postgresql" and column and not column["nullable"]:
+        connection.execute(text("ALTER TABLE material ALTER COLUMN unit_type_id DROP NOT NULL"))
+
+def _default_material_unit_type(connection: Connection) -> None:
+    column = _columns(connection, "material").get("unit_type_id")
+    if connection.dialect.name == "postgresql" and column and (column["default"] is None or "1" not in str(column["default"])):
+        connection.execute(text("ALTER TABLE material ALTER COLUMN unit_type_id SET DEFAULT 1"))
+
+def _add_calculated_quote_input_fingerprint(connection: Connection) -> None:
+    columns = _columns(connection, "calculated_quote")
+    if columns and "input_fingerprint" not in columns:
+        connection.execute(text("ALTER TABLE calculated_quote ADD COLUMN input_fingerprint VARCHAR(64)"))
+
+def _index_reverse_dependencies(connection: Connection) -> None:
+    inspector = inspect(connection)
+    for index_name, table_name, column_name in REVERSE_DEPENDENCY_INDEXES:
+        if inspector.has_table(table_name):
+            connection.execute(text(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({column_name})"))
+
+def _index_quote_updated_at(connection: Connection) -> None:
+    if inspect(connection).has_table("quote"):
+        connection.execute(text("CREATE INDEX IF NOT EXISTS ix_quote_updated_at_id ON quote (updated_at, id)"))
+
+def _add_cloned_from_entry_id(connection: Connection) -> None:
+    columns = _columns(connection, "quote_product_entry")
+    if columns and "cloned_from_entry_id" not in columns:
+        connection.execute(text("ALTER TABLE quote_product_entry ADD COLUMN cloned_from_entry_id INTEGER"))
+
+def _add_version_columns(connection: Connection) -> None:
+    for table_name in ("quote", "calculated_quote"):
+        columns = _columns(connection, table_name)
+        if columns and "version" not in columns:
+            connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+
+def _index_foreign_keys(connection: Connection) -> None:
+    inspector = inspect(connection)
+    for index_name, table_name, column_name in FOREIGN_KEY_INDEXES:
+        if inspector.has_table(table_name):
+            connection.execute(text(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({column_name})"))
+
+def _add_quote_ui_state_sequence(connection: Connection) -> None:
+    columns = _columns(connection, "quote")
+    if columns and "ui_state_sequence" not in columns:
+        connection.execute(text("ALTER TABLE quote ADD COLUMN ui_state_sequence BIGINT"))
+
+def _add_repricing_job_lease(connection: Connection) -> None:
+    columns = _columns(connection, "repricing_job")
+    if columns and "owner" not in columns:
+        connection.execute(text("ALTER TABLE repricing_job ADD COLUMN owner VARCHAR(100)"))
+    if columns and "heartbeat_at" not in columns:
+        connection.execute(text("ALTER TABLE repricing_job ADD COLUMN heartbeat_at TIMESTAMP WITH TIME ZONE"))
+
+# Append new migrations with the next version; never renumber or edit applied ones
+MIGRATIONS = [
+    Migration(1, "Make material.unit_type_id nullable", _make_material_unit_type_nullable),
+    Migration(2, "Default material.unit_type_id to 1", _default_material_unit_type),
+    Migration(3, "Add calculated_quote.input_fingerprint for skipping unchanged recalculations", _add_calculated_quote_input_fingerprint),
+    Migration(4, "Index the foreign keys used to find quotes affected by catalog changes", _index_reverse_dependencies),
+    Migration(5, "Composite index for keyset pagination of quote listings", _index_quote_updated_at),
+    Migration(6, "Source entry of cloned quote entries, used by set-based quote cloning", _add_cloned_from_entry_id),
+    Migration(7, "Optimistic concurrency version counters", _add_version_columns),
+    Migration(8, "Index the remaining foreign keys of hot lookups", _index_foreign_keys),
+    Migration(9, "Order ui_state writes so buffered values never replace newer ones", _add_quote_ui_state_sequence),
+    Migration(10, "Owner and heartbeat of running repricing jobs, for atomic claims", _add_repricing_job_lease),
+]
+
+def create_db_and_tables() -> bool:
+    """
+    Migrates the database to the current models and returns whether anything ran.
+    Cheap when the schema is current, so every worker can call it at startup.
+    """
+    # Import all models here before reading SQLModel.metadata
     # This ensures they are registered with SQLModel
     from . import models # noqa
-    
-    # Run migrations first
-    run_migrations()
-    
-    # Create tables
-    SQLModel.metadata.create_all(engine)
+
+    after_create = []
+    fingerprint_extra = []
+    # Notify the app of catalog edits made outside it (e.g. in NocoDB)
+    if engine.dialect.name == "postgresql":
+        from app.services.catalog_listener import CATALOG_TABLES, NOTIFY_FUNCTION_SQL, install_catalog_triggers
+        after_create.append(install_catalog_triggers)
+        fingerprint_extra.extend([NOTIFY_FUNCTION_SQL, *CATALOG_TABLES])
+
+    return migrate_schema(
+        engine, SQLModel.metadata, MIGRATIONS, after_create=after_create, fingerprint_extra=fingerprint_extra,
+    )
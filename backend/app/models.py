@@ -4,10 +4,12 @@ from pydantic import field_serializer, BaseModel as PydanticBaseModel, ConfigDic
 from sqlalchemy.types import TypeDecorator
 from sqlalchemy.dialects.postgresql import JSONB
 import json
-from typing import List, Optional, Any, Type # Added Any
+import threading
+import time
+from typing import Dict, List, Optional, Any, Type # Added Any
 from decimal import Decimal
 from sqlmodel import DDL, Computed, Field, SQLModel, Relationship
-from sqlalchemy import Column, Enum as SAEnum, Float, ForeignKey, Integer, String, Boolean, Text, func, UniqueConstraint, event # Add func, UniqueConstraint, SAEnum and event imports
+from sqlalchemy import BigInteger, Column, DateTime, Enum as SAEnum, Float, ForeignKey, Index, Integer, JSON, String, Boolean, Text, func, UniqueConstraint, event # Add func, UniqueConstraint, SAEnum and event imports
 
 #todo: check about using sql model enum type and sa_enum if exists and matters
 
@@ -125,6 +127,13 @@ class QuoteStatus(str, Enum):
     FINAL = "FINAL"        # Quote is finalized, read-only
     
 
+class RepricingJobStatus(str, Enum):
+    """Defines the lifecycle of a background repricing job."""
+    QUEUED = "QUEUED"        # Waiting for a worker (also after a graceful shutdown)
+    RUNNING = "RUNNING"
+    COMPLETED = "COMPLETED"
+    FAILED = "FAILED"
+
 class ProductRole(str, Enum):
     """Defines the role of a product within a quote."""
     DEFAULT = "DEFAULT"  # Default role for products
@@ -164,7 +173,7 @@ class ProductCategory(ProductCategoryBase, table=True):
 class ProductProductCategoryLink(SQLModel, table=True):
     __tablename__ = "product_product_category_link"
     product_id: int = Field(default=None, foreign_key="product.id", primary_key=True)
-    product_category_id: int = Field(default=None, foreign_key="product_category.id", primary_key=True)
+    product_category_id: int = Field(default=None, foreign_key="product_category.id", primary_key=True, index=True) # The primary key only serves product_id lookups
 
     product: "Product" = Relationship(back_populates="category_links")
     category: "ProductCategory" = Relationship(back_populates="product_links")
@@ -216,7 +225,7 @@ class ProductMaterialBase(SQLModel):
         )
     )
     product_id: int = Field(foreign_key="product.id")
-    material_id: int = Field(foreign_key="material.id")
+    material_id: int = Field(foreign_key="material.id", index=True) # Indexed for material -> quote lookups
     material_amount: Decimal = Field(max_digits=50, decimal_places=25)
 
 
@@ -261,7 +270,7 @@ set_product_material_name_trigger = DDL('''
 event.listen(
     ProductMaterial.__table__,
     'after_create',
-    set_product_material_name_trigger
+    set_product_material_name_trigger.execute_if(dialect='postgresql')
 )
 
 
@@ -309,7 +318,7 @@ class VariationOption(VariationOptionBase, table=True):
 class VariationOptionMaterialBase(SQLModel):
     id: Optional[int] = Field(default=None, primary_key=True) # Added id as surrogate PK
     variation_option_id: int = Field(foreign_key="variation_option.id")
-    material_id: int = Field(foreign_key="material.id")
+    material_id: int = Field(foreign_key="material.id", index=True) # Indexed for material -> quote lookups
     quantity_of_material_base_units_added: Decimal = Field(max_digits=10, decimal_places=3)
 
 class VariationOptionMaterial(VariationOptionMaterialBase, table=True):
@@ -368,8 +377,32 @@ class QuoteBase(SQLModel):
         sa_column_kwargs={"server_default": func.now(), "onupdate": func.now()}
     )
 
+def _version_column() -> Column:
+    """Optimistic concurrency counter: ORM updates check and bump it, so concurrent writers get a StaleDataError."""
+    return Column("version", Integer, nullable=False, default=1, server_default="1")
+
+_quote_version = _version_column()
+
+_ui_state_sequence_lock = threading.Lock()
+_last_ui_state_sequence = 0
+
+def next_ui_state_sequence() -> int:
+    """
+    Orders ui_state writes across processes: microseconds since the epoch, strictly
+    increasing within the process. A write only replaces a value with a lower number.
+    """
+    global _last_ui_state_sequence
+    with _ui_state_sequence_lock:
+        _last_ui_state_sequence = max(_last_ui_state_sequence + 1, time.time_ns() // 1000)
+        return _last_ui_state_sequence
+
 class Quote(QuoteBase, table=True):
     __tablename__ = "quote"
+    __table_args__ = (Index("ix_quote_updated_at_id", "updated_at", "id"),) # Keyset pagination of quote listings
+    __mapper_args__ = {"version_id_col": _quote_version}
+    version: int = Field(default=1, sa_column=_quote_version)
+    # next_ui_state_sequence() of the stored ui_state; buffered writes never replace a newer one
+    ui_state_sequence: Optional[int] = Field(default=None, sa_column=Column(BigInteger, nullable=True))
     quote_config: "QuoteConfig" = Relationship(back_populates="quotes")
     product_entries: List["QuoteProductEntry"] = Relationship(back_populates="quote", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
     calculated_quote: Optional["CalculatedQuote"] = Relationship(
@@ -378,10 +411,15 @@ class Quote(QuoteBase, table=True):
     )
 
 
+@event.listens_for(Quote.ui_state, "set")
+def _sequence_ui_state_write(target: Quote, value, oldvalue, initiator) -> None:
+    # Every ORM write of ui_state, e.g. a direct update, supersedes values buffered before it
+    target.ui_state_sequence = next_ui_state_sequence()
+
 class QuoteProductEntryBase(SQLModel):
     id: Optional[int] = Field(default=None, primary_key=True) # Moved id to top
-    quote_id: int = Field(foreign_key="quote.id")
-    product_id: int = Field(foreign_key="product.id") # ON DELETE RESTRICT is default if not specified for FK
+    quote_id: int = Field(foreign_key="quote.id", index=True) # Every quote read and calculation loads entries by quote
+    product_id: int = Field(foreign_key="product.id", index=True) # ON DELETE RESTRICT is default if not specified for FK
     quantity_of_product_units: Decimal = Field(max_digits=10, decimal_places=2)
     notes: Optional[str] = Field(default=None)
     role: ProductRole = Field(
@@ -395,6 +433,7 @@ class QuoteProductEntryBase(SQLModel):
 class QuoteProductEntry(QuoteProductEntryBase, table=True):
     __tablename__ = "quote_product_entry"
     id: Optional[int] = Field(default=None, primary_key=True)
+    cloned_from_entry_id: Optional[int] = Field(default=None) # Entry this one was copied from by a quote clone; no FK so the source can be deleted
 
     quote: "Quote" = Relationship(back_populates="product_entries")
     product: "Product" = Relationship(back_populates="quote_product_entries")
@@ -407,7 +446,7 @@ class QuoteProductEntry(QuoteProductEntryBase, table=True):
 class QuoteProductEntryVariationBase(SQLModel):
     id: Optional[int] = Field(default=None, primary_key=True) # Added id as surrogate PK
     quote_product_entry_id: int = Field(foreign_key="quote_product_entry.id")
-    variation_option_id: int = Field(foreign_key="variation_option.id") # ON DELETE RESTRICT
+    variation_option_id: int = Field(foreign_key="variation_option.id", index=True) # ON DELETE RESTRICT
 
 class QuoteProductEntryVariation(QuoteProductEntryVariationBase, table=True):
     __tablename__ = "quote_product_entry_variation"
@@ -437,9 +476,41 @@ class CalculatedQuoteBase(SQLModel):
         default_factory=lambda: datetime.now(timezone.utc), # Replaced datetime.utcnow
         sa_column_kwargs={"server_default": func.now()}
     )
+    input_fingerprint: Optional[str] = Field(default=None, max_length=64) # Hash of the inputs this result was calculated from
+
+_calculated_quote_version = _version_column()
 
 class CalculatedQuote(CalculatedQuoteBase, table=True):
     __tablename__ = "calculated_quote"
+    __mapper_args__ = {"version_id_col": _calculated_quote_version}
     id: Optional[int] = Field(default=None, primary_key=True)
+    version: int = Field(default=1, sa_column=_calculated_quote_version)
     quote: "Quote" = Relationship(back_populates="calculated_quote")
 
+
+class RepricingJobBase(SQLModel):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    status: RepricingJobStatus = Field(
+        default=RepricingJobStatus.QUEUED,
+        sa_column=Column(SAEnum(RepricingJobStatus), default=RepricingJobStatus.QUEUED, index=True)
+    )
+    quote_ids: List[int] = Field(default_factory=list, sa_column=Column(JSON))
+    force: bool = Field(default=False) # Recalculate even if a quote's inputs are unchanged
+    processed_count: int = Field(default=0) # Quote ids handled so far, in quote_ids order
+    calculated_count: int = Field(default=0)
+    unchanged_count: int = Field(default=0)
+    failed_quotes: Dict[str, str] = Field(default_factory=dict, sa_column=Column(JSON)) # quote id -> error
+    error: Optional[str] = Field(default=None) # Set when the job itself failed
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column_kwargs={"server_default": func.now()}
+    )
+    started_at: Optional[datetime] = Field(default=None)
+    finished_at: Optional[datetime] = Field(default=None)
+    owner: Optional[str] = Field(default=None, max_length=100) # Runner that claimed the job while it is RUNNING
+    # Renewed by the owner after every chunk; a RUNNING job whose heartbeat is older than the lease can be reclaimed
+    heartbeat_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True)))
+
+class RepricingJob(RepricingJobBase, table=True):
+    __tablename__ = "repricing_job"
+    id: Optional[int] = Field(default=None, primary_key=True)
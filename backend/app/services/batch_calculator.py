@@ -0,0 +1,137 @@
+import logging
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import tuple_, update
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlmodel import Session, select
+
+from app.models import CalculatedQuote, CalculatedQuoteBase, Quote, QuoteStatus
+from app.services.calc_timing import calc_phase
+from app.services.quote_calculator import QuoteCalculator, upsert_calculated_quotes
+from app.services.quote_loader import load_quotes_for_calculation
+
+logger = logging.getLogger("app.services.batch_calculator")
+
+class BatchCalculationResult(NamedTuple):
+    """
+    Outcome of a batch run: computed results by quote id, quotes whose stored result
+    was still current, and errors for the quotes that failed.
+    """
+    calculated: Dict[int, CalculatedQuoteBase]
+    unchanged: List[int]
+    failed: Dict[int, str]
+
+
+class BatchQuoteCalculator:
+    """
+    Recalculates many quotes with bulk reads and a single bulk write.
+
+    Quotes and the catalog graphs their plans need are loaded together, every quote is
+    computed by `QuoteCalculator` in fixed-point mode, and results are saved with one
+    version-checked status update, one `CalculatedQuote` upsert and one commit. Quotes whose
+    stored result has the same input fingerprint are skipped unless `force` is set. A quote
+    that fails to calculate, is final, or was edited since it was loaded is reported in
+    `failed` instead of aborting the batch.
+    """
+    def __init__(self, calculator: Optional[QuoteCalculator] = None):
+        self.calculator = calculator if calculator is not None else QuoteCalculator()
+
+    def calculate_quotes(
+        self, quote_ids: Iterable[int], session: Session, force: bool = False
+    ) -> BatchCalculationResult:
+        quote_ids = list(dict.fromkeys(quote_ids))
+        logger.info(f"Starting batch calculation for {len(quote_ids)} quotes")
+        with calc_phase("load"):
+            loaded = load_quotes_for_calculation(session, quote_ids, self.calculator.plan_cache)
+            self.calculator.plan_generation = loaded.plan_generation
+            self.calculator.resolve_plans(loaded.quotes)
+            quotes_by_id = {quote.id: quote for quote in loaded.quotes}
+            stored_fingerprints = {} if force else dict(session.exec(
+                select(CalculatedQuote.quote_id, CalculatedQuote.input_fingerprint)
+                .where(CalculatedQuote.quote_id.in_(list(quotes_by_id)))
+            ).all())
+
+        # Pure computation over the loaded rows, so it can run off the event loop
+        calculated, unchanged, failed = self.calculator.offload(
+            lambda: self._compute_quotes(quote_ids, quotes_by_id, stored_fingerprints)
+        )
+
+        try:
+            with calc_phase("commit"):
+                conflicts = self._save_results(list(calculated.values()), quotes_by_id, session)
+                session.commit()
+        except Exception as e:
+            logger.error(f"Error while saving batch calculation results: {str(e)}", exc_info=True)
+            session.rollback()
+            raise
+
+        for quote_id in conflicts:
+            del calculated[quote_id]
+            failed[quote_id] = f"Quote with id {quote_id} was changed by another request during the calculation"
+        if conflicts:
+            logger.warning(f"Skipped saving {len(conflicts)} quotes changed during batch calculation: {sorted(conflicts)}")
+
+        logger.info(
+            f"Batch calculation finished: {len(calculated)} calculated, {len(unchanged)} unchanged, {len(failed)} failed"
+        )
+        return BatchCalculationResult(calculated=calculated, unchanged=unchanged, failed=failed)
+
+    def _compute_quotes(
+        self, quote_ids: List[int], quotes_by_id: Dict[int, Quote], stored_fingerprints: Dict[int, str]
+    ) -> Tuple[Dict[int, CalculatedQuoteBase], List[int], Dict[int, str]]:
+        calculated: Dict[int, CalculatedQuoteBase] = {}
+        unchanged: List[int] = []
+        failed: Dict[int, str] = {}
+        for quote_id in quote_ids:
+            quote = quotes_by_id.get(quote_id)
+            if quote is None:
+                failed[quote_id] = f"Quote with id {quote_id} not found"
+                continue
+            if not quote.quote_config:
+                failed[quote_id] = f"QuoteConfig not found for Quote with id {quote_id}"
+                continue
+            if quote.status == QuoteStatus.FINAL:
+                failed[quote_id] = f"Quote with id {quote_id} is final and is not recalculated"
+                continue
+            try:
+                with calc_phase("fingerprint"):
+                    input_fingerprint = self.calculator.fingerprint_inputs(quote)
+                if quote.status == QuoteStatus.CALCULATED and stored_fingerprints.get(quote_id) == input_fingerprint:
+                    unchanged.append(quote_id)
+                    continue
+                calculated_quote_data = self.calculator._compute_calculated_quote(quote, fixed_point=True)
+                calculated_quote_data.input_fingerprint = input_fingerprint
+                calculated[quote_id] = calculated_quote_data
+            except ValueError as e:
+                logger.warning(f"Skipping Quote ID: {quote_id} in batch calculation: {str(e)}")
+                failed[quote_id] = str(e)
+        return calculated, unchanged, failed
+
+    @staticmethod
+    def _save_results(
+        results: List[CalculatedQuoteBase], quotes_by_id: Dict[int, Quote], session: Session
+    ) -> Set[int]:
+        """
+        Marks the quotes calculated, but only those still at the version they were loaded
+        with, then upserts the results of those quotes. Returns the ids of the quotes a
+        concurrent edit changed, whose results are not saved.
+        """
+        if not results:
+            return set()
+        loaded_versions = {result.quote_id: quotes_by_id[result.quote_id].version for result in results}
+        updated_ids = set(session.execute(
+            update(Quote)
+            .where(tuple_(Quote.id, Quote.version).in_(list(loaded_versions.items())))
+            .values(status=QuoteStatus.CALCULATED, version=Quote.version + 1)
+            .returning(Quote.id)
+            .execution_options(synchronize_session=False)
+        ).scalars())
+        for quote_id in updated_ids:
+            # Keep the loaded quotes in step with the row, so later ORM writes pass the version check
+            quote = quotes_by_id[quote_id]
+            set_committed_value(quote, "status", QuoteStatus.CALCULATED)
+            set_committed_value(quote, "version", loaded_versions[quote_id] + 1)
+        saved = [result for result in results if result.quote_id in updated_ids]
+        if saved:
+            upsert_calculated_quotes(saved, session)
+        return set(loaded_versions) - updated_ids
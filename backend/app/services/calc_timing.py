@@ -0,0 +1,154 @@
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Upper bounds in milliseconds; durations above the last one land in the "+Inf" bucket
+HISTOGRAM_BUCKETS_MS: Tuple[float, ...] = (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_NO_PHASE = nullcontext()
+_active_timing: ContextVar[Optional["CalcTiming"]] = ContextVar("calc_timing", default=None)
+_listener_lock = threading.Lock()
+_listener_installed = False
+
+
+class CalcTiming:
+    """Wall time and SQL statement count of each named phase of one calculation."""
+    def __init__(self):
+        self.durations: Dict[str, float] = {}
+        self.query_counts: Dict[str, int] = {}
+        self.total_queries = 0
+        self.elapsed: Optional[float] = None # Whole recorded block, including time outside phases
+        self._current: Optional[str] = None
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        outer = self._current
+        self._current = name
+        self.query_counts.setdefault(name, 0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[name] = self.durations.get(name, 0.0) + time.perf_counter() - start
+            self._current = outer
+
+    def count_query(self) -> None:
+        self.total_queries += 1
+        if self._current is not None:
+            self.query_counts[self._current] += 1
+
+    @property
+    def total(self) -> float:
+        return self.elapsed if self.elapsed is not None else sum(self.durations.values())
+
+    def header_value(self) -> str:
+        """Formats the phases like a Server-Timing header: `load;dur=1.204;sql=3, ...` (ms)."""
+        parts = [
+            f"{name};dur={seconds * 1000:.3f};sql={self.query_counts.get(name, 0)}"
+            for name, seconds in self.durations.items()
+        ]
+        parts.append(f"total;dur={self.total * 1000:.3f};sql={self.total_queries}")
+        return ", ".join(parts)
+
+
+def calc_phase(name: str):
+    """
+    Times the enclosed block as phase `name` of the active calculation. Without an
+    active `record_calc_timing` this is a single context variable lookup.
+    """
+    timing = _active_timing.get()
+    if timing is None:
+        return _NO_PHASE
+    return timing.phase(name)
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    timing = _active_timing.get()
+    if timing is not None:
+        timing.count_query()
+
+
+def _install_query_listener() -> None:
+    # Installed on first use so statements are not intercepted while timing is never enabled
+    global _listener_installed
+    with _listener_lock:
+        if not _listener_installed:
+            event.listen(Engine, "before_cursor_execute", _count_query)
+            _listener_installed = True
+
+
+@contextmanager
+def record_calc_timing(enabled: bool = True) -> Iterator[Optional[CalcTiming]]:
+    """
+    Collects the phases timed by `calc_phase` in the current context and, if the block
+    succeeds, adds them to `calc_timing_histogram`. Yields None when not enabled.
+    """
+    if not enabled:
+        yield None
+        return
+    _install_query_listener()
+    timing = CalcTiming()
+    token = _active_timing.set(timing)
+    start = time.perf_counter()
+    try:
+        yield timing
+    finally:
+        timing.elapsed = time.perf_counter() - start
+        _active_timing.reset(token)
+    calc_timing_histogram.observe(timing)
+
+
+class CalcTimingHistogram:
+    """Thread-safe per-phase duration histogram over all recorded calculations."""
+    def __init__(self, buckets_ms: Tuple[float, ...] = HISTOGRAM_BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        self._lock = threading.Lock()
+        self._phases: Dict[str, Dict] = {}
+
+    def _observe_phase(self, name: str, milliseconds: float, queries: int) -> None:
+        phase = self._phases.get(name)
+        if phase is None:
+            phase = self._phases[name] = {
+                "count": 0, "sum_ms": 0.0, "sql_queries": 0, "buckets": [0] * (len(self.buckets_ms) + 1),
+            }
+        phase["count"] += 1
+        phase["sum_ms"] += milliseconds
+        phase["sql_queries"] += queries
+        index = next((i for i, bound in enumerate(self.buckets_ms) if milliseconds <= bound), len(self.buckets_ms))
+        phase["buckets"][index] += 1
+
+    def observe(self, timing: CalcTiming) -> None:
+        with self._lock:
+            for name, seconds in timing.durations.items():
+                self._observe_phase(name, seconds * 1000, timing.query_counts.get(name, 0))
+            self._observe_phase("total", timing.total * 1000, timing.total_queries)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Returns count, sum and cumulative bucket counts (keyed by upper bound) per phase."""
+        labels: List[str] = [str(bound) for bound in self.buckets_ms] + ["+Inf"]
+        with self._lock:
+            result = {}
+            for name, phase in self._phases.items():
+                cumulative, buckets = 0, {}
+                for label, count in zip(labels, phase["buckets"]):
+                    cumulative += count
+                    buckets[label] = cumulative
+                result[name] = {
+                    "count": phase["count"],
+                    "sum_ms": round(phase["sum_ms"], 3),
+                    "sql_queries": phase["sql_queries"],
+                    "buckets_ms": buckets,
+                }
+            return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._phases.clear()
+
+
+calc_timing_histogram = CalcTimingHistogram()
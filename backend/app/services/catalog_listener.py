@@ -0,0 +1,245 @@
+import json
+import logging
+import select
+import threading
+import uuid
+from typing import Any, Dict, Iterable, Optional, Set
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import Session
+from sqlmodel import select as sql_select
+
+from app.models import ProductMaterial, VariationGroup, VariationOptionMaterial
+from app.services.pricing_plan import PricingPlanCache
+from app.services.product_configurator import ProductConfiguratorCache
+
+logger = logging.getLogger("app.services.catalog_listener")
+
+CATALOG_CHANNEL = "catalog_changes"
+
+# Tables whose rows end up in compiled pricing plans, configurator trees or catalog listings
+CATALOG_TABLES = (
+    "unit_type",
+    "material",
+    "product",
+    "product_material",
+    "variation_group",
+    "variation_option",
+    "variation_option_material",
+    "product_category",
+    "product_product_category_link",
+)
+
+# Sends the table, operation and the id / *_id columns of the old and new row, which is
+# all the listener needs and keeps payloads far below the 8000 byte NOTIFY limit.
+NOTIFY_FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION notify_catalog_change() RETURNS trigger AS $$
+DECLARE
+    new_keys jsonb;
+    old_keys jsonb;
+BEGIN
+    IF TG_OP <> 'DELETE' THEN
+        SELECT jsonb_object_agg(key, value) INTO new_keys
+        FROM jsonb_each(to_jsonb(NEW)) WHERE key = 'id' OR key LIKE '%\\_id';
+    END IF;
+    IF TG_OP <> 'INSERT' THEN
+        SELECT jsonb_object_agg(key, value) INTO old_keys
+        FROM jsonb_each(to_jsonb(OLD)) WHERE key = 'id' OR key LIKE '%\\_id';
+    END IF;
+    PERFORM pg_notify('{CATALOG_CHANNEL}', jsonb_build_object(
+        'table', TG_TABLE_NAME, 'op', TG_OP, 'new', new_keys, 'old', old_keys
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def install_catalog_triggers(connection: Connection) -> None:
+    """Creates (or replaces) the NOTIFY trigger on every catalog table. PostgreSQL only; does not commit."""
+    connection.execute(text(NOTIFY_FUNCTION_SQL))
+    for table_name in CATALOG_TABLES:
+        connection.execute(text(f"DROP TRIGGER IF EXISTS catalog_change_notify ON {table_name}"))
+        connection.execute(text(
+            f"CREATE TRIGGER catalog_change_notify AFTER INSERT OR UPDATE OR DELETE ON {table_name} "
+            f"FOR EACH ROW EXECUTE PROCEDURE notify_catalog_change()"
+        ))
+
+
+def _ids(change: Dict[str, Any], key: str) -> Set[int]:
+    """Collects `key` from the old and new row of a change, e.g. both products of a moved group."""
+    values = set()
+    for row in (change.get("new"), change.get("old")):
+        if row and row.get(key) is not None:
+            values.add(int(row[key]))
+    return values
+
+
+class CatalogChangeHandler:
+    """
+    Applies catalog change notifications to the in-process caches.
+
+    Compiled pricing plans and configurator trees are immutable snapshots of catalog
+    rows; a change drops exactly the snapshots built from the changed row, so the next
+    request rebuilds them from the database. `version` counts applied changes.
+
+    `catalog_version` identifies the catalog state for HTTP validators. It is only
+    available while `live`, i.e. while a listener guarantees every change is counted,
+    and includes an epoch that changes on `clear` so processes never share a value.
+    """
+    def __init__(self, engine: Engine, plan_cache: PricingPlanCache, configurator_cache: ProductConfiguratorCache):
+        self.engine = engine
+        self.plan_cache = plan_cache
+        self.configurator_cache = configurator_cache
+        self.version = 0
+        self.epoch = uuid.uuid4().hex
+        self.live = False
+        self._lock = threading.Lock()
+
+    @property
+    def catalog_version(self) -> Optional[str]:
+        if not self.live:
+            return None
+        with self._lock:
+            return f"{self.epoch}:{self.version}"
+
+    def clear(self) -> None:
+        """Drops every snapshot, e.g. after notifications may have been missed."""
+        self.plan_cache.clear()
+        self.configurator_cache.clear()
+        with self._lock:
+            self.epoch = uuid.uuid4().hex
+            self.version += 1
+
+    def _invalidate_products(self, product_ids: Iterable[int], plans: bool = True, configurators: bool = True) -> None:
+        for product_id in product_ids:
+            if plans:
+                self.plan_cache.invalidate_product(product_id)
+            if configurators:
+                self.configurator_cache.invalidate(product_id)
+
+    def _invalidate_options(self, variation_option_ids: Iterable[int]) -> None:
+        for variation_option_id in variation_option_ids:
+            self.plan_cache.invalidate_option(variation_option_id)
+
+    def _group_product_ids(self, variation_group_ids: Set[int]) -> Set[int]:
+        if not variation_group_ids:
+            return set()
+        with Session(self.engine) as session:
+            return set(session.exec(
+                sql_select(VariationGroup.product_id).where(VariationGroup.id.in_(variation_group_ids))
+            ).all())
+
+    def _material_dependents(self, material_ids: Set[int]) -> None:
+        with Session(self.engine) as session:
+            product_ids = session.exec(
+                sql_select(ProductMaterial.product_id).where(ProductMaterial.material_id.in_(material_ids))
+            ).all()
+            variation_option_ids = session.exec(
+                sql_select(VariationOptionMaterial.variation_option_id)
+                .where(VariationOptionMaterial.material_id.in_(material_ids))
+            ).all()
+        self._invalidate_products(set(product_ids), configurators=False)
+        self._invalidate_options(set(variation_option_ids))
+
+    def apply(self, change: Dict[str, Any]) -> None:
+        table = change.get("table")
+        if table == "unit_type":
+            # Unit names are copied into plan lines and configurator trees
+            self.plan_cache.clear()
+            self.configurator_cache.clear()
+        elif table == "material":
+            # Deleted materials also remove their product/option links, which notify on their own
+            self._material_dependents(_ids(change, "id"))
+        elif table == "product":
+            self._invalidate_products(_ids(change, "id"))
+        elif table == "product_material":
+            self._invalidate_products(_ids(change, "product_id"), configurators=False)
+        elif table == "variation_group":
+            self._invalidate_products(_ids(change, "product_id"), plans=False)
+        elif table == "variation_option":
+            self._invalidate_options(_ids(change, "id"))
+            self._invalidate_products(self._group_product_ids(_ids(change, "variation_group_id")), plans=False)
+        elif table == "variation_option_material":
+            self._invalidate_options(_ids(change, "variation_option_id"))
+        elif table in ("product_category", "product_product_category_link"):
+            pass # Category listings are not cached in process; only the version changes
+        else:
+            logger.warning(f"Ignoring catalog change for unknown table: {table}")
+            return
+        with self._lock:
+            self.version += 1
+        logger.debug(f"Applied catalog change {change}; catalog version {self.version}")
+
+
+class CatalogChangeListener:
+    """
+    Background thread that LISTENs on `catalog_changes` and feeds CatalogChangeHandler.
+
+    While connected, changes made anywhere (including NocoDB) reach the caches within
+    `poll_seconds`, so the caches stop expiring entries on their own. On every
+    (re)connect the caches are cleared because notifications may have been missed; when
+    the listener stops, the caches' TTLs are restored.
+    """
+    def __init__(self, engine: Engine, handler: CatalogChangeHandler, poll_seconds: float = 1.0, retry_seconds: float = 5.0):
+        self.engine = engine
+        self.handler = handler
+        self.poll_seconds = poll_seconds
+        self.retry_seconds = retry_seconds
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._ttls = (handler.plan_cache.ttl_seconds, handler.configurator_cache.ttl_seconds)
+
+    def start(self) -> None:
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="catalog-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout if timeout is not None else self.poll_seconds + 1)
+            self._thread = None
+        self._trust_caches(False)
+
+    def _trust_caches(self, trusted: bool) -> None:
+        plan_ttl, configurator_ttl = (None, None) if trusted else self._ttls
+        self.handler.plan_cache.ttl_seconds = plan_ttl
+        self.handler.configurator_cache.ttl_seconds = configurator_ttl
+        self.handler.live = trusted
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                self._listen()
+            except Exception as e:
+                logger.error(f"Catalog listener disconnected: {str(e)}", exc_info=True)
+            self._trust_caches(False)
+            self._stopping.wait(self.retry_seconds)
+
+    def _listen(self) -> None:
+        raw_connection = self.engine.raw_connection()
+        try:
+            dbapi_connection = raw_connection.driver_connection
+            dbapi_connection.autocommit = True
+            with dbapi_connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {CATALOG_CHANNEL}")
+            self.handler.clear()
+            self._trust_caches(True)
+            logger.info(f"Listening for catalog changes on channel '{CATALOG_CHANNEL}'")
+
+            while not self._stopping.is_set():
+                if select.select([dbapi_connection], [], [], self.poll_seconds) == ([], [], []):
+                    continue
+                dbapi_connection.poll()
+                while dbapi_connection.notifies:
+                    notification = dbapi_connection.notifies.pop(0)
+                    try:
+                        self.handler.apply(json.loads(notification.payload))
+                    except Exception as e:
+                        # A change we could not apply precisely must not leave stale snapshots behind
+                        logger.error(f"Failed to apply catalog change {notification.payload}: {str(e)}", exc_info=True)
+                        self.handler.clear()
+        finally:
+            raw_connection.invalidate()
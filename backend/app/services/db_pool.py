@@ -0,0 +1,184 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+# Checkouts that wait longer than this count as having waited for a connection
+WAIT_THRESHOLD_SECONDS = 0.001
+
+
+class PoolWaitStats:
+    """Thread-safe counters of how long checkouts waited for a pooled connection."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.checkouts = 0
+            self.waited = 0
+            self.timeouts = 0
+            self.total_wait = 0.0
+            self.max_wait = 0.0
+
+    def observe(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            if seconds > WAIT_THRESHOLD_SECONDS:
+                self.waited += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "waited": self.waited,
+                "timeouts": self.timeouts,
+                "total_wait_ms": round(self.total_wait * 1000, 3),
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+            }
+
+
+pool_wait_stats = PoolWaitStats()
+async_pool_wait_stats = PoolWaitStats()
+replica_pool_wait_stats = PoolWaitStats()
+async_replica_pool_wait_stats = PoolWaitStats()
+
+
+class _TimedCheckoutMixin:
+    """
+    Records how long each checkout waited for a connection in the class's `wait_stats`,
+    including checkouts that gave up after `pool_timeout`. Pools recreated after a
+    dispose keep reporting to the same counters.
+    """
+    wait_stats: PoolWaitStats
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.wait_stats.observe(time.perf_counter() - start, timed_out=True)
+            raise
+        self.wait_stats.observe(time.perf_counter() - start)
+        return connection
+
+
+class TimedQueuePool(_TimedCheckoutMixin, QueuePool):
+    wait_stats = pool_wait_stats
+
+
+class TimedAsyncAdaptedQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    wait_stats = async_pool_wait_stats
+
+
+def _pool_class(base: type, wait_stats: Optional[PoolWaitStats]) -> type:
+    """`base`, or a subclass of it reporting to `wait_stats`, e.g. for a replica's pool."""
+    if wait_stats is None:
+        return base
+    return type(base.__name__, (base,), {"wait_stats": wait_stats})
+
+
+def create_pooled_engine(
+    url: str,
+    pool_size: int = 5,
+    max_overflow: int = 10,
+    pool_timeout: float = 30.0,
+    pool_pre_ping: bool = True,
+    pool_recycle: int = 1800,
+    statement_timeout_ms: int = 0,
+    echo: bool = False,
+    wait_stats: Optional[PoolWaitStats] = None,
+) -> Engine:
+    """
+    Creates the application engine on a TimedQueuePool. `statement_timeout_ms` sets the
+    PostgreSQL statement_timeout of every connection (0 leaves the server default), and
+    `wait_stats` replaces `pool_wait_stats` as the pool's checkout counters.
+    """
+    connect_args: Dict[str, Any] = {}
+    if statement_timeout_ms and make_url(url).get_backend_name() == "postgresql":
+        connect_args["options"] = f"-c statement_timeout={statement_timeout_ms}"
+    return create_engine(
+        url,
+        poolclass=_pool_class(TimedQueuePool, wait_stats),
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+        pool_pre_ping=pool_pre_ping,
+        pool_recycle=pool_recycle,
+        connect_args=connect_args,
+        echo=echo,
+    )
+
+
+def create_pooled_async_engine(
+    url: str,
+    pool_size: int = 5,
+    max_overflow: int = 10,
+    pool_timeout: float = 30.0,
+    pool_pre_ping: bool = True,
+    pool_recycle: int = 1800,
+    statement_timeout_ms: int = 0,
+    echo: bool = False,
+    wait_stats: Optional[PoolWaitStats] = None,
+) -> AsyncEngine:
+    """Async counterpart of `create_pooled_engine`, for asyncpg URLs."""
+    connect_args: Dict[str, Any] = {}
+    if statement_timeout_ms and make_url(url).get_backend_name() == "postgresql":
+        connect_args["server_settings"] = {"statement_timeout": str(statement_timeout_ms)}
+    return create_async_engine(
+        url,
+        poolclass=_pool_class(TimedAsyncAdaptedQueuePool, wait_stats),
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+        pool_pre_ping=pool_pre_ping,
+        pool_recycle=pool_recycle,
+        connect_args=connect_args,
+        echo=echo,
+    )
+
+
+def pool_status(pool: Pool) -> Dict[str, Optional[Any]]:
+    """Live occupancy of a pool plus the checkout wait counters; sizes are None for non-queue pools."""
+    status: Dict[str, Optional[Any]] = {
+        "pool_class": type(pool).__name__,
+        "pool_size": None,
+        "max_overflow": None,
+        "checked_out": None,
+        "checked_in": None,
+        "overflow": None,
+    }
+    if isinstance(pool, QueuePool):
+        status.update(
+            pool_size=pool.size(),
+            max_overflow=pool._max_overflow,
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            # Negative while the pool has not yet opened pool_size connections
+            overflow=pool.overflow(),
+        )
+    wait_stats = getattr(pool, "wait_stats", None)
+    status["wait"] = wait_stats.snapshot() if wait_stats is not None else None
+    return status
+
+
+def engine_pool_metrics(
+    engine: Engine, async_engine: AsyncEngine, replica_engine: Engine, async_replica_engine: AsyncEngine,
+) -> Dict[str, Dict[str, Optional[Any]]]:
+    """`pool_status` of every pool; the replica pools are listed only when a replica is configured."""
+    metrics = {"sync": pool_status(engine.pool), "async": pool_status(async_engine.sync_engine.pool)}
+    if replica_engine is not engine:
+        metrics["replica"] = pool_status(replica_engine.pool)
+    if async_replica_engine is not async_engine:
+        metrics["async_replica"] = pool_status(async_replica_engine.sync_engine.pool)
+    return metrics
@@ -0,0 +1,236 @@
+"""
+Scaled-integer evaluation of the calculator's labor and bill-of-materials arithmetic.
+
+Every Decimal is split into an integer coefficient and a power-of-ten exponent (plan
+values once, when the plan is compiled), and sums, products, `math.ceil` and
+ROUND_HALF_UP quantization are then done on plain Python ints. The results are converted back to Decimal with the
+exact exponent and sign the Decimal code path would have produced, so both modes give
+byte-identical BOM JSON and totals.
+
+Decimal arithmetic only matches exact integer arithmetic while no intermediate result
+needs more digits than the context precision. Each sum tracks the magnitude of its
+terms to prove that; when it cannot be proven, FixedPointOverflow is raised and the
+caller falls back to Decimal.
+"""
+from decimal import Decimal, ROUND_HALF_EVEN, getcontext
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Sequence, Tuple
+
+from app.models import BillOfMaterialEntry
+
+if TYPE_CHECKING:  # pricing_plan imports to_scaled from here
+    from app.services.pricing_plan import OptionPricingPlan, PlanLine, ProductPricingPlan
+
+LEFTOVER_EXPONENT = -4  # quantize_decimal precision "0.0001"
+COST_EXPONENT = -2  # final_quantize_decimal precision "0.01"
+
+
+class FixedPointOverflow(ArithmeticError):
+    """A value needs more digits than Decimal would keep, so integer results could differ."""
+
+
+class EntryPlans(NamedTuple):
+    """The plans and quantity of one quote entry, in the order the calculator visits them."""
+    product_plan: "ProductPricingPlan"
+    option_plans: Tuple["OptionPricingPlan", ...]
+    product_quantity: Decimal
+
+
+class FixedPointTotals(NamedTuple):
+    total_labor_cost: Decimal
+    total_material_cost: Decimal
+    bill_of_materials: List[BillOfMaterialEntry]
+
+
+def to_scaled(value: Decimal) -> Tuple[int, int]:
+    """Splits a finite Decimal into (coefficient, exponent) with value == coefficient * 10**exponent."""
+    sign, digits, exponent = value.as_tuple()
+    if not isinstance(exponent, int):
+        raise FixedPointOverflow(f"Cannot represent {value} as a scaled integer")
+    coefficient = int("".join(map(str, digits))) if digits else 0
+    return (-coefficient if sign else coefficient), exponent
+
+
+def _digits(n: int) -> int:
+    return len(str(abs(n)))
+
+
+def _check_precision(n: int) -> None:
+    if _digits(n) > getcontext().prec:
+        raise FixedPointOverflow("Value exceeds the decimal context precision")
+
+
+def from_scaled(coefficient: int, exponent: int, negative_zero: bool = False) -> Decimal:
+    value = Decimal(coefficient).scaleb(exponent)
+    return value.copy_negate() if negative_zero and coefficient == 0 else value
+
+
+def round_half_up(coefficient: int, exponent: int, target_exponent: int) -> Tuple[int, bool]:
+    """
+    Rounds coefficient * 10**exponent to a multiple of 10**target_exponent like
+    Decimal.quantize(..., ROUND_HALF_UP). Returns the new coefficient and whether the
+    input was negative, since Decimal keeps the sign of values that round to zero.
+    """
+    negative = coefficient < 0
+    if exponent >= target_exponent:
+        return coefficient * 10 ** (exponent - target_exponent), negative
+    divisor = 10 ** (target_exponent - exponent)
+    quotient, remainder = divmod(abs(coefficient), divisor)
+    if 2 * remainder >= divisor:
+        quotient += 1
+    _check_precision(quotient)
+    return (-quotient if negative else quotient), negative
+
+
+def _round_to_context(coefficient: int, exponent: int) -> Tuple[int, int]:
+    """Applies the rounding Decimal multiplication does when a product exceeds the precision."""
+    excess = _digits(coefficient) - getcontext().prec
+    if excess <= 0:
+        return coefficient, exponent
+    if getcontext().rounding != ROUND_HALF_EVEN:
+        raise FixedPointOverflow("Only the default ROUND_HALF_EVEN context rounding is emulated")
+    divisor = 10 ** excess
+    quotient, remainder = divmod(abs(coefficient), divisor)
+    if 2 * remainder > divisor or (2 * remainder == divisor and quotient % 2):
+        quotient += 1
+    return (-quotient if coefficient < 0 else quotient), exponent + excess
+
+
+class FixedSum:
+    """Exact sum of scaled integers, started from Decimal(0) like the Decimal code path."""
+    __slots__ = ("value", "magnitude", "exponent")
+
+    def __init__(self):
+        self.value = 0
+        self.magnitude = 0
+        self.exponent = 0
+
+    def add(self, coefficient: int, exponent: int) -> None:
+        if exponent < self.exponent:
+            scale = 10 ** (self.exponent - exponent)
+            self.value *= scale
+            self.magnitude *= scale
+            self.exponent = exponent
+        elif exponent > self.exponent:
+            coefficient *= 10 ** (exponent - self.exponent)
+        self.value += coefficient
+        self.magnitude += abs(coefficient)
+
+    def to_decimal(self) -> Decimal:
+        # Every partial sum is bounded by the sum of absolute terms
+        _check_precision(self.magnitude)
+        return from_scaled(self.value, self.exponent)
+
+
+class _BomLine:
+    __slots__ = ("plan_line", "quantity", "cull_units")
+
+    def __init__(self, plan_line: "PlanLine"):
+        self.plan_line = plan_line
+        self.quantity = FixedSum()
+        self.cull_units = FixedSum()
+
+
+def _accumulate(
+    bom: Dict[Tuple[int, str], _BomLine],
+    lines: Sequence["PlanLine"],
+    quantity_coefficient: int,
+    quantity_exponent: int,
+    cull_added_only: bool,
+) -> None:
+    for line in lines:
+        amount_coefficient, amount_exponent = line.amount_scaled
+        coefficient = amount_coefficient * quantity_coefficient
+        exponent = amount_exponent + quantity_exponent
+
+        bom_key = (line.material_id, line.unit_name)
+        bom_line = bom.get(bom_key)
+        if bom_line is None:
+            bom_line = bom[bom_key] = _BomLine(line)
+
+        # Variations apply cull only to added quantities, not removed (negative) ones
+        if line.cull_rate is not None and (not cull_added_only or coefficient > 0):
+            rate_coefficient, rate_exponent = line.cull_rate_scaled
+            cull_coefficient = coefficient * rate_coefficient
+            cull_exponent = exponent + rate_exponent
+            bom_line.cull_units.add(cull_coefficient, cull_exponent)
+            bom_line.quantity.add(coefficient, exponent)
+            bom_line.quantity.add(cull_coefficient, cull_exponent)
+        else:
+            # quantity + Decimal(0) also picks up Decimal(0)'s exponent, which the sum already has
+            bom_line.quantity.add(coefficient, exponent)
+
+
+def _finalize_bom_line(bom_line: _BomLine, round_up_materials: bool) -> BillOfMaterialEntry:
+    quantity = bom_line.quantity
+    _check_precision(quantity.magnitude)
+    if round_up_materials:
+        if quantity.exponent >= 0:
+            rounded = quantity.value * 10 ** quantity.exponent
+        else:
+            rounded = -((-quantity.value) // 10 ** -quantity.exponent)
+        leftover = rounded * 10 ** -quantity.exponent - quantity.value if quantity.exponent < 0 else 0
+        if leftover > 0:
+            leftover_coefficient, _ = round_half_up(leftover, quantity.exponent, LEFTOVER_EXPONENT)
+            leftovers = from_scaled(leftover_coefficient, LEFTOVER_EXPONENT)
+        else:
+            leftovers = Decimal(0)
+        final_quantity = Decimal(rounded)
+        quantity_coefficient, quantity_exponent = rounded, 0
+    else:
+        leftovers = Decimal(0)
+        final_quantity = quantity.to_decimal()
+        quantity_coefficient, quantity_exponent = quantity.value, quantity.exponent
+
+    cull_units = bom_line.cull_units
+    _check_precision(cull_units.magnitude)
+    cull_coefficient, cull_negative = round_half_up(cull_units.value, cull_units.exponent, LEFTOVER_EXPONENT)
+
+    unit_cost = bom_line.plan_line.unit_cost
+    cost_coefficient, cost_exponent = bom_line.plan_line.unit_cost_scaled
+    product_coefficient, product_exponent = _round_to_context(
+        quantity_coefficient * cost_coefficient, quantity_exponent + cost_exponent
+    )
+    total_coefficient, _ = round_half_up(product_coefficient, product_exponent, COST_EXPONENT)
+    # A Decimal product takes the XOR of the operand signs even when it is zero
+    total_negative = (quantity_coefficient < 0) != unit_cost.is_signed()
+
+    return BillOfMaterialEntry(
+        material_name=bom_line.plan_line.material_name,
+        quantity=final_quantity,
+        unit_cost=unit_cost,
+        total_cost=from_scaled(total_coefficient, COST_EXPONENT, negative_zero=total_negative),
+        unit_name=bom_line.plan_line.unit_name,
+        cull_units=from_scaled(cull_coefficient, LEFTOVER_EXPONENT, negative_zero=cull_negative),
+        leftovers=leftovers,
+    )
+
+
+def compute_fixed_point_totals(entries: Sequence[EntryPlans], round_up_materials: bool) -> FixedPointTotals:
+    """
+    Aggregates labor and materials for a quote's entries and finalizes the BOM (ceil,
+    leftovers, cull and cost rounding) in scaled integers.
+    """
+    labor = FixedSum()
+    bom: Dict[Tuple[int, str], _BomLine] = {}
+    for entry in entries:
+        quantity_coefficient, quantity_exponent = to_scaled(entry.product_quantity)
+        labor_coefficient, labor_exponent = entry.product_plan.unit_labor_cost_scaled
+        labor.add(labor_coefficient * quantity_coefficient, labor_exponent + quantity_exponent)
+        _accumulate(bom, entry.product_plan.lines, quantity_coefficient, quantity_exponent, cull_added_only=False)
+        for option_plan in entry.option_plans:
+            labor_coefficient, labor_exponent = option_plan.additional_labor_cost_scaled
+            labor.add(labor_coefficient * quantity_coefficient, labor_exponent + quantity_exponent)
+            _accumulate(bom, option_plan.lines, quantity_coefficient, quantity_exponent, cull_added_only=True)
+
+    material_cost = FixedSum()
+    bill_of_materials = []
+    for bom_line in bom.values():
+        bom_entry = _finalize_bom_line(bom_line, round_up_materials)
+        material_cost.add(*to_scaled(bom_entry.total_cost))
+        bill_of_materials.append(bom_entry)
+
+    return FixedPointTotals(
+        total_labor_cost=labor.to_decimal(),
+        total_material_cost=material_cost.to_decimal(),
+        bill_of_materials=bill_of_materials,
+    )
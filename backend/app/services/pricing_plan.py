@@ -0,0 +1,178 @@
+import hashlib
+import threading
+import time
+from decimal import Decimal
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from app.models import Material, Product, VariationOption
+from app.services.fixed_point import to_scaled
+
+# How long a compiled plan is trusted before it is rebuilt from the database.
+# The catalog can be edited outside this process (NocoDB), so plans must not live forever.
+PLAN_TTL_SECONDS = 60.0
+
+
+class PlanLine(NamedTuple):
+    """One precomputed material line: everything the calculator needs per product unit."""
+    material_id: int
+    material_name: str
+    unit_name: str
+    amount: Decimal  # Material base units per product unit (negative removes material)
+    cull_rate: Optional[Decimal]  # None when the material has no cull
+    unit_cost: Decimal  # Cost per material base unit
+    # The same values as (coefficient, exponent) pairs for fixed-point calculation
+    amount_scaled: Tuple[int, int]
+    cull_rate_scaled: Optional[Tuple[int, int]]
+    unit_cost_scaled: Tuple[int, int]
+
+
+class ProductPricingPlan(NamedTuple):
+    """Flat pricing plan for a product's base labor and materials."""
+    product_id: Optional[int]
+    unit_labor_cost: Decimal
+    lines: Tuple[PlanLine, ...]
+    unit_labor_cost_scaled: Tuple[int, int]
+    fingerprint: str  # Digest of everything above, for quote input fingerprints
+
+
+class OptionPricingPlan(NamedTuple):
+    """Flat pricing plan for the labor and materials a variation option adds."""
+    variation_option_id: Optional[int]
+    additional_labor_cost: Decimal
+    lines: Tuple[PlanLine, ...]
+    additional_labor_cost_scaled: Tuple[int, int]
+    fingerprint: str  # Digest of everything above, for quote input fingerprints
+
+
+def material_cost_per_base_unit(material: Material) -> Decimal:
+    if material.quantity_in_supplier_unit == Decimal(0):
+        # Avoid division by zero if quantity_in_supplier_unit is zero
+        return Decimal(0)
+    return material.cost_per_supplier_unit / material.quantity_in_supplier_unit
+
+
+def _fingerprint(*parts) -> str:
+    # repr keeps Decimal exponents, which show up in the calculated output
+    return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+
+def _compile_line(material: Material, amount: Decimal) -> PlanLine:
+    cull_rate = None
+    if material.cull_rate and material.cull_rate > 0:
+        cull_rate = Decimal(str(material.cull_rate))
+    unit_cost = material_cost_per_base_unit(material)
+    return PlanLine(
+        material_id=material.id,
+        material_name=material.name,
+        unit_name=material.unit_type.name,
+        amount=amount,
+        cull_rate=cull_rate,
+        unit_cost=unit_cost,
+        amount_scaled=to_scaled(amount),
+        cull_rate_scaled=to_scaled(cull_rate) if cull_rate is not None else None,
+        unit_cost_scaled=to_scaled(unit_cost),
+    )
+
+
+def compile_product_plan(product: Product) -> ProductPricingPlan:
+    """Walks a product's materials once and flattens them into a ProductPricingPlan."""
+    lines = []
+    for pm in product.product_materials:
+        material = pm.material
+        if not material or not material.unit_type:
+            raise ValueError(f"Material or its unit type not found for ProductMaterial id {pm.id}")
+        lines.append(_compile_line(material, pm.material_amount))
+    lines = tuple(lines)
+    return ProductPricingPlan(
+        product_id=product.id,
+        unit_labor_cost=product.unit_labor_cost,
+        lines=lines,
+        unit_labor_cost_scaled=to_scaled(product.unit_labor_cost),
+        fingerprint=_fingerprint("product", product.id, product.unit_labor_cost, lines),
+    )
+
+
+def compile_option_plan(variation_option: VariationOption) -> OptionPricingPlan:
+    """Walks a variation option's materials once and flattens them into an OptionPricingPlan."""
+    lines = []
+    for vom in variation_option.variation_option_materials:
+        material = vom.material
+        if not material or not material.unit_type:
+            raise ValueError(f"Material or its unit type not found for VariationOptionMaterial id {vom.id}")
+        lines.append(_compile_line(material, vom.quantity_of_material_base_units_added))
+    lines = tuple(lines)
+    return OptionPricingPlan(
+        variation_option_id=variation_option.id,
+        additional_labor_cost=variation_option.additional_labor_cost_per_product_unit,
+        lines=lines,
+        additional_labor_cost_scaled=to_scaled(variation_option.additional_labor_cost_per_product_unit),
+        fingerprint=_fingerprint("option", variation_option.id, variation_option.additional_labor_cost_per_product_unit, lines),
+    )
+
+
+class PricingPlanCache:
+    """
+    Thread-safe cache of compiled product and variation option plans.
+
+    Entries expire after `ttl_seconds` and are dropped explicitly when the
+    catalog is edited through the CRUD API. Every drop bumps `generation`; a plan
+    put with the generation read before its rows were loaded is discarded if a
+    drop happened in between, since it may have been compiled from the old rows.
+    """
+    def __init__(self, ttl_seconds: Optional[float] = PLAN_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.generation = 0
+        self._products: Dict[int, Tuple[float, ProductPricingPlan]] = {}
+        self._options: Dict[int, Tuple[float, OptionPricingPlan]] = {}
+        self._lock = threading.Lock()
+
+    def _lookup(self, store: Dict, key):
+        cached = store.get(key)
+        if cached is None:
+            return None
+        stored_at, plan = cached
+        if self.ttl_seconds is not None and time.monotonic() - stored_at > self.ttl_seconds:
+            with self._lock:
+                store.pop(key, None)
+            return None
+        return plan
+
+    def get_product_plan(self, product_id: int) -> Optional[ProductPricingPlan]:
+        return self._lookup(self._products, product_id)
+
+    def get_option_plan(self, variation_option_id: int) -> Optional[OptionPricingPlan]:
+        return self._lookup(self._options, variation_option_id)
+
+    def put_product_plan(self, plan: ProductPricingPlan, generation: Optional[int] = None) -> None:
+        if plan.product_id is None:
+            return
+        with self._lock:
+            if generation is None or generation == self.generation:
+                self._products[plan.product_id] = (time.monotonic(), plan)
+
+    def put_option_plan(self, plan: OptionPricingPlan, generation: Optional[int] = None) -> None:
+        if plan.variation_option_id is None:
+            return
+        with self._lock:
+            if generation is None or generation == self.generation:
+                self._options[plan.variation_option_id] = (time.monotonic(), plan)
+
+    def invalidate_product(self, product_id: int) -> None:
+        with self._lock:
+            self._products.pop(product_id, None)
+            self.generation += 1
+
+    def invalidate_option(self, variation_option_id: int) -> None:
+        with self._lock:
+            self._options.pop(variation_option_id, None)
+            self.generation += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._products.clear()
+            self._options.clear()
+            self.generation += 1
+
+
+# Process-wide cache shared by API requests; CRUD routers clear it on catalog writes.
+pricing_plan_cache = PricingPlanCache()
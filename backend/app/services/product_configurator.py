@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from app.models import Product, VariationSelectionType
+
+# Same reasoning as PLAN_TTL_SECONDS: the catalog can also be edited outside this process
+CONFIGURATOR_TTL_SECONDS = 60.0
+CONFIGURATOR_CACHE_MAX_PRODUCTS = 512
+
+
+class ConfiguratorOption(NamedTuple):
+    id: int
+    name: str
+    value_description: Optional[str]
+    additional_price: Decimal
+
+
+class ConfiguratorGroup(NamedTuple):
+    id: int
+    name: str
+    selection_type: VariationSelectionType
+    is_required: bool
+    options: Tuple[ConfiguratorOption, ...]
+
+
+class ProductConfigurator(NamedTuple):
+    """Read-only snapshot of a product's variation structure, as shown when configuring an entry."""
+    product_id: int
+    product_name: str
+    product_unit: str
+    groups: Tuple[ConfiguratorGroup, ...]
+
+
+def build_product_configurator(product: Product) -> ProductConfigurator:
+    """Copies a product's unit, variation groups and options out of the ORM graph."""
+    return ProductConfigurator(
+        product_id=product.id,
+        product_name=product.name,
+        product_unit=product.product_unit_type.name,
+        groups=tuple(
+            ConfiguratorGroup(
+                id=group.id,
+                name=group.name,
+                selection_type=group.selection_type,
+                is_required=group.is_required,
+                options=tuple(
+                    ConfiguratorOption(
+                        id=option.id,
+                        name=option.name,
+                        value_description=option.value_description,
+                        additional_price=option.additional_price,
+                    )
+                    for option in group.options
+                ),
+            )
+            for group in product.variation_groups
+        ),
+    )
+
+
+class ProductConfiguratorCache:
+    """
+    Thread-safe LRU of ProductConfigurator trees keyed by product id.
+
+    Holds at most `max_products` trees, each trusted for `ttl_seconds`. CRUD routers
+    drop a product's tree when its groups or options are written. As in
+    PricingPlanCache, every drop bumps `generation` and a `put` with an older
+    generation is discarded. `hits` and `misses` count lookups over the lifetime
+    of the cache.
+    """
+    def __init__(
+        self,
+        max_products: int = CONFIGURATOR_CACHE_MAX_PRODUCTS,
+        ttl_seconds: Optional[float] = CONFIGURATOR_TTL_SECONDS,
+    ):
+        self.max_products = max_products
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._trees: "OrderedDict[int, Tuple[float, ProductConfigurator]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, product_id: int) -> Optional[ProductConfigurator]:
+        with self._lock:
+            cached = self._trees.get(product_id)
+            if cached is not None:
+                stored_at, tree = cached
+                if self.ttl_seconds is None or time.monotonic() - stored_at <= self.ttl_seconds:
+                    self._trees.move_to_end(product_id)
+                    self.hits += 1
+                    return tree
+                del self._trees[product_id]
+            self.misses += 1
+            return None
+
+    def put(self, tree: ProductConfigurator, generation: Optional[int] = None) -> None:
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._trees[tree.product_id] = (time.monotonic(), tree)
+            self._trees.move_to_end(tree.product_id)
+            while len(self._trees) > self.max_products:
+                self._trees.popitem(last=False)
+
+    def invalidate(self, product_id: Optional[int]) -> None:
+        if product_id is None:
+            return
+        with self._lock:
+            self._trees.pop(product_id, None)
+            self.generation += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._trees.clear()
+            self.generation += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._trees),
+                "max_size": self.max_products,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+# Process-wide cache shared by API requests; CRUD routers invalidate it on writes.
+product_configurator_cache = ProductConfiguratorCache()
@@ -0,0 +1,221 @@
+import threading
+from collections import Counter, OrderedDict
+from decimal import Decimal, Inexact, getcontext, localcontext
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from app.services.pricing_plan import OptionPricingPlan, PlanLine, ProductPricingPlan
+
+# How many quotes keep their per-entry contributions in memory at once.
+AGGREGATE_CACHE_MAX_QUOTES = 256
+
+BomKey = Tuple[int, str]  # (material_id, base_unit_name)
+
+
+class ContributionLine(NamedTuple):
+    """One plan line scaled by an entry's quantity, as added to the BOM totals."""
+    bom_key: BomKey
+    plan_line: PlanLine
+    quantity: Decimal  # Scaled amount plus cull units
+    cull_units: Decimal
+
+
+class EntryContribution(NamedTuple):
+    """Everything one QuoteProductEntry adds to its quote's labor and BOM totals."""
+    product_quantity: Decimal
+    product_plan: ProductPricingPlan
+    option_plans: Tuple[OptionPricingPlan, ...]
+    labor_terms: Tuple[Decimal, ...]
+    lines: Tuple[ContributionLine, ...]
+
+    def matches(
+        self,
+        product_plan: ProductPricingPlan,
+        option_plans: Tuple[OptionPricingPlan, ...],
+        product_quantity: Decimal,
+    ) -> bool:
+        # Plans are compared by identity: a recompiled plan always means a fresh contribution
+        return (
+            self.product_quantity == product_quantity
+            and self.product_plan is product_plan
+            and len(self.option_plans) == len(option_plans)
+            and all(old is new for old, new in zip(self.option_plans, option_plans))
+        )
+
+
+def _scale_lines(
+    lines: Tuple[PlanLine, ...], product_quantity: Decimal, cull_added_only: bool
+) -> List[ContributionLine]:
+    scaled = []
+    for line in lines:
+        quantity = line.amount * product_quantity
+        cull_units = Decimal(0)
+        # Variations apply cull only to added quantities, not removed (negative) ones
+        if line.cull_rate is not None and (not cull_added_only or quantity > 0):
+            cull_units = quantity * line.cull_rate
+        scaled.append(ContributionLine(
+            bom_key=(line.material_id, line.unit_name),
+            plan_line=line,
+            quantity=quantity + cull_units,
+            cull_units=cull_units,
+        ))
+    return scaled
+
+
+def build_entry_contribution(
+    product_plan: ProductPricingPlan,
+    option_plans: Tuple[OptionPricingPlan, ...],
+    product_quantity: Decimal,
+) -> EntryContribution:
+    """Scales an entry's product and option plans exactly as a full calculation would."""
+    labor_terms = [product_plan.unit_labor_cost * product_quantity]
+    lines = _scale_lines(product_plan.lines, product_quantity, cull_added_only=False)
+    for option_plan in option_plans:
+        labor_terms.append(option_plan.additional_labor_cost * product_quantity)
+        lines.extend(_scale_lines(option_plan.lines, product_quantity, cull_added_only=True))
+    return EntryContribution(
+        product_quantity=product_quantity,
+        product_plan=product_plan,
+        option_plans=option_plans,
+        labor_terms=tuple(labor_terms),
+        lines=tuple(lines),
+    )
+
+
+class DecimalSum:
+    """
+    A running Decimal total that supports removing terms.
+
+    A full calculation sums terms onto Decimal(0), so its result carries the smallest
+    exponent of any term. Subtracting a term cannot undo an exponent it introduced,
+    so the exponents still present are counted and the total is re-quantized on read.
+    Every operation traps Inexact; callers fall back to a full calculation if it fires.
+    """
+    __slots__ = ("total", "magnitude", "exponents")
+
+    def __init__(self):
+        self.total = Decimal(0)
+        self.magnitude = Decimal(0)  # Sum of absolute terms, bounds every partial sum
+        self.exponents = Counter({0: 1})  # The Decimal(0) a full calculation starts from
+
+    def add(self, term: Decimal) -> None:
+        with _exact_context():
+            self.total += term
+            self.magnitude += abs(term)
+        self.exponents[term.as_tuple().exponent] += 1
+
+    def remove(self, term: Decimal) -> None:
+        with _exact_context():
+            self.total -= term
+            self.magnitude -= abs(term)
+        exponent = term.as_tuple().exponent
+        self.exponents[exponent] -= 1
+        if not self.exponents[exponent]:
+            del self.exponents[exponent]
+
+    def value(self) -> Decimal:
+        """Returns the total exactly as summing the current terms in any order would."""
+        min_exponent = min(self.exponents)
+        # If the largest possible partial sum fits the context precision, a full
+        # calculation never rounded either, so both give the same result.
+        if self.magnitude and self.magnitude.adjusted() - min_exponent + 1 > getcontext().prec:
+            raise Inexact("Aggregated total exceeds the decimal context precision")
+        with _exact_context():
+            return self.total.quantize(Decimal((0, (1,), min_exponent)))
+
+
+def _exact_context():
+    context = getcontext().copy()
+    context.traps[Inexact] = True
+    return localcontext(context)
+
+
+class QuoteAggregate:
+    """
+    Per-entry contributions of one quote and the labor and BOM totals they add up to.
+
+    The totals are running DecimalSums: replacing or discarding an entry only subtracts
+    and adds that entry's terms. The BOM keys in first-use order are kept as well and
+    only re-derived from the contributions after an entry changed, so a recalculation
+    with no edits reads the totals in O(BOM lines).
+    """
+    def __init__(self):
+        self.entries: Dict[int, EntryContribution] = {}
+        self.labor = DecimalSum()
+        self.quantities: Dict[BomKey, DecimalSum] = {}
+        self.cull_units: Dict[BomKey, DecimalSum] = {}
+        # (bom_key, plan line of its first use) for the entry order in bom_entry_ids; None after a change
+        self.bom_order: Optional[Tuple[Tuple[BomKey, PlanLine], ...]] = None
+        self.bom_entry_ids: Tuple[int, ...] = ()
+
+    def set_entry(self, entry_id: int, contribution: EntryContribution) -> None:
+        """Replaces an entry's contribution, subtracting the old one from the totals."""
+        self.discard_entry(entry_id)
+        for term in contribution.labor_terms:
+            self.labor.add(term)
+        for line in contribution.lines:
+            quantity = self.quantities.get(line.bom_key)
+            if quantity is None:
+                quantity = self.quantities[line.bom_key] = DecimalSum()
+                self.cull_units[line.bom_key] = DecimalSum()
+            quantity.add(line.quantity)
+            self.cull_units[line.bom_key].add(line.cull_units)
+        self.entries[entry_id] = contribution
+        self.bom_order = None
+
+    def discard_entry(self, entry_id: int) -> None:
+        contribution = self.entries.pop(entry_id, None)
+        if contribution is None:
+            return
+        for term in contribution.labor_terms:
+            self.labor.remove(term)
+        for line in contribution.lines:
+            self.quantities[line.bom_key].remove(line.quantity)
+            self.cull_units[line.bom_key].remove(line.cull_units)
+        self.bom_order = None
+
+    def bom_lines(self, entry_ids: Tuple[int, ...]) -> Tuple[Tuple[BomKey, PlanLine], ...]:
+        """BOM keys in the order a full calculation over `entry_ids` first meets them."""
+        if self.bom_order is None or self.bom_entry_ids != entry_ids:
+            first_use: Dict[BomKey, PlanLine] = {}
+            for entry_id in entry_ids:
+                for line in self.entries[entry_id].lines:
+                    first_use.setdefault(line.bom_key, line.plan_line)
+            self.bom_order = tuple(first_use.items())
+            self.bom_entry_ids = entry_ids
+        return self.bom_order
+
+
+class QuoteAggregateCache:
+    """
+    Thread-safe LRU of QuoteAggregate states keyed by quote id.
+
+    A calculation takes a quote's state out of the cache and puts it back when it
+    succeeds, so concurrent calculations of one quote never share a state.
+    """
+    def __init__(self, max_quotes: int = AGGREGATE_CACHE_MAX_QUOTES):
+        self.max_quotes = max_quotes
+        self._states: "OrderedDict[int, QuoteAggregate]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, quote_id: int) -> Optional[QuoteAggregate]:
+        with self._lock:
+            return self._states.pop(quote_id, None)
+
+    def put(self, quote_id: int, state: QuoteAggregate) -> None:
+        with self._lock:
+            self._states[quote_id] = state
+            self._states.move_to_end(quote_id)
+            while len(self._states) > self.max_quotes:
+                self._states.popitem(last=False)
+
+    def invalidate(self, quote_id: int) -> None:
+        with self._lock:
+            self._states.pop(quote_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._states.clear()
+
+
+# Process-wide cache shared by API requests.
+quote_aggregate_cache = QuoteAggregateCache()
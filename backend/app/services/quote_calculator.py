@@ -1,31 +1,126 @@
-from decimal import Decimal, ROUND_HALF_UP
-from typing import Dict, List, Tuple
+from decimal import Decimal, Inexact, ROUND_HALF_UP
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
 from datetime import datetime, timezone
+from functools import lru_cache
+import hashlib
 import logging
 import math # Add this import
 
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlmodel import Session, select
 
 from app.models import (
     Quote,
     QuoteProductEntry,
-    ProductMaterial,
+    QuoteProductEntryVariation,
     QuoteStatus,
-    VariationOptionMaterial,
+    QuoteConfig,
     Material,
     CalculatedQuote,
     CalculatedQuoteBase,
     BillOfMaterialEntry,
     AppliedRateInfoEntry,
-    UnitType,
 )
+from app.services.calc_timing import calc_phase
+from app.services.fixed_point import EntryPlans, FixedPointOverflow, compute_fixed_point_totals
+from app.services.pricing_plan import (
+    OptionPricingPlan,
+    PlanLine,
+    PricingPlanCache,
+    ProductPricingPlan,
+    compile_option_plan,
+    compile_product_plan,
+    material_cost_per_base_unit,
+)
+from app.services.quote_aggregate import (
+    QuoteAggregate,
+    QuoteAggregateCache,
+    build_entry_contribution,
+)
+from app.services.quote_loader import LoadedQuote, load_quote_for_calculation
+
+T = TypeVar("T")
+
+# Runs a CPU-bound step and returns its result; see QuoteCalculator.offload
+Offload = Callable[[Callable[[], T]], T]
+
+
+def run_inline(work: Callable[[], T]) -> T:
+    """Default `Offload`: runs the step on the calling thread."""
+    return work()
+
+@lru_cache(maxsize=None)
+def _quantum(precision: str) -> Decimal:
+    return Decimal(precision)
 
 # Helper to get a Decimal with a specific precision (e.g., for currency)
 def quantize_decimal(value: Decimal, precision: str = "0.0001") -> Decimal: 
-    return value.quantize(Decimal(precision), rounding=ROUND_HALF_UP)
+    return value.quantize(_quantum(precision), rounding=ROUND_HALF_UP)
 
 def final_quantize_decimal(value: Decimal, precision: str = "0.01") -> Decimal: 
-    return value.quantize(Decimal(precision), rounding=ROUND_HALF_UP)
+    return value.quantize(_quantum(precision), rounding=ROUND_HALF_UP)
+
+# Bump when the calculation changes so stored results are no longer treated as current
+FINGERPRINT_VERSION = 1
+
+# Dialects whose INSERT supports ON CONFLICT DO UPDATE on calculated_quote.quote_id
+_UPSERT_INSERTS = {
+    "postgresql": postgresql_insert,
+    "sqlite": sqlite_insert,
+}
+
+def supports_calculated_quote_upsert(session: Session) -> bool:
+    return session.get_bind().dialect.name in _UPSERT_INSERTS
+
+def _save_calculated_quote(
+    result: CalculatedQuoteBase, existing: Optional[CalculatedQuote], session: Session
+) -> CalculatedQuote:
+    """ORM fallback for dialects without ON CONFLICT; updates of `existing` are version checked."""
+    if existing is None:
+        db_calculated_quote = CalculatedQuote.model_validate(result)
+    else:
+        # Copy attributes rather than model_dump() so JSONB fields keep their Pydantic entries
+        for key in result.model_fields_set:
+            setattr(existing, key, getattr(result, key))
+        existing.calculated_at = result.calculated_at
+        db_calculated_quote = existing
+    session.add(db_calculated_quote)
+    return db_calculated_quote
+
+def upsert_calculated_quotes(results: List[CalculatedQuoteBase], session: Session) -> None:
+    """
+    Writes calculation results with one atomic INSERT ... ON CONFLICT (quote_id) DO UPDATE,
+    so concurrent calculations of the same quote cannot both insert, and bumps the
+    version of every replaced row. Does not commit.
+    """
+    if not results:
+        return
+    table = CalculatedQuote.__table__
+    columns = [column.name for column in table.columns if column.name not in ("id", "version")]
+    rows = [{column: getattr(result, column) for column in columns} for result in results]
+
+    if supports_calculated_quote_upsert(session):
+        insert = _UPSERT_INSERTS[session.get_bind().dialect.name]
+        statement = insert(table).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.quote_id],
+            set_={
+                **{column: statement.excluded[column] for column in columns if column != "quote_id"},
+                "version": table.c.version + 1,
+            },
+        )
+        session.execute(statement)
+        return
+
+    # No native upsert: update the existing rows found in one query and insert the rest
+    quote_ids = [result.quote_id for result in results]
+    existing = {
+        row.quote_id: row
+        for row in session.exec(select(CalculatedQuote).where(CalculatedQuote.quote_id.in_(quote_ids))).all()
+    }
+    for result in results:
+        _save_calculated_quote(result, existing.get(result.quote_id), session)
 
 # Explicitly configure logger for this module
 logger = logging.getLogger("app.services.quote_calculator")
@@ -39,315 +134,568 @@ logger.propagate = True
 # Add another test log message
 logger.info("Logger propagation is enabled for QuoteCalculator.")
 
-class QuoteCalculator:
-    def _get_material_cost_per_base_unit(self, material: Material) -> Decimal:
-        if material.quantity_in_supplier_unit == Decimal(0):
-            # Avoid division by zero if quantity_in_supplier_unit is zero
-            return Decimal(0)
-        return material.cost_per_supplier_unit / material.quantity_in_supplier_unit
+class _BomAccumulator:
+    """Running totals for one BOM line while entries are being aggregated."""
+    __slots__ = ("material_name", "unit_name", "unit_cost", "quantity", "cull_units")
 
-    def calculate_and_save_quote(
-        self, quote_id: int, session: Session
-    ) -> CalculatedQuote:
-        logger.info(f"Starting quote calculation for Quote ID: {quote_id}")
-        
-        try: # Add try-except block for robust error logging
-            quote = session.get(Quote, quote_id)
-            if not quote:
-                logger.error(f"Quote with id {quote_id} not found during calculation.")
-                raise ValueError(f"Quote with id {quote_id} not found")
-            if not quote.quote_config:
-                logger.error(f"QuoteConfig not found for Quote with id {quote_id} during calculation.")
-                raise ValueError(
-                    f"QuoteConfig not found for Quote with id {quote_id}"
-                )
-            logger.debug(f"Successfully fetched Quote ID: {quote_id} and its QuoteConfig ID: {quote.quote_config_id}")
+    def __init__(self, line: PlanLine):
+        self.material_name = line.material_name
+        self.unit_name = line.unit_name
+        self.unit_cost = line.unit_cost
+        self.quantity = Decimal(0)
+        self.cull_units = Decimal(0)
 
-            total_material_cost_for_quote = Decimal(0)
-            total_labor_cost_for_quote = Decimal(0)
-            bill_of_materials_aggregated: Dict[
-                Tuple[int, str], BillOfMaterialEntry
-            ] = {}  # (material_id, base_unit_name) -> BillOfMaterialEntry
+    def to_bom_entry(self) -> BillOfMaterialEntry:
+        return BillOfMaterialEntry(
+            material_name=self.material_name,
+            quantity=self.quantity,
+            unit_cost=self.unit_cost,
+            total_cost=Decimal(0),
+            unit_name=self.unit_name,
+            cull_units=self.cull_units,
+        )
 
-            for entry in quote.product_entries:
-                logger.debug(f"Processing QuoteProductEntry ID: {entry.id}")
-                product = entry.product
-                if not product:
-                    logger.error(f"Product not found for QuoteProductEntry ID: {entry.id}")
-                    raise ValueError(
-                        f"Product not found for QuoteProductEntry with id {entry.id}"
-                    )
 
+class QuoteCalculator:
+    def __init__(
+        self,
+        plan_cache: Optional[PricingPlanCache] = None,
+        aggregate_cache: Optional[QuoteAggregateCache] = None,
+        populate_caches: bool = True,
+    ):
+        # Without explicit caches, plans and entry contributions are only reused by this calculator instance
+        self.plan_cache = plan_cache if plan_cache is not None else PricingPlanCache()
+        self.aggregate_cache = aggregate_cache if aggregate_cache is not None else QuoteAggregateCache()
+        # False for sessions on a lagging read replica: cached plans are used, compiled ones are not stored
+        self.populate_caches = populate_caches
+        # plan_cache.generation from before the quotes being calculated were loaded, so a plan
+        # compiled from rows that were invalidated in the meantime is not cached
+        self.plan_generation: Optional[int] = None
+        # Plans of the quotes being calculated, resolved while the session is usable, so the
+        # compute step never falls back to loading catalog rows
+        self._resolved_product_plans: Dict[int, ProductPricingPlan] = {}
+        self._resolved_option_plans: Dict[int, OptionPricingPlan] = {}
+        # Runs the pure compute step of a calculation; AsyncQuoteProcessService sets it to
+        # move that step off the event loop
+        self.offload: Offload = run_inline
+
+    def _get_material_cost_per_base_unit(self, material: Material) -> Decimal:
+        return material_cost_per_base_unit(material)
+
+    def _get_product_plan(self, entry: QuoteProductEntry) -> ProductPricingPlan:
+        if entry.product_id is not None:
+            plan = self._resolved_product_plans.get(entry.product_id) or self.plan_cache.get_product_plan(entry.product_id)
+            if plan is not None:
+                return plan
+        product = entry.product
+        if not product:
+            logger.error(f"Product not found for QuoteProductEntry ID: {entry.id}")
+            raise ValueError(
+                f"Product not found for QuoteProductEntry with id {entry.id}"
+            )
+        logger.debug(f"Compiling pricing plan for Product ID: {product.id}")
+        plan = compile_product_plan(product)
+        if self.populate_caches:
+            self.plan_cache.put_product_plan(plan, generation=self.plan_generation)
+        return plan
+
+    def _get_option_plan(self, qpev: QuoteProductEntryVariation) -> OptionPricingPlan:
+        if qpev.variation_option_id is not None:
+            plan = (
+                self._resolved_option_plans.get(qpev.variation_option_id)
+                or self.plan_cache.get_option_plan(qpev.variation_option_id)
+            )
+            if plan is not None:
+                return plan
+        variation_option = qpev.variation_option
+        if not variation_option:
+            logger.error(f"VariationOption not found for QuoteProductEntryVariation ID: {qpev.id}")
+            raise ValueError(
+                f"VariationOption not found for QuoteProductEntryVariation id {qpev.id}"
+            )
+        logger.debug(f"Compiling pricing plan for VariationOption ID: {variation_option.id}")
+        plan = compile_option_plan(variation_option)
+        if self.populate_caches:
+            self.plan_cache.put_option_plan(plan, generation=self.plan_generation)
+        return plan
+
+    @staticmethod
+    def _accumulate_lines(
+        bom: Dict[Tuple[int, str], _BomAccumulator],
+        lines: Tuple[PlanLine, ...],
+        product_quantity: Decimal,
+        cull_added_only: bool,
+    ) -> None:
+        """Scales plan lines by the entry quantity and adds them to the BOM totals."""
+        for line in lines:
+            quantity = line.amount * product_quantity
+            cull_units = Decimal(0)
+            # Variations apply cull only to added quantities, not removed (negative) ones
+            if line.cull_rate is not None and (not cull_added_only or quantity > 0):
+                cull_units = quantity * line.cull_rate
+
+            bom_key = (line.material_id, line.unit_name)
+            accumulator = bom.get(bom_key)
+            if accumulator is None:
+                accumulator = bom[bom_key] = _BomAccumulator(line)
+            accumulator.quantity += quantity + cull_units
+            accumulator.cull_units += cull_units
+
+    def _aggregate_entries_full(
+        self, quote: Quote
+    ) -> Tuple[Decimal, Dict[Tuple[int, str], _BomAccumulator]]:
+        """Sums labor and BOM quantities over every entry of the quote."""
+        total_labor_cost_for_quote = Decimal(0)
+        bom_accumulators: Dict[
+            Tuple[int, str], _BomAccumulator
+        ] = {}  # (material_id, base_unit_name) -> running BOM totals
+
+        for entry in quote.product_entries:
+            logger.debug(f"Processing QuoteProductEntry ID: {entry.id}")
+            product_plan = self._get_product_plan(entry)
+            product_quantity = entry.quantity_of_product_units
+            total_labor_cost_for_quote += product_plan.unit_labor_cost * product_quantity
+
+            # 1. Base materials for the product
+            self._accumulate_lines(bom_accumulators, product_plan.lines, product_quantity, cull_added_only=False)
+
+            # 2. Labor and materials from selected variations for the product entry
+            for qpev in entry.selected_variations:
+                option_plan = self._get_option_plan(qpev)
+                total_labor_cost_for_quote += option_plan.additional_labor_cost * product_quantity
+                self._accumulate_lines(bom_accumulators, option_plan.lines, product_quantity, cull_added_only=True)
+
+        return total_labor_cost_for_quote, bom_accumulators
+
+    def _aggregate_entries(
+        self, quote: Quote
+    ) -> Tuple[Decimal, Dict[Tuple[int, str], _BomAccumulator]]:
+        """
+        Sums labor and BOM quantities from the quote's cached QuoteAggregate. Only edited,
+        added or removed entries are subtracted from or added to its running totals, and
+        the BOM order is only re-derived when one of them changed.
+
+        Detecting those entries is still one pass over the entries, comparing quantities
+        and plan identities; no Decimal work is done for entries that did not change.
+        """
+        entry_ids = tuple(entry.id for entry in quote.product_entries)
+        if quote.id is None or None in entry_ids or len(set(entry_ids)) != len(entry_ids):
+            return self._aggregate_entries_full(quote)
+
+        state = self.aggregate_cache.take(quote.id) or QuoteAggregate()
+        try:
+            changed = 0
+            for entry in quote.product_entries:
+                product_plan = self._get_product_plan(entry)
+                option_plans = tuple(self._get_option_plan(qpev) for qpev in entry.selected_variations)
                 product_quantity = entry.quantity_of_product_units
-                product_base_labor_cost = (
-                    product.unit_labor_cost * product_quantity
-                )
-                total_labor_cost_for_quote += product_base_labor_cost
-
-                # --- Material cost calculation for the product entry ---
-                # 1. Base materials for the product
-                for pm in product.product_materials:
-                    material = pm.material
-                    logger.debug(f"Processing Material ID: {material.id}, Name: {material.name}")
-                    if not material or not material.unit_type: # Ensure unit_type is loaded
-                        logger.error(f"Material or its unit type not found for ProductMaterial ID: {pm.id}")
-                        raise ValueError(f"Material or its unit type not found for ProductMaterial id {pm.id}")
-
-                    cost_per_base_unit = self._get_material_cost_per_base_unit(material)
-                    quantity_needed_for_product = (
-                        pm.material_amount
-                        * product_quantity
-                    )
-                    
-                    cull_units = Decimal(0)
-                    if material.cull_rate and material.cull_rate > 0:
-                        cull_units = quantity_needed_for_product * Decimal(str(material.cull_rate))
-                    
-                    total_quantity_needed = quantity_needed_for_product + cull_units
-
-                    bom_key = (material.id, material.unit_type.name)
-                    if bom_key not in bill_of_materials_aggregated:
-                        bill_of_materials_aggregated[bom_key] = BillOfMaterialEntry(
-                            material_name=material.name,
-                            quantity=Decimal(0),
-                            unit_cost=cost_per_base_unit,
-                            total_cost=Decimal(0),
-                            unit_name=material.unit_type.name,
-                            cull_units=Decimal(0) 
-                        )
-                    
-                    bill_of_materials_aggregated[bom_key].quantity += total_quantity_needed
-                    if bill_of_materials_aggregated[bom_key].cull_units is None: # Ensure cull_units is initialized
-                        bill_of_materials_aggregated[bom_key].cull_units = Decimal(0)
-                    bill_of_materials_aggregated[bom_key].cull_units += cull_units
-                    # Total cost will be recalculated later after rounding quantities
-
-                # 2. Materials from selected variations for the product entry
-                for qpev in entry.selected_variations:
-                    variation_option = qpev.variation_option
-                    logger.debug(f"Processing VariationOption ID: {variation_option.id}, Name: {variation_option.name}")
-                    if not variation_option:
-                        logger.error(f"VariationOption not found for QuoteProductEntryVariation ID: {qpev.id}")
-                        raise ValueError(
-                            f"VariationOption not found for QuoteProductEntryVariation id {qpev.id}"
-                        )
-
-                    # Add variation's direct additional labor cost
-                    total_labor_cost_for_quote += (
-                        variation_option.additional_labor_cost_per_product_unit
-                        * product_quantity
-                    )
-                    
-                    # Add/modify materials based on variation
-                    for vom in variation_option.variation_option_materials:
-                        material = vom.material
-                        if not material or not material.unit_type: # Ensure unit_type is loaded
-                            logger.error(f"Material or its unit type not found for VariationOptionMaterial id {vom.id}")
-                            raise ValueError(f"Material or its unit type not found for VariationOptionMaterial id {vom.id}")
-                        
-                        cost_per_base_unit = self._get_material_cost_per_base_unit(
-                            material
-                        )
-                        quantity_added_or_removed_for_product = (
-                            vom.quantity_of_material_base_units_added * product_quantity
-                        )
-
-                        cull_units_variation = Decimal(0)
-                        if material.cull_rate and material.cull_rate > 0:
-                             # Apply cull rate only to added quantities, not removed (negative)
-                            if quantity_added_or_removed_for_product > 0:
-                                cull_units_variation = quantity_added_or_removed_for_product * Decimal(str(material.cull_rate))
-
-                        total_quantity_added_or_removed = quantity_added_or_removed_for_product + cull_units_variation
-
-                        bom_key = (material.id, material.unit_type.name)
-                        if bom_key not in bill_of_materials_aggregated:
-                            bill_of_materials_aggregated[bom_key] = BillOfMaterialEntry(
-                                material_name=material.name,
-                                quantity=Decimal(0),
-                                unit_cost=cost_per_base_unit,
-                                total_cost=Decimal(0),
-                                unit_name=material.unit_type.name,
-                                cull_units=Decimal(0)
-                            )
-                        
-                        bill_of_materials_aggregated[bom_key].quantity += total_quantity_added_or_removed
-                        if bill_of_materials_aggregated[bom_key].cull_units is None: # Ensure cull_units is initialized
-                            bill_of_materials_aggregated[bom_key].cull_units = Decimal(0)
-                        bill_of_materials_aggregated[bom_key].cull_units += cull_units_variation
-                        # Total cost will be recalculated later
+                contribution = state.entries.get(entry.id)
+                if contribution is None or not contribution.matches(product_plan, option_plans, product_quantity):
+                    logger.debug(f"Recomputing contribution of QuoteProductEntry ID: {entry.id}")
+                    state.set_entry(entry.id, build_entry_contribution(product_plan, option_plans, product_quantity))
+                    changed += 1
+
+            if len(state.entries) != len(entry_ids):
+                current_ids = set(entry_ids)
+                for stale_id in [entry_id for entry_id in state.entries if entry_id not in current_ids]:
+                    state.discard_entry(stale_id)
+
+            total_labor_cost_for_quote = state.labor.value()
+            bom_accumulators: Dict[Tuple[int, str], _BomAccumulator] = {}
+            for bom_key, plan_line in state.bom_lines(entry_ids):
+                accumulator = bom_accumulators[bom_key] = _BomAccumulator(plan_line)
+                accumulator.quantity = state.quantities[bom_key].value()
+                accumulator.cull_units = state.cull_units[bom_key].value()
+        except Inexact:
+            logger.warning(f"Incremental totals for Quote ID: {quote.id} are not exact; recalculating all entries.")
+            return self._aggregate_entries_full(quote)
+
+        logger.debug(f"Recomputed {changed} of {len(entry_ids)} entry contributions for Quote ID: {quote.id}")
+        self.aggregate_cache.put(quote.id, state)
+        return total_labor_cost_for_quote, bom_accumulators
+
+    def fingerprint_inputs(self, quote: Quote) -> str:
+        """
+        Hashes everything a calculation of `quote` depends on: its config rates, and per
+        entry (in order) the quantity and the compiled product and option plans, which
+        carry the material prices, amounts and cull rates.
+        """
+        quote_config = quote.quote_config
+        parts = [
+            FINGERPRINT_VERSION,
+            quote.id,
+            quote_config.sales_commission_rate,
+            quote_config.franchise_fee_rate,
+            quote_config.margin_rate,
+            quote_config.additional_fixed_fees,
+            quote_config.tax_rate,
+            bool(quote_config.round_up_materials),
+        ]
+        for entry in quote.product_entries:
+            parts.append((
+                entry.quantity_of_product_units,
+                self._get_product_plan(entry).fingerprint,
+                tuple(self._get_option_plan(qpev).fingerprint for qpev in entry.selected_variations),
+            ))
+        return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+    def resolve_plans(self, quotes: Iterable[Quote]) -> None:
+        """
+        Pins the plan of every product and option the loaded quotes use, so a plan evicted
+        from the cache mid-calculation cannot make the compute step lazy-load its rows.
+        """
+        self._resolved_product_plans = {}
+        self._resolved_option_plans = {}
+        for quote in quotes:
+            for entry in quote.product_entries:
+                try:
+                    if entry.product_id is not None:
+                        self._resolved_product_plans[entry.product_id] = self._get_product_plan(entry)
+                    for qpev in entry.selected_variations:
+                        if qpev.variation_option_id is not None:
+                            self._resolved_option_plans[qpev.variation_option_id] = self._get_option_plan(qpev)
+                except ValueError:
+                    continue # Missing catalog rows; the compute step reports them for this quote
+
+    def _load_quote(self, quote_id: int, session: Session) -> LoadedQuote:
+        loaded = load_quote_for_calculation(session, quote_id, self.plan_cache)
+        quote = loaded.quote if loaded else None
+        if not quote:
+            logger.error(f"Quote with id {quote_id} not found during calculation.")
+            raise ValueError(f"Quote with id {quote_id} not found")
+        self.plan_generation = loaded.plan_generation
+        if not quote.quote_config:
+            logger.error(f"QuoteConfig not found for Quote with id {quote_id} during calculation.")
+            raise ValueError(
+                f"QuoteConfig not found for Quote with id {quote_id}"
+            )
+        logger.debug(f"Successfully fetched Quote ID: {quote_id} and its QuoteConfig ID: {quote.quote_config_id}")
+        self.resolve_plans([quote])
+        return loaded
+
+    def _compute_decimal_totals(
+        self, quote: Quote
+    ) -> Tuple[Decimal, Decimal, List[BillOfMaterialEntry]]:
+        """Aggregates entries and finalizes the BOM in Decimal; returns labor, material cost and BOM."""
+        with calc_phase("aggregate"):
+            total_labor_cost_for_quote, bom_accumulators = self._aggregate_entries(quote)
+
+        with calc_phase("round"):
+            return self._finalize_bill_of_materials(quote, total_labor_cost_for_quote, bom_accumulators)
+
+    def _finalize_bill_of_materials(
+        self,
+        quote: Quote,
+        total_labor_cost_for_quote: Decimal,
+        bom_accumulators: Dict[Tuple[int, str], _BomAccumulator],
+    ) -> Tuple[Decimal, Decimal, List[BillOfMaterialEntry]]:
+        """Rounds aggregated BOM quantities per the quote config and prices each line."""
+        bill_of_materials_aggregated = {
+            bom_key: accumulator.to_bom_entry()
+            for bom_key, accumulator in bom_accumulators.items()
+        }
+        
+        # Recalculate BOM entries with rounded quantities and update total material cost
+        total_material_cost_for_quote = Decimal(0) # Re-initialize before summing up rounded costs
+        for bom_entry in bill_of_materials_aggregated.values():
+            # Calculate leftovers before rounding up quantity
+            original_quantity = bom_entry.quantity
             
-            # Recalculate BOM entries with rounded quantities and update total material cost
-            total_material_cost_for_quote = Decimal(0) # Re-initialize before summing up rounded costs
-            for bom_entry in bill_of_materials_aggregated.values():
-                # Calculate leftovers before rounding up quantity
-                original_quantity = bom_entry.quantity
-                
-                if quote.quote_config.round_up_materials: # Check the flag
-                    rounded_quantity = Decimal(math.ceil(original_quantity))
-                    leftover_amount = rounded_quantity - original_quantity
-                    bom_entry.leftovers = quantize_decimal(leftover_amount) if leftover_amount > 0 else Decimal(0)
-                else:
-                    rounded_quantity = original_quantity # No rounding
-                    bom_entry.leftovers = Decimal(0) # No leftovers if not rounding up
-                
-                bom_entry.quantity = rounded_quantity
-
-                # Round up cull units separately for reporting, if needed, or keep as calculated
-                if bom_entry.cull_units is not None:
-                    bom_entry.cull_units = quantize_decimal(bom_entry.cull_units) # Or math.ceil if whole units are culled
-
-                bom_entry.total_cost = bom_entry.quantity * bom_entry.unit_cost
-                bom_entry.total_cost = final_quantize_decimal(bom_entry.total_cost) 
-                total_material_cost_for_quote += bom_entry.total_cost
-
-            # Finalize BOM list
-            final_bom_list = [
-                bom_entry for bom_entry in bill_of_materials_aggregated.values()
-            ]
-
-            # --- COGS Calculation ---
-            cost_of_goods_sold = total_material_cost_for_quote + total_labor_cost_for_quote
-
-            # --- Apply QuoteConfig Rates ---
-            quote_config = quote.quote_config
-            applied_rates_info: List[AppliedRateInfoEntry] = []
-            current_subtotal = cost_of_goods_sold
-
-            # 1. Sales Commission (on COGS)
-            if quote_config.sales_commission_rate > 0:
-                commission_amount = cost_of_goods_sold * quote_config.sales_commission_rate
-                applied_rates_info.append(
-                    AppliedRateInfoEntry(
-                        name="Sales Commission",
-                        type="fee_on_cogs",
-                        rate_value=quote_config.sales_commission_rate,
-                        applied_amount=commission_amount,
-                    )
-                )
-                current_subtotal += commission_amount
-
-            # 2. Franchise Fee (on COGS)
-            if quote_config.franchise_fee_rate > 0:
-                franchise_fee_amount = cost_of_goods_sold * quote_config.franchise_fee_rate
-                applied_rates_info.append(
-                    AppliedRateInfoEntry(
-                        name="Franchise Fee",
-                        type="fee_on_cogs",
-                        rate_value=quote_config.franchise_fee_rate,
-                        applied_amount=franchise_fee_amount,
-                    )
-                )
-                current_subtotal += franchise_fee_amount
+            if quote.quote_config.round_up_materials: # Check the flag
+                rounded_quantity = Decimal(math.ceil(original_quantity))
+                leftover_amount = rounded_quantity - original_quantity
+                bom_entry.leftovers = quantize_decimal(leftover_amount) if leftover_amount > 0 else Decimal(0)
+            else:
+                rounded_quantity = original_quantity # No rounding
+                bom_entry.leftovers = Decimal(0) # No leftovers if not rounding up
             
-            # 3. Margin (on the subtotal after COGS-based fees)
-            # The plan implies margin is on COGS, but typically margin is applied on the cost *after* direct fees tied to COGS.
-            # Let's assume margin is applied on (COGS + COGS-based fees).
-            # If margin is strictly on COGS, then `cost_base_for_margin = cost_of_goods_sold`
-            cost_base_for_margin = current_subtotal 
-            if quote_config.margin_rate > 0:
-                # Margin calculation: Price = Cost / (1 - MarginRate)
-                # Markup Amount = Price - Cost = Cost * MarginRate / (1 - MarginRate)
-                if quote_config.margin_rate >= 1:
-                     raise ValueError("Margin rate cannot be 100% or more.")
-                margin_amount = (cost_base_for_margin * quote_config.margin_rate) / (1 - quote_config.margin_rate)
-                
-                applied_rates_info.append(
-                    AppliedRateInfoEntry(
-                        name="Margin",
-                        type="margin", # This is a margin, not a simple markup fee
-                        rate_value=quote_config.margin_rate,
-                        applied_amount=margin_amount,
-                    )
+            bom_entry.quantity = rounded_quantity
+
+            # Round up cull units separately for reporting, if needed, or keep as calculated
+            if bom_entry.cull_units is not None:
+                bom_entry.cull_units = quantize_decimal(bom_entry.cull_units) # Or math.ceil if whole units are culled
+
+            bom_entry.total_cost = bom_entry.quantity * bom_entry.unit_cost
+            bom_entry.total_cost = final_quantize_decimal(bom_entry.total_cost) 
+            total_material_cost_for_quote += bom_entry.total_cost
+
+        # Finalize BOM list
+        final_bom_list = [
+            bom_entry for bom_entry in bill_of_materials_aggregated.values()
+        ]
+
+        return total_labor_cost_for_quote, total_material_cost_for_quote, final_bom_list
+
+    def _compute_fixed_point_totals(
+        self, quote: Quote
+    ) -> Optional[Tuple[Decimal, Decimal, List[BillOfMaterialEntry]]]:
+        """
+        Same as `_compute_decimal_totals` but in scaled integers. Returns None when the
+        integer result cannot be proven identical, so the caller can use Decimal instead.
+        """
+        entries = [
+            EntryPlans(
+                product_plan=self._get_product_plan(entry),
+                option_plans=tuple(self._get_option_plan(qpev) for qpev in entry.selected_variations),
+                product_quantity=entry.quantity_of_product_units,
+            )
+            for entry in quote.product_entries
+        ]
+        try:
+            with calc_phase("aggregate"):
+                totals = compute_fixed_point_totals(entries, bool(quote.quote_config.round_up_materials))
+        except FixedPointOverflow as e:
+            logger.warning(f"Fixed-point calculation not exact for Quote ID: {quote.id} ({str(e)}); using Decimal.")
+            return None
+        return totals.total_labor_cost, totals.total_material_cost, totals.bill_of_materials
+
+    def _compute_calculated_quote(self, quote: Quote, fixed_point: bool = False) -> CalculatedQuoteBase:
+        """
+        Runs the pure calculation for a loaded quote; never touches the session.
+        `fixed_point` evaluates labor and BOM arithmetic in scaled integers, which gives
+        identical results and is used by the read-only and batch workloads.
+        """
+        quote_id = quote.id
+        totals = self._compute_fixed_point_totals(quote) if fixed_point else None
+        if totals is None:
+            totals = self._compute_decimal_totals(quote)
+        total_labor_cost_for_quote, total_material_cost_for_quote, final_bom_list = totals
+
+        # --- COGS Calculation ---
+        cost_of_goods_sold = total_material_cost_for_quote + total_labor_cost_for_quote
+
+        with calc_phase("rates"):
+            applied_rates_info, subtotal_before_tax, tax_amount, final_price = self._apply_rates(
+                quote.quote_config, cost_of_goods_sold
+            )
+
+        with calc_phase("serialize"):
+            return self._build_calculated_quote(
+                quote_id,
+                final_bom_list,
+                total_material_cost_for_quote,
+                total_labor_cost_for_quote,
+                cost_of_goods_sold,
+                applied_rates_info,
+                subtotal_before_tax,
+                tax_amount,
+                final_price,
+            )
+
+    def _apply_rates(
+        self, quote_config: QuoteConfig, cost_of_goods_sold: Decimal
+    ) -> Tuple[List[AppliedRateInfoEntry], Decimal, Decimal, Decimal]:
+        """Applies the config's fees, margin and tax; returns the rate lines, subtotal, tax and final price."""
+        # --- Apply QuoteConfig Rates ---
+        applied_rates_info: List[AppliedRateInfoEntry] = []
+        current_subtotal = cost_of_goods_sold
+
+        # 1. Sales Commission (on COGS)
+        if quote_config.sales_commission_rate > 0:
+            commission_amount = cost_of_goods_sold * quote_config.sales_commission_rate
+            applied_rates_info.append(
+                AppliedRateInfoEntry(
+                    name="Sales Commission",
+                    type="fee_on_cogs",
+                    rate_value=quote_config.sales_commission_rate,
+                    applied_amount=commission_amount,
                 )
-                current_subtotal += margin_amount
-
-
-            # 4. Additional Fixed Fees (added after margin)
-            if quote_config.additional_fixed_fees > 0:
-                applied_rates_info.append(
-                    AppliedRateInfoEntry(
-                        name="Additional Fixed Fees",
-                        type="fee_fixed",
-                        rate_value=quote_config.additional_fixed_fees, # Store the fixed amount as 'rate'
-                        applied_amount=quote_config.additional_fixed_fees,
-                    )
+            )
+            current_subtotal += commission_amount
+
+        # 2. Franchise Fee (on COGS)
+        if quote_config.franchise_fee_rate > 0:
+            franchise_fee_amount = cost_of_goods_sold * quote_config.franchise_fee_rate
+            applied_rates_info.append(
+                AppliedRateInfoEntry(
+                    name="Franchise Fee",
+                    type="fee_on_cogs",
+                    rate_value=quote_config.franchise_fee_rate,
+                    applied_amount=franchise_fee_amount,
                 )
-                current_subtotal += quote_config.additional_fixed_fees
+            )
+            current_subtotal += franchise_fee_amount
+        
+        # 3. Margin (on the subtotal after COGS-based fees)
+        # The plan implies margin is on COGS, but typically margin is applied on the cost *after* direct fees tied to COGS.
+        # Let's assume margin is applied on (COGS + COGS-based fees).
+        # If margin is strictly on COGS, then `cost_base_for_margin = cost_of_goods_sold`
+        cost_base_for_margin = current_subtotal 
+        if quote_config.margin_rate > 0:
+            # Margin calculation: Price = Cost / (1 - MarginRate)
+            # Markup Amount = Price - Cost = Cost * MarginRate / (1 - MarginRate)
+            if quote_config.margin_rate >= 1:
+                 raise ValueError("Margin rate cannot be 100% or more.")
+            margin_amount = (cost_base_for_margin * quote_config.margin_rate) / (1 - quote_config.margin_rate)
             
-            subtotal_before_tax = current_subtotal
+            applied_rates_info.append(
+                AppliedRateInfoEntry(
+                    name="Margin",
+                    type="margin", # This is a margin, not a simple markup fee
+                    rate_value=quote_config.margin_rate,
+                    applied_amount=margin_amount,
+                )
+            )
+            current_subtotal += margin_amount
 
-            # --- Tax Calculation (on subtotal_before_tax) ---
-            tax_amount = Decimal(0)
-            if quote_config.tax_rate > 0:
-                tax_amount = subtotal_before_tax * quote_config.tax_rate
-            
-            final_price = subtotal_before_tax + tax_amount
-
-            # --- Create or Update CalculatedQuote ---
-            # Round all final Decimal values to 2 decimal places
-            rounding_precision = Decimal('0.01')
-            logger.debug(f"Preparing CalculatedQuote data for Quote ID: {quote_id}")
-
-            calculated_quote_data = CalculatedQuoteBase(
-                quote_id=quote_id,
-                bill_of_materials_json=[ # Convert list of Pydantic models to list of dicts
-                    bom.model_dump(mode='json') # Use model_dump(mode='json') for Pydantic models
-                    for bom in final_bom_list
-                ],
-                total_material_cost=total_material_cost_for_quote.quantize(rounding_precision, ROUND_HALF_UP),
-                total_labor_cost=total_labor_cost_for_quote.quantize(rounding_precision, ROUND_HALF_UP),
-                cost_of_goods_sold=cost_of_goods_sold.quantize(rounding_precision, ROUND_HALF_UP),
-                applied_rates_info_json=[ # Convert list of Pydantic models to list of dicts
-                    rate.model_dump(mode='json') # Use model_dump(mode='json') for Pydantic models
-                    for rate in applied_rates_info
-                ],
-                subtotal_before_tax=subtotal_before_tax.quantize(rounding_precision, ROUND_HALF_UP),
-                tax_amount=tax_amount.quantize(rounding_precision, ROUND_HALF_UP),
-                final_price=final_price.quantize(rounding_precision, ROUND_HALF_UP),
+
+        # 4. Additional Fixed Fees (added after margin)
+        if quote_config.additional_fixed_fees > 0:
+            applied_rates_info.append(
+                AppliedRateInfoEntry(
+                    name="Additional Fixed Fees",
+                    type="fee_fixed",
+                    rate_value=quote_config.additional_fixed_fees, # Store the fixed amount as 'rate'
+                    applied_amount=quote_config.additional_fixed_fees,
+                )
             )
-            logger.debug(f"CalculatedQuoteBase data prepared: {calculated_quote_data.model_dump_json(indent=2)}")
+            current_subtotal += quote_config.additional_fixed_fees
+        
+        subtotal_before_tax = current_subtotal
+
+        # --- Tax Calculation (on subtotal_before_tax) ---
+        tax_amount = Decimal(0)
+        if quote_config.tax_rate > 0:
+            tax_amount = subtotal_before_tax * quote_config.tax_rate
+        
+        final_price = subtotal_before_tax + tax_amount
+        return applied_rates_info, subtotal_before_tax, tax_amount, final_price
+
+    def _build_calculated_quote(
+        self,
+        quote_id: int,
+        final_bom_list: List[BillOfMaterialEntry],
+        total_material_cost_for_quote: Decimal,
+        total_labor_cost_for_quote: Decimal,
+        cost_of_goods_sold: Decimal,
+        applied_rates_info: List[AppliedRateInfoEntry],
+        subtotal_before_tax: Decimal,
+        tax_amount: Decimal,
+        final_price: Decimal,
+    ) -> CalculatedQuoteBase:
+        # --- Create or Update CalculatedQuote ---
+        # Round all final Decimal values to 2 decimal places
+        rounding_precision = Decimal('0.01')
+        logger.debug(f"Preparing CalculatedQuote data for Quote ID: {quote_id}")
+
+        calculated_quote_data = CalculatedQuoteBase(
+            quote_id=quote_id,
+            bill_of_materials_json=[ # Convert list of Pydantic models to list of dicts
+                bom.model_dump(mode='json') # Use model_dump(mode='json') for Pydantic models
+                for bom in final_bom_list
+            ],
+            total_material_cost=total_material_cost_for_quote.quantize(rounding_precision, ROUND_HALF_UP),
+            total_labor_cost=total_labor_cost_for_quote.quantize(rounding_precision, ROUND_HALF_UP),
+            cost_of_goods_sold=cost_of_goods_sold.quantize(rounding_precision, ROUND_HALF_UP),
+            applied_rates_info_json=[ # Convert list of Pydantic models to list of dicts
+                rate.model_dump(mode='json') # Use model_dump(mode='json') for Pydantic models
+                for rate in applied_rates_info
+            ],
+            subtotal_before_tax=subtotal_before_tax.quantize(rounding_precision, ROUND_HALF_UP),
+            tax_amount=tax_amount.quantize(rounding_precision, ROUND_HALF_UP),
+            final_price=final_price.quantize(rounding_precision, ROUND_HALF_UP),
+        )
+        logger.debug(f"CalculatedQuoteBase data prepared: {calculated_quote_data.model_dump_json(indent=2)}")
+        return calculated_quote_data
+
+    def calculate_quote_preview(
+        self, quote_id: int, session: Session
+    ) -> CalculatedQuoteBase:
+        """
+        Calculates a quote without persisting anything: no CalculatedQuote upsert,
+        no status change and no commit. Used for live totals while a quote is edited.
+        """
+        logger.info(f"Starting preview calculation for Quote ID: {quote_id}")
+        try:
+            with calc_phase("load"):
+                loaded = self._load_quote(quote_id, session)
+            return self.offload(lambda: self._compute_calculated_quote(loaded.quote, fixed_point=True))
+        except Exception as e:
+            logger.error(f"Error during preview calculation for Quote ID: {quote_id}: {str(e)}", exc_info=True)
+            raise
+
+    def calculate_and_save_quote(
+        self, quote_id: int, session: Session, force: bool = False, commit: bool = True
+    ) -> CalculatedQuote:
+        """
+        Calculates a quote and upserts its CalculatedQuote. When the stored result was
+        calculated from identical inputs it is returned as is, unless `force` is set.
+        With `commit=False` the changes are only flushed and the caller owns the transaction.
+        """
+        logger.info(f"Starting quote calculation for Quote ID: {quote_id}")
+        
+        try: # Add try-except block for robust error logging
+            with calc_phase("load"):
+                loaded = self._load_quote(quote_id, session)
+            quote = loaded.quote
+            with calc_phase("fingerprint"):
+                input_fingerprint = self.fingerprint_inputs(quote)
 
             # Check if a CalculatedQuote already exists for this quote_id
             logger.debug(f"Checking for existing CalculatedQuote for Quote ID: {quote_id}")
-            existing_calculated_quote = session.exec(
-                select(CalculatedQuote).where(CalculatedQuote.quote_id == quote_id)
-            ).first()
-
-            if existing_calculated_quote:
-                logger.info(f"Found existing CalculatedQuote ID: {existing_calculated_quote.id} for Quote ID: {quote_id}. Updating.")
-                # Update existing
-                for key, value in calculated_quote_data.model_dump(exclude_unset=True).items():
-                    setattr(existing_calculated_quote, key, value)
-                db_calculated_quote = existing_calculated_quote
+            with calc_phase("load"):
+                existing_calculated_quote = session.exec(
+                    select(CalculatedQuote).where(CalculatedQuote.quote_id == quote_id)
+                ).first()
+
+            if (
+                not force
+                and existing_calculated_quote
+                and existing_calculated_quote.input_fingerprint == input_fingerprint
+            ):
+                logger.info(f"Inputs of Quote ID: {quote_id} are unchanged. Returning stored CalculatedQuote ID: {existing_calculated_quote.id}")
+                if quote.status != QuoteStatus.CALCULATED:
+                    quote.status = QuoteStatus.CALCULATED
+                    session.add(quote)
+                    with calc_phase("commit"):
+                        if commit:
+                            session.commit()
+                        else:
+                            session.flush()
+                return existing_calculated_quote
+
+            calculated_quote_data = self.offload(lambda: self._compute_calculated_quote(quote))
+            calculated_quote_data.input_fingerprint = input_fingerprint
+
+            if supports_calculated_quote_upsert(session):
+                # Atomic upsert: a concurrent calculation of the same quote updates the row instead of failing
+                logger.debug(f"Upserting CalculatedQuote for Quote ID: {quote_id}")
+                upsert_calculated_quotes([calculated_quote_data], session)
+                db_calculated_quote = session.exec(
+                    select(CalculatedQuote)
+                    .where(CalculatedQuote.quote_id == quote_id)
+                    .execution_options(populate_existing=True)
+                ).one()
             else:
-                logger.info(f"No existing CalculatedQuote found for Quote ID: {quote_id}. Creating new.")
-                # Create new
-                db_calculated_quote = CalculatedQuote.model_validate(calculated_quote_data)
-            
-            logger.debug(f"Adding CalculatedQuote object to session for Quote ID: {quote_id}")
-            session.add(db_calculated_quote)
+                logger.debug(f"Saving CalculatedQuote through the ORM for Quote ID: {quote_id}")
+                db_calculated_quote = _save_calculated_quote(calculated_quote_data, existing_calculated_quote, session)
             
-            # Update quote status
+            # Update quote status (version checked, so a concurrent edit of the quote fails this save)
             logger.debug(f"Updating status of Quote ID: {quote_id} to 'calculated'.")
             quote.status = QuoteStatus.CALCULATED
             session.add(quote)
             
             logger.info(f"Committing session for Quote ID: {quote_id}")
-            session.commit()
+            with calc_phase("commit"):
+                if commit:
+                    session.commit()
+                else:
+                    session.flush()
             logger.info(f"Session committed successfully for Quote ID: {quote_id}")
 
-            logger.debug(f"Refreshing db_calculated_quote instance for Quote ID: {quote_id}")
-            session.refresh(db_calculated_quote)
-            if quote: # mypy check
-                 logger.debug(f"Refreshing quote instance for Quote ID: {quote_id}")
-                 session.refresh(quote)
+            with calc_phase("refresh"):
+                logger.debug(f"Refreshing db_calculated_quote instance for Quote ID: {quote_id}")
+                session.refresh(db_calculated_quote)
+                if quote: # mypy check
+                     logger.debug(f"Refreshing quote instance for Quote ID: {quote_id}")
+                     session.refresh(quote)
 
             logger.info(f"Quote calculation and save successful for Quote ID: {quote_id}. Returning CalculatedQuote ID: {db_calculated_quote.id}")
             return db_calculated_quote
 
         except Exception as e:
             logger.error(f"Error during quote calculation for Quote ID: {quote_id}: {str(e)}", exc_info=True)
-            session.rollback() # Rollback in case of error
-            logger.info(f"Session rolled back for Quote ID: {quote_id} due to error.")
+            if commit:
+                session.rollback() # Rollback in case of error
+                logger.info(f"Session rolled back for Quote ID: {quote_id} due to error.")
             raise # Re-raise the exception after logging
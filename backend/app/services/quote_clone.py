@@ -0,0 +1,55 @@
+from sqlalchemy import insert, literal, null, select
+from sqlmodel import Session
+
+from app.models import CalculatedQuote, QuoteProductEntry, QuoteProductEntryVariation
+
+
+def copy_quote_contents(session: Session, source_quote_id: int, target_quote_id: int, include_calculation: bool = False) -> None:
+    """
+    Copies the entries and selected options of one quote, and optionally its
+    CalculatedQuote, into another with set-based INSERT ... SELECT statements: two or
+    three statements whatever the size of the quote, and no rows pass through Python.
+
+    New entries record the entry they were copied from in `cloned_from_entry_id`, which
+    is how the selections find their new entry. Does not commit.
+    """
+    entry = QuoteProductEntry.__table__.c
+    session.exec(
+        insert(QuoteProductEntry.__table__).from_select(
+            ["quote_id", "product_id", "quantity_of_product_units", "notes", "role", "cloned_from_entry_id"],
+            select(
+                literal(target_quote_id), entry.product_id, entry.quantity_of_product_units,
+                entry.notes, entry.role, entry.id,
+            )
+            .where(entry.quote_id == source_quote_id)
+            .order_by(entry.id) # New ids keep the original entry order
+        )
+    )
+
+    selection = QuoteProductEntryVariation.__table__.c
+    session.exec(
+        insert(QuoteProductEntryVariation.__table__).from_select(
+            ["quote_product_entry_id", "variation_option_id"],
+            select(entry.id, selection.variation_option_id)
+            .join_from(
+                QuoteProductEntryVariation.__table__, QuoteProductEntry.__table__,
+                entry.cloned_from_entry_id == selection.quote_product_entry_id,
+            )
+            .where(entry.quote_id == target_quote_id)
+        )
+    )
+
+    if include_calculation:
+        calculated = CalculatedQuote.__table__.c
+        copied_columns = [
+            "bill_of_materials_json", "total_material_cost", "total_labor_cost", "cost_of_goods_sold",
+            "applied_rates_info_json", "subtotal_before_tax", "tax_amount", "final_price", "calculated_at",
+        ]
+        # The fingerprint covers the quote id, so the copy is recalculated on its next calculate
+        session.exec(
+            insert(CalculatedQuote.__table__).from_select(
+                ["quote_id", *copied_columns, "input_fingerprint"],
+                select(literal(target_quote_id), *(calculated[name] for name in copied_columns), null())
+                .where(calculated.quote_id == source_quote_id)
+            )
+        )
@@ -0,0 +1,83 @@
+from typing import Iterable, Optional, Union
+
+from sqlalchemy import union
+from sqlalchemy.sql import CompoundSelect, Select
+from sqlmodel import select
+
+from app.models import (
+    ProductMaterial,
+    Quote,
+    QuoteProductEntry,
+    QuoteProductEntryVariation,
+    QuoteStatus,
+    VariationOptionMaterial,
+)
+
+
+def affected_quote_ids(
+    material_ids: Optional[Iterable[int]] = None,
+    product_ids: Optional[Iterable[int]] = None,
+    variation_option_ids: Optional[Iterable[int]] = None,
+) -> Optional[Union[Select, CompoundSelect]]:
+    """
+    Builds a query for the ids of quotes whose calculation depends on any of the given
+    catalog rows, following material -> product_material / variation_option_material ->
+    quote_product_entry -> quote. Every hop is an indexed foreign key, so the lookup
+    touches only the affected rows and always reflects the current catalog, including
+    edits made directly in the database.
+
+    Returns None when no catalog ids are given.
+    """
+    material_ids = list(material_ids or [])
+    product_ids = list(product_ids or [])
+    variation_option_ids = list(variation_option_ids or [])
+
+    branches = []
+    if material_ids:
+        # Base materials of the entry's product
+        branches.append(
+            select(QuoteProductEntry.quote_id)
+            .join(ProductMaterial, ProductMaterial.product_id == QuoteProductEntry.product_id)
+            .where(ProductMaterial.material_id.in_(material_ids))
+        )
+        # Materials added or removed by the entry's selected options
+        branches.append(
+            select(QuoteProductEntry.quote_id)
+            .join(QuoteProductEntryVariation, QuoteProductEntryVariation.quote_product_entry_id == QuoteProductEntry.id)
+            .join(
+                VariationOptionMaterial,
+                VariationOptionMaterial.variation_option_id == QuoteProductEntryVariation.variation_option_id,
+            )
+            .where(VariationOptionMaterial.material_id.in_(material_ids))
+        )
+    if product_ids:
+        branches.append(
+            select(QuoteProductEntry.quote_id).where(QuoteProductEntry.product_id.in_(product_ids))
+        )
+    if variation_option_ids:
+        branches.append(
+            select(QuoteProductEntry.quote_id)
+            .join(QuoteProductEntryVariation, QuoteProductEntryVariation.quote_product_entry_id == QuoteProductEntry.id)
+            .where(QuoteProductEntryVariation.variation_option_id.in_(variation_option_ids))
+        )
+
+    if not branches:
+        return None
+    return union(*branches) if len(branches) > 1 else branches[0]
+
+
+def stale_quotes_statement(
+    material_ids: Optional[Iterable[int]] = None,
+    product_ids: Optional[Iterable[int]] = None,
+    variation_option_ids: Optional[Iterable[int]] = None,
+) -> Optional[Select]:
+    """Selects the CALCULATED quotes whose stored results a catalog change invalidates."""
+    quote_ids = affected_quote_ids(material_ids, product_ids, variation_option_ids)
+    if quote_ids is None:
+        return None
+    return (
+        select(Quote)
+        .where(Quote.id.in_(quote_ids))
+        .where(Quote.status == QuoteStatus.CALCULATED)
+        .order_by(Quote.id)
+    )
@@ -0,0 +1,158 @@
+import logging
+from typing import Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy.orm import joinedload, selectinload
+from sqlmodel import Session, select
+
+from app.models import (
+    Material,
+    Product,
+    ProductMaterial,
+    Quote,
+    QuoteProductEntry,
+    VariationOption,
+    VariationOptionMaterial,
+)
+from app.services.pricing_plan import PricingPlanCache
+
+logger = logging.getLogger("app.services.quote_loader")
+
+
+class LoadedQuote(NamedTuple):
+    """A quote plus strong references to the catalog objects prefetched for it."""
+    quote: Quote
+    # The session's identity map only holds weak references, so these keep the
+    # prefetched graphs alive until the calculator has compiled them into plans.
+    products: List[Product]
+    variation_options: List[VariationOption]
+    # plan_cache.generation before anything was loaded; plans compiled from these rows are put with it
+    plan_generation: Optional[int] = None
+
+
+class LoadedQuoteBatch(NamedTuple):
+    """Several quotes plus strong references to the catalog objects prefetched for them."""
+    quotes: List[Quote]
+    products: List[Product]
+    variation_options: List[VariationOption]
+    plan_generation: Optional[int] = None
+
+
+def prefetch_product_graphs(session: Session, product_ids: Iterable[int]) -> List[Product]:
+    """Loads products with their materials and unit types into the session in two queries."""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return []
+    statement = (
+        select(Product)
+        .where(Product.id.in_(product_ids))
+        .options(
+            selectinload(Product.product_materials)
+            .joinedload(ProductMaterial.material)
+            .joinedload(Material.unit_type)
+        )
+    )
+    return list(session.exec(statement).all())
+
+
+def prefetch_option_graphs(session: Session, variation_option_ids: Iterable[int]) -> List[VariationOption]:
+    """Loads variation options with their materials and unit types into the session in two queries."""
+    variation_option_ids = list(variation_option_ids)
+    if not variation_option_ids:
+        return []
+    statement = (
+        select(VariationOption)
+        .where(VariationOption.id.in_(variation_option_ids))
+        .options(
+            selectinload(VariationOption.variation_option_materials)
+            .joinedload(VariationOptionMaterial.material)
+            .joinedload(Material.unit_type)
+        )
+    )
+    return list(session.exec(statement).all())
+
+
+def _missing_plan_ids(
+    quotes: Iterable[Quote], plan_cache: Optional[PricingPlanCache]
+) -> Tuple[Set[int], Set[int]]:
+    """Collects the product and variation option ids of the quotes that have no cached plan."""
+    missing_product_ids = set()
+    missing_option_ids = set()
+    for quote in quotes:
+        for entry in quote.product_entries:
+            if entry.product_id is not None and (plan_cache is None or plan_cache.get_product_plan(entry.product_id) is None):
+                missing_product_ids.add(entry.product_id)
+            for qpev in entry.selected_variations:
+                option_id = qpev.variation_option_id
+                if option_id is not None and (plan_cache is None or plan_cache.get_option_plan(option_id) is None):
+                    missing_option_ids.add(option_id)
+    return missing_product_ids, missing_option_ids
+
+
+def load_quote_for_calculation(
+    session: Session, quote_id: int, plan_cache: Optional[PricingPlanCache] = None
+) -> Optional[LoadedQuote]:
+    """
+    Fetches everything QuoteCalculator needs for a quote in a fixed number of queries.
+
+    The quote, its config, entries and selected options are always loaded. Product and
+    variation option graphs are only loaded for plans missing from `plan_cache`, so a
+    warm cache skips the catalog entirely. Related objects land in the session's identity
+    map, which lets the calculator follow `entry.product` / `qpev.variation_option`
+    without lazy-load round trips.
+    """
+    plan_generation = plan_cache.generation if plan_cache is not None else None
+    quote = session.get(
+        Quote,
+        quote_id,
+        options=[
+            joinedload(Quote.quote_config),
+            selectinload(Quote.product_entries).selectinload(QuoteProductEntry.selected_variations),
+        ],
+    )
+    if not quote:
+        return None
+
+    missing_product_ids, missing_option_ids = _missing_plan_ids([quote], plan_cache)
+    logger.debug(
+        f"Prefetching {len(missing_product_ids)} product and {len(missing_option_ids)} option graphs for Quote ID: {quote_id}"
+    )
+    return LoadedQuote(
+        quote=quote,
+        products=prefetch_product_graphs(session, missing_product_ids),
+        variation_options=prefetch_option_graphs(session, missing_option_ids),
+        plan_generation=plan_generation,
+    )
+
+
+def load_quotes_for_calculation(
+    session: Session, quote_ids: Iterable[int], plan_cache: Optional[PricingPlanCache] = None
+) -> LoadedQuoteBatch:
+    """
+    Bulk counterpart of `load_quote_for_calculation`: loads many quotes with their configs,
+    entries and selected options, plus every catalog graph their plans still need, in the
+    same fixed number of queries regardless of how many quotes are requested.
+    """
+    quote_ids = list(quote_ids)
+    if not quote_ids:
+        return LoadedQuoteBatch(quotes=[], products=[], variation_options=[])
+    plan_generation = plan_cache.generation if plan_cache is not None else None
+    statement = (
+        select(Quote)
+        .where(Quote.id.in_(quote_ids))
+        .options(
+            joinedload(Quote.quote_config),
+            selectinload(Quote.product_entries).selectinload(QuoteProductEntry.selected_variations),
+        )
+    )
+    quotes = list(session.exec(statement).unique().all())
+
+    missing_product_ids, missing_option_ids = _missing_plan_ids(quotes, plan_cache)
+    logger.debug(
+        f"Prefetching {len(missing_product_ids)} product and {len(missing_option_ids)} option graphs for {len(quotes)} quotes"
+    )
+    return LoadedQuoteBatch(
+        quotes=quotes,
+        products=prefetch_product_graphs(session, missing_product_ids),
+        variation_options=prefetch_option_graphs(session, missing_option_ids),
+        plan_generation=plan_generation,
+    )
@@ -0,0 +1,41 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import tuple_
+from sqlalchemy.sql import Select
+
+from app.models import Quote
+
+# Quote listings are ordered newest first; id breaks ties between equal timestamps.
+# Backed by the composite index ix_quote_updated_at_id.
+QUOTE_LIST_ORDER = (Quote.updated_at.desc(), Quote.id.desc())
+
+
+def encode_quote_cursor(quote: Quote) -> str:
+    """Opaque cursor that resumes a listing right after `quote`."""
+    payload = json.dumps([quote.updated_at.isoformat(), quote.id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_quote_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        updated_at, quote_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(updated_at), int(quote_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid quote cursor: {cursor}") from e
+
+
+def order_quotes(statement: Select, cursor: Optional[str] = None) -> Select:
+    """
+    Orders a quote query by (updated_at DESC, id DESC) and, given a cursor, starts it after
+    the cursor's quote. The row comparison is answered from the composite index, so a
+    deep page costs the same as the first one.
+    """
+    statement = statement.order_by(*QUOTE_LIST_ORDER)
+    if cursor:
+        updated_at, quote_id = decode_quote_cursor(cursor)
+        statement = statement.where(tuple_(Quote.updated_at, Quote.id) < tuple_(updated_at, quote_id))
+    return statement
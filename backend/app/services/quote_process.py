@@ -2,11 +2,12 @@ import logging
 from datetime import datetime, timezone
 from decimal import Decimal, Decimal as D
 from enum import Enum
-from typing import List, Optional, Dict, Any
+from typing import Annotated, List, Literal, Optional, Dict, Any, Set, Union
 
 from fastapi import HTTPException
-from pydantic import BaseModel, ConfigDict, field_validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
 from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.exc import StaleDataError
 from sqlmodel import Session, select, func
 
 # Assuming your models are in a structure like 'app.models'
@@ -23,17 +24,35 @@ from app.models import (
     VariationOption,
     QuoteProductEntryVariation,
     CalculatedQuote,
+    CalculatedQuoteBase,
     VariationSelectionType,
     QuoteConfig,
     ProductProductCategoryLink, # Added ProductProductCategoryLink
 )
-from app.services.quote_calculator import QuoteCalculator
+from app.services.batch_calculator import BatchQuoteCalculator
+from app.services.product_configurator import (
+    ProductConfigurator,
+    ProductConfiguratorCache,
+    build_product_configurator,
+)
+from app.services.quote_calculator import Offload, QuoteCalculator, run_inline
+from app.services.quote_clone import copy_quote_contents
+from app.services.quote_dependencies import stale_quotes_statement
+from app.services.quote_pagination import encode_quote_cursor, order_quotes
+from app.services.ui_state_buffer import UiStateBuffer
 
 # Configure logger for this service, mirroring QuoteCalculator's style
 logger = logging.getLogger("app.services.quote_process_service")
 logger.setLevel(logging.DEBUG)
 logger.propagate = True
 
+QUOTE_CONFLICT_DETAIL = "The quote was changed by another request; reload it and try again."
+
+
+def touch_quote(quote: Quote) -> None:
+    """Marks a quote as changed when its entries change, so its updated_at-based ETag changes too."""
+    quote.updated_at = datetime.now(timezone.utc)
+
 
 class QuotePreview(BaseModel):
     """A lightweight summary of a quote for list views."""
@@ -108,8 +127,117 @@ class MaterializedProductEntry(BaseModel):
 
 class FullQuote(QuotePreview):
     """A complete quote with all materialized product entries for the UI."""
+    version: int # Send back in If-Match to make an edit conditional on this state
     product_entries: List[MaterializedProductEntry] = []
 
+class QuotePage(BaseModel):
+    """One page of a keyset-paginated quote listing."""
+    items: List[QuotePreview]
+    next_cursor: Optional[str] = None # Pass back as `cursor` for the next page; None on the last page
+
+class BatchCalculationSummary(BaseModel):
+    """Outcome of recalculating several quotes at once."""
+    calculated_quote_ids: List[int]
+    unchanged_quote_ids: List[int]
+    failed: Dict[int, str]
+
+
+# ===================================================================================
+# Quote Operation Batches
+# ===================================================================================
+
+class AddEntryOperation(BaseModel):
+    op: Literal["add_entry"]
+    product_id: int
+    quantity: Decimal
+    role: ProductRole = ProductRole.DEFAULT
+
+
+class EntryOperation(BaseModel):
+    """
+    Base for operations on one entry of the quote. The entry is either an existing one
+    (`product_entry_id`) or one added earlier in the same batch (`entry_ref`, the index
+    of its add_entry operation).
+    """
+    product_entry_id: Optional[int] = None
+    entry_ref: Optional[int] = None
+
+    @model_validator(mode="after")
+    def check_entry_reference(self):
+        if (self.product_entry_id is None) == (self.entry_ref is None):
+            raise ValueError("Exactly one of product_entry_id and entry_ref must be given.")
+        return self
+
+
+class UpdateEntryOperation(EntryOperation):
+    op: Literal["update_entry"]
+    quantity: Optional[Decimal] = None
+    notes: Optional[str] = None
+
+
+class DeleteEntryOperation(EntryOperation):
+    op: Literal["delete_entry"]
+
+
+class ToggleVariationOperation(EntryOperation):
+    op: Literal["toggle_variation"]
+    variation_option_id: int
+
+
+class SetVariationsOperation(EntryOperation):
+    op: Literal["set_variations"]
+    variation_option_ids: List[int]
+
+
+class SetUiStateOperation(BaseModel):
+    op: Literal["set_ui_state"]
+    ui_state: str
+
+
+class SetStatusOperation(BaseModel):
+    op: Literal["set_status"]
+    status: str
+
+
+QuoteOperation = Annotated[
+    Union[
+        AddEntryOperation, UpdateEntryOperation, DeleteEntryOperation, ToggleVariationOperation,
+        SetVariationsOperation, SetUiStateOperation, SetStatusOperation,
+    ],
+    Field(discriminator="op"),
+]
+
+
+def build_materialized_entry(
+    tree: ProductConfigurator, selected_option_ids: Set[int], entry_values: Dict[str, Any]
+) -> MaterializedProductEntry:
+    """Builds an entry DTO from its product tree, selected option ids and column values."""
+    materialized_groups = [
+        VariationGroupView(
+            id=group.id,
+            name=group.name,
+            selection_type=group.selection_type,
+            is_required=group.is_required,
+            options=[
+                VariationOptionView(
+                    id=option.id,
+                    name=option.name,
+                    value_description=option.value_description,
+                    additional_price=option.additional_price,
+                    is_selected=option.id in selected_option_ids,
+                )
+                for option in group.options
+            ],
+        )
+        for group in tree.groups
+    ]
+    return MaterializedProductEntry(
+        product_name=tree.product_name,
+        product_unit=tree.product_unit,
+        variation_groups=materialized_groups,
+        **entry_values,
+    )
+
 
 # ===================================================================================
 # Quote Process Service
@@ -120,15 +248,93 @@ class QuoteProcessService:
     Orchestrates the creation and modification of quotes and their components.
     This service is designed to be called by an API layer.
     """
-    def __init__(self, session: Session):
+    def __init__(
+        self,
+        session: Session,
+        calculator: Optional[QuoteCalculator] = None,
+        configurator_cache: Optional[ProductConfiguratorCache] = None,
+        ui_state_buffer: Optional[UiStateBuffer] = None,
+        populate_caches: bool = True,
+        offload: Offload = run_inline,
+    ):
         """
         Initializes the service with a database session.
 
         Args:
             session: The SQLAlchemy/SQLModel session for database operations.
+            calculator: Optional QuoteCalculator, e.g. one sharing a process-wide plan cache.
+            configurator_cache: Optional cache of product variation trees, e.g. the process-wide one.
+            ui_state_buffer: Optional write-behind buffer for ui_state; without it ui_state is written directly.
+            populate_caches: Whether product trees built by this service are stored in configurator_cache;
+                False for sessions on a read replica, whose rows can lag the primary.
+            offload: Runs the CPU-bound steps (calculation, building entry DTOs); set on the
+                calculator too. The default runs them inline.
         """
         self.session = session
-        self.calculator = QuoteCalculator()
+        self.calculator = calculator if calculator is not None else QuoteCalculator()
+        self.configurator_cache = configurator_cache if configurator_cache is not None else ProductConfiguratorCache()
+        self.ui_state_buffer = ui_state_buffer
+        self.populate_caches = populate_caches
+        self.offload = offload
+        self.calculator.offload = offload
+        self._in_batch = False
+        # Quotes whose version was checked; held so the session's weak identity map keeps them
+        self._version_checked: Dict[int, Quote] = {}
+
+    def _commit(self) -> None:
+        """
+        Commits a single mutation; inside `apply_quote_operations` it only flushes. A
+        version conflict with a concurrent writer becomes a 409.
+        """
+        try:
+            if self._in_batch:
+                self.session.flush()
+            else:
+                self.session.commit()
+        except StaleDataError as e:
+            raise HTTPException(status_code=409, detail=QUOTE_CONFLICT_DETAIL) from e
+
+    def check_quote_version(self, quote_id: int, expected_version: Optional[int]) -> None:
+        """
+        Fails with 412 unless the quote is still at `expected_version` (from If-Match).
+        The quote stays in the session, so the following write is checked against the
+        same version and a concurrent change in between still fails with 409.
+        """
+        if expected_version is None:
+            return
+        quote = self.session.get(Quote, quote_id)
+        if not quote:
+            raise HTTPException(status_code=404, detail=f"Quote with id {quote_id} not found")
+        if quote.version != expected_version:
+            logger.info(f"Version mismatch for Quote ID: {quote_id}: expected {expected_version}, found {quote.version}")
+            raise HTTPException(
+                status_code=412,
+                detail=f"Quote {quote_id} is at version {quote.version}, not {expected_version}; reload it and try again.",
+            )
+        self._version_checked[quote_id] = quote
+
+    def check_entry_quote_version(self, product_entry_id: int, expected_version: Optional[int]) -> None:
+        """check_quote_version for the quote that owns a product entry."""
+        if expected_version is None:
+            return
+        entry = self.session.get(QuoteProductEntry, product_entry_id)
+        if not entry:
+            raise HTTPException(status_code=404, detail=f"QuoteProductEntry with id {product_entry_id} not found")
+        self.check_quote_version(entry.quote_id, expected_version)
+
+    def check_entries_quote_version(self, product_entry_ids: List[int], expected_version: Optional[int]) -> None:
+        """check_quote_version for every quote owning one of the entries, e.g. for a bulk edit."""
+        if expected_version is None:
+            return
+        product_entry_ids = list(dict.fromkeys(product_entry_ids))
+        quote_ids_by_entry = dict(self.session.exec(
+            select(QuoteProductEntry.id, QuoteProductEntry.quote_id).where(QuoteProductEntry.id.in_(product_entry_ids))
+        ).all())
+        missing = [entry_id for entry_id in product_entry_ids if entry_id not in quote_ids_by_entry]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"QuoteProductEntry with id {missing[0]} not found")
+        for quote_id in sorted(set(quote_ids_by_entry.values())):
+            self.check_quote_version(quote_id, expected_version)
 
     def _check_quote_editable(self, quote: Quote) -> None:
         """Helper method to check if a quote can be modified."""
@@ -139,6 +345,13 @@ class QuoteProcessService:
                 detail="Cannot modify a finalized quote"
             )
 
+    def _apply_buffered_ui_state(self, quote: Quote) -> Quote:
+        """Shows a ui_state still waiting in the write-behind buffer."""
+        return self.ui_state_buffer.overlay(quote) if self.ui_state_buffer is not None else quote
+
+    def _touch_quote(self, quote: Quote) -> None:
+        touch_quote(quote)
+
     def _materialize_product_entry(self, entry: QuoteProductEntry) -> MaterializedProductEntry:
         """
         Private helper to convert a QuoteProductEntry model into a rich DTO.
@@ -146,63 +359,85 @@ class QuoteProcessService:
         This fetches all related data (product info, variations, selected options)
         and assembles it into a MaterializedProductEntry.
         """
-        product = self.session.get(Product, entry.product_id)
-        if not product:
-            raise ValueError(f"Product with ID {entry.product_id} not found for entry {entry.id}")
-
-        # Eagerly load variation options to avoid N+1 queries
-        statement = select(VariationGroup).where(VariationGroup.product_id == product.id).options(selectinload(VariationGroup.options))
-        variation_groups = self.session.exec(statement).all()
-
-        materialized_groups = []
-        for group in variation_groups:
-            materialized_options = []
-            for option in group.options:
-                is_selected = any(
-                    sel_var.variation_option_id == option.id
-                    for sel_var in entry.selected_variations
-                )
-                materialized_options.append(
-                    VariationOptionView(
-                        id=option.id,
-                        name=option.name,
-                        value_description=option.value_description,
-                        additional_price=option.additional_price,
-                        is_selected=is_selected,
-                    )
-                )
-            materialized_groups.append(
-                VariationGroupView(
-                    id=group.id,
-                    name=group.name,
-                    selection_type=group.selection_type,
-                    is_required=group.is_required,
-                    options=materialized_options,
+        return self._materialize_product_entries([entry])[0]
+
+    def _materialize_product_entries(
+        self, entries: List[QuoteProductEntry], skip_invalid: bool = False
+    ) -> List[MaterializedProductEntry]:
+        """
+        Converts many QuoteProductEntry models into DTOs in one pass.
+
+        Product trees come from the configurator cache; products not in it are loaded
+        together with their unit types, variation groups and options in a constant number
+        of queries, however many entries there are. Selections come from
+        `entry.selected_variations`, so callers should load it eagerly. An entry whose
+        product is missing raises ValueError, or is logged and left out when
+        `skip_invalid` is set.
+        """
+        product_ids = {entry.product_id for entry in entries}
+        trees_by_product_id: Dict[int, ProductConfigurator] = {}
+        for product_id in product_ids:
+            tree = self.configurator_cache.get(product_id)
+            if tree is not None:
+                trees_by_product_id[product_id] = tree
+
+        missing_product_ids = product_ids - set(trees_by_product_id)
+        if missing_product_ids:
+            # Trees built from rows invalidated while they were loading are used but not cached
+            generation = self.configurator_cache.generation
+            statement = (
+                select(Product)
+                .where(Product.id.in_(missing_product_ids))
+                .options(
+                    selectinload(Product.product_unit_type),
+                    selectinload(Product.variation_groups).selectinload(VariationGroup.options),
                 )
             )
+            for product in self.session.exec(statement).all():
+                tree = build_product_configurator(product)
+                if self.populate_caches:
+                    self.configurator_cache.put(tree, generation=generation)
+                trees_by_product_id[product.id] = tree
 
-        return MaterializedProductEntry(
-            id=entry.id,
-            quote_id=entry.quote_id,
-            product_id=entry.product_id,
-            product_name=product.name,
-            product_unit=product.product_unit_type.name,
-            role=entry.role,
-            quantity_of_product_units=entry.quantity_of_product_units,
-            notes=entry.notes,
-            variation_groups=materialized_groups,
-        )
+        # Read every row value here, while the session is usable; building the DTOs is
+        # pure and runs through `offload`
+        rows = []
+        for entry in entries:
+            tree = trees_by_product_id.get(entry.product_id)
+            if not tree:
+                if skip_invalid:
+                    logger.error(f"Product with ID {entry.product_id} not found for entry {entry.id}; skipping it.")
+                    continue
+                raise ValueError(f"Product with ID {entry.product_id} not found for entry {entry.id}")
+            selected_option_ids = {sel_var.variation_option_id for sel_var in entry.selected_variations}
+            rows.append((
+                tree, selected_option_ids,
+                dict(
+                    id=entry.id,
+                    quote_id=entry.quote_id,
+                    product_id=entry.product_id,
+                    role=entry.role,
+                    quantity_of_product_units=entry.quantity_of_product_units,
+                    notes=entry.notes,
+                ),
+            ))
+        return self.offload(lambda: [
+            build_materialized_entry(tree, selected_option_ids, entry_values)
+            for tree, selected_option_ids, entry_values in rows
+        ])
 
     # === Quote Management ===
     
     def get_quotes(self, quote_type: Optional[QuoteType] = None, offset: int = 0, limit: int = 100) -> List[QuotePreview]:
-        """Fetches a list of quotes, optionally filtered by type, with pagination."""
+        """
+        Fetches a list of quotes, optionally filtered by type, with offset pagination.
+        Kept for existing clients; `get_quotes_page` stays fast on deep pages.
+        """
         logger.info(f"Fetching quotes with type: {quote_type}, offset: {offset}, limit: {limit}")
         statement = select(Quote).offset(offset).limit(limit)
         if quote_type:
             statement = statement.where(Quote.quote_type == quote_type)
-        # Consider adding an order_by, e.g., .order_by(Quote.updated_at.desc())
-        statement = statement.order_by(Quote.updated_at.desc()) # Added default sorting
+        statement = order_quotes(statement) # Newest first, same order as get_quotes_page
         quotes = self.session.exec(statement).all()
         
         logger.debug(f"Raw quotes from database: {quotes}")
@@ -210,13 +445,46 @@ class QuoteProcessService:
         logger.debug(f"Validated quotes: {validated_quotes}")
         return validated_quotes
 
+    def get_quotes_page(self, quote_type: Optional[QuoteType] = None, cursor: Optional[str] = None, limit: int = 100) -> QuotePage:
+        """Fetches the page of quotes after `cursor` (the first page without one), newest first."""
+        logger.info(f"Fetching quote page with type: {quote_type}, cursor: {cursor}, limit: {limit}")
+        statement = select(Quote)
+        if quote_type:
+            statement = statement.where(Quote.quote_type == quote_type)
+        # One extra row tells whether there is a next page
+        quotes = self.session.exec(order_quotes(statement, cursor).limit(limit + 1)).all()
+        has_more = len(quotes) > limit
+        quotes = quotes[:limit]
+        return QuotePage(
+            items=[QuotePreview.model_validate(q) for q in quotes],
+            next_cursor=encode_quote_cursor(quotes[-1]) if has_more else None,
+        )
+
+    def get_stale_quotes(
+        self,
+        material_ids: Optional[List[int]] = None,
+        product_ids: Optional[List[int]] = None,
+        variation_option_ids: Optional[List[int]] = None,
+        offset: int = 0,
+        limit: int = 100,
+    ) -> List[QuotePreview]:
+        """Lists CALCULATED quotes whose results depend on the given materials, products or variation options."""
+        logger.info(
+            f"Fetching stale quotes for materials: {material_ids}, products: {product_ids}, variation options: {variation_option_ids}"
+        )
+        statement = stale_quotes_statement(material_ids, product_ids, variation_option_ids)
+        if statement is None:
+            raise ValueError("At least one material, product or variation option id is required.")
+        quotes = self.session.exec(statement.offset(offset).limit(limit)).all()
+        return [QuotePreview.model_validate(q) for q in quotes]
+
     def get_quote_by_id(self, quote_id: int) -> Quote:
         """Fetches a single quote by its ID."""
         logger.info(f"Fetching quote with ID: {quote_id}")
         quote = self.session.get(Quote, quote_id)
         if not quote:
             raise ValueError(f"Quote with ID {quote_id} not found")
-        return quote
+        return self._apply_buffered_ui_state(quote)
 
     def create_quote(self, name: str, description: Optional[str], quote_type: QuoteType, config_id: int = 1) -> Quote:
         """Creates a new quote with a specific type."""
@@ -237,7 +505,7 @@ class QuoteProcessService:
                 updated_at=datetime.now(timezone.utc),
             )
             self.session.add(new_quote)
-            self.session.commit()
+            self._commit()
             self.session.refresh(new_quote)
             logger.info(f"Successfully created Quote ID: {new_quote.id}")
             return new_quote
@@ -247,18 +515,25 @@ class QuoteProcessService:
             raise
 
     def update_quote_ui_state(self, quote_id: int, ui_state: str) -> Quote:
-        """Updates the UI state of a specific quote."""
+        """Updates the UI state of a specific quote; with a ui_state_buffer the write is deferred to its next flush."""
         logger.info(f"Updating UI state for Quote ID: {quote_id} to '{ui_state}'")
         quote = self.session.get(Quote, quote_id)
         if not quote:
             logger.warning(f"Quote ID {quote_id} not found for UI state update.")
             raise HTTPException(status_code=404, detail=f"Quote with id {quote_id} not found")
+
+        if self.ui_state_buffer is not None:
+            if not self._in_batch:
+                # Coalesced with later updates and written by the buffer's flush
+                self.ui_state_buffer.set(quote_id, ui_state)
+                return self.ui_state_buffer.overlay(quote)
+            self.ui_state_buffer.discard(quote_id) # A direct write supersedes the buffered value
         
         try:
             quote.ui_state = ui_state
             quote.updated_at = datetime.now(timezone.utc) # Also update timestamp
             self.session.add(quote)
-            self.session.commit()
+            self._commit()
             self.session.refresh(quote)
             logger.info(f"Successfully updated UI state for Quote ID: {quote_id} to '{ui_state}'")
             return quote
@@ -284,7 +559,7 @@ class QuoteProcessService:
             quote.status = status
             quote.updated_at = datetime.now(timezone.utc) # Also update timestamp
             self.session.add(quote)
-            self.session.commit()
+            self._commit()
             self.session.refresh(quote)
             logger.info(f"Successfully set status for Quote ID: {quote_id} to '{status}'")
             return quote
@@ -293,6 +568,45 @@ class QuoteProcessService:
             self.session.rollback()
             raise
 
+    def clone_quote(self, quote_id: int, name: Optional[str] = None, include_calculation: bool = False) -> Quote:
+        """
+        Copies a quote with its entries and selected options, and optionally its stored
+        calculation, as a new quote. The contents are copied with set-based statements,
+        so the cost is a constant number of statements regardless of quote size.
+        """
+        logger.info(f"Cloning Quote ID: {quote_id} (include_calculation={include_calculation})")
+        source = self.session.get(Quote, quote_id)
+        if not source:
+            raise HTTPException(status_code=404, detail=f"Quote with id {quote_id} not found")
+        self._apply_buffered_ui_state(source)
+        has_calculation = include_calculation and self.session.exec(
+            select(CalculatedQuote.id).where(CalculatedQuote.quote_id == quote_id)
+        ).first() is not None
+
+        try:
+            now = datetime.now(timezone.utc)
+            clone = Quote(
+                name=name if name is not None else f"Copy of {source.name}",
+                description=source.description,
+                quote_type=source.quote_type,
+                status=QuoteStatus.CALCULATED if has_calculation else QuoteStatus.DRAFT,
+                quote_config_id=source.quote_config_id,
+                ui_state=source.ui_state,
+                created_at=now,
+                updated_at=now,
+            )
+            self.session.add(clone)
+            self.session.flush()
+            copy_quote_contents(self.session, quote_id, clone.id, include_calculation=has_calculation)
+            self._commit()
+            self.session.refresh(clone)
+            logger.info(f"Successfully cloned Quote ID: {quote_id} as Quote ID: {clone.id}")
+            return clone
+        except Exception as e:
+            logger.error(f"Error cloning quote {quote_id}: {e}", exc_info=True)
+            self.session.rollback()
+            raise
+
     # === Product & Category Discovery ===
 
     def get_categories_previews(self, category_type: Optional[str] = None, offset: int = 0, limit: int = 100) -> List[CategoryPreview]: # Added pagination params
@@ -368,7 +682,8 @@ class QuoteProcessService:
                 role=role
             )
             self.session.add(new_entry)
-            self.session.commit()
+            self._touch_quote(quote)
+            self._commit()
             self.session.refresh(new_entry)
             logger.info(f"Successfully created QuoteProductEntry ID: {new_entry.id}")
             return self._materialize_product_entry(new_entry)
@@ -383,9 +698,7 @@ class QuoteProcessService:
         statement = (
             select(QuoteProductEntry)
             .where(QuoteProductEntry.quote_id == quote_id)
-            .options(selectinload(QuoteProductEntry.selected_variations), 
-                     selectinload(QuoteProductEntry.product).selectinload(Product.variation_groups).selectinload(VariationGroup.options) # For materialization
-            )
+            .options(selectinload(QuoteProductEntry.selected_variations)) # Products are loaded by the materializer
             .offset(offset)
             .limit(limit)
             .order_by(QuoteProductEntry.id) # Added default sorting
@@ -398,8 +711,7 @@ class QuoteProcessService:
             logger.info(f"No product entries found for Quote ID: {quote_id} with specified criteria.")
             return []
         
-        materialized_entries = [self._materialize_product_entry(entry) for entry in entries]
-        return materialized_entries
+        return self._materialize_product_entries(entries)
     
     def delete_quote_product_entry(self, quote_id: int, product_entry_id: int) -> None:
         """Removes a product entry from a quote, ensuring it belongs to the quote."""
@@ -424,7 +736,8 @@ class QuoteProcessService:
 
         try:
             self.session.delete(entry)
-            self.session.commit()
+            self._touch_quote(quote)
+            self._commit()
             logger.info(f"Successfully deleted QuoteProductEntry ID: {product_entry_id}")
         except Exception as e:
             logger.error(f"Error deleting entry {product_entry_id}: {e}", exc_info=True)
@@ -435,11 +748,9 @@ class QuoteProcessService:
         """Gets a single materialized product entry by its ID."""
         logger.info(f"Fetching materialized product entry for ID: {product_entry_id}")
         
-        # Eagerly load selected variations to prevent N+1 queries in the materialization step
-        # Also load the product itself for materialization
+        # The product tree comes from the configurator cache, so only the selections are loaded
         statement = select(QuoteProductEntry).where(QuoteProductEntry.id == product_entry_id).options(
             selectinload(QuoteProductEntry.selected_variations),
-            selectinload(QuoteProductEntry.product).selectinload(Product.variation_groups).selectinload(VariationGroup.options) # For materialization
         )
         entry = self.session.exec(statement).first()
         
@@ -517,7 +828,8 @@ class QuoteProcessService:
                 logger.error(f"Unknown selection type: {group.selection_type} for group {group.id}")
                 raise ValueError(f"Unsupported variation group selection type: {group.selection_type}")
 
-            self.session.commit()
+            self._touch_quote(quote)
+            self._commit()
             self.session.refresh(entry) # Refresh entry to load the new/changed selection state
             logger.info(f"Successfully updated variation for entry {product_entry_id}")
             return self._materialize_product_entry(entry)
@@ -527,12 +839,125 @@ class QuoteProcessService:
             self.session.rollback()
             raise
 
+    def set_quote_product_variations(self, selections: Dict[int, List[int]]) -> List[MaterializedProductEntry]:
+        """
+        Replaces the selected options of one or more entries with the given sets.
+
+        `selections` maps entry ids to the complete set of option ids that should be
+        selected afterwards. The sets are validated against the options' groups (each
+        option must belong to the entry's product, and a SINGLE_SELECT group allows one
+        option), diffed against the stored selections, and written in one transaction.
+        Entries are loaded and materialized in bulk, so the cost does not grow with the
+        number of options changed.
+        """
+        logger.info(f"Setting variation selections for entries {list(selections)}")
+        if not selections:
+            return []
+
+        entries = self.session.exec(
+            select(QuoteProductEntry)
+            .where(QuoteProductEntry.id.in_(list(selections)))
+            .options(selectinload(QuoteProductEntry.selected_variations))
+        ).all()
+        entries_by_id = {entry.id: entry for entry in entries}
+        missing_entry_ids = sorted(set(selections) - set(entries_by_id))
+        if missing_entry_ids:
+            raise ValueError(f"QuoteProductEntry ids not found: {missing_entry_ids}")
+
+        quotes = self.session.exec(
+            select(Quote).where(Quote.id.in_({entry.quote_id for entry in entries}))
+        ).all()
+        for quote in quotes:
+            self._check_quote_editable(quote)
+
+        option_ids = {option_id for option_ids in selections.values() for option_id in option_ids}
+        options_by_id: Dict[int, VariationOption] = {}
+        if option_ids:
+            options_by_id = {
+                option.id: option
+                for option in self.session.exec(
+                    select(VariationOption)
+                    .where(VariationOption.id.in_(option_ids))
+                    .options(selectinload(VariationOption.variation_group))
+                ).all()
+            }
+        missing_option_ids = sorted(option_ids - set(options_by_id))
+        if missing_option_ids:
+            raise ValueError(f"VariationOption ids not found: {missing_option_ids}")
+
+        # Validate every entry before writing anything
+        for entry_id, desired_option_ids in selections.items():
+            entry = entries_by_id[entry_id]
+            chosen_per_group: Dict[int, int] = {}
+            for option_id in set(desired_option_ids):
+                group = options_by_id[option_id].variation_group
+                if group.product_id != entry.product_id:
+                    raise ValueError(f"VariationOption {option_id} does not belong to the product of entry {entry_id}.")
+                if group.selection_type == VariationSelectionType.SINGLE_SELECT and group.id in chosen_per_group:
+                    raise ValueError(
+                        f"Variation group '{group.name}' allows a single option, "
+                        f"but options {chosen_per_group[group.id]} and {option_id} were selected for entry {entry_id}."
+                    )
+                chosen_per_group[group.id] = option_id
+
+        try:
+            changed_quote_ids = set()
+            for entry_id, desired_option_ids in selections.items():
+                entry = entries_by_id[entry_id]
+                desired = set(desired_option_ids)
+                current = {sel.variation_option_id: sel for sel in entry.selected_variations}
+                removed = [sel for option_id, sel in current.items() if option_id not in desired]
+                added = sorted(desired - set(current))
+                for sel in removed:
+                    entry.selected_variations.remove(sel) # delete-orphan cascade deletes the row
+                for option_id in added:
+                    entry.selected_variations.append(QuoteProductEntryVariation(variation_option_id=option_id))
+                if removed or added:
+                    changed_quote_ids.add(entry.quote_id)
+            for quote in quotes:
+                if quote.id in changed_quote_ids:
+                    self._touch_quote(quote)
+            self._commit()
+        except Exception as e:
+            logger.error(f"Error setting variation selections for entries {list(selections)}: {e}", exc_info=True)
+            self.session.rollback()
+            raise
+
+        # Reload the committed selections in one query and materialize all entries together
+        entries = self.session.exec(
+            select(QuoteProductEntry)
+            .where(QuoteProductEntry.id.in_(list(selections)))
+            .options(selectinload(QuoteProductEntry.selected_variations))
+            .order_by(QuoteProductEntry.id)
+        ).all()
+        logger.info(f"Successfully updated variation selections for {len(entries)} entries")
+        return self._materialize_product_entries(entries)
+
     # === Calculation & Finalization ===
 
-    def calculate_quote(self, quote_id: int) -> CalculatedQuote:
-        """Triggers the full quote calculation by delegating to QuoteCalculator."""
+    def calculate_quote(self, quote_id: int, force: bool = False) -> CalculatedQuote:
+        """
+        Triggers the full quote calculation by delegating to QuoteCalculator.
+        Unchanged inputs return the stored result unless `force` is set.
+        """
         logger.info(f"Delegating calculation for Quote ID: {quote_id} to QuoteCalculator.")
-        return self.calculator.calculate_and_save_quote(quote_id, self.session)
+        try:
+            return self.calculator.calculate_and_save_quote(quote_id, self.session, force=force)
+        except StaleDataError as e:
+            raise HTTPException(status_code=409, detail=QUOTE_CONFLICT_DETAIL) from e
+
+    def calculate_quotes(self, quote_ids: List[int], force: bool = False) -> BatchCalculationSummary:
+        """Recalculates many quotes with bulk loads and a single bulk write of their results."""
+        logger.info(f"Delegating batch calculation of {len(quote_ids)} quotes to BatchQuoteCalculator.")
+        result = BatchQuoteCalculator(self.calculator).calculate_quotes(quote_ids, self.session, force=force)
+        return BatchCalculationSummary(
+            calculated_quote_ids=list(result.calculated), unchanged_quote_ids=result.unchanged, failed=result.failed,
+        )
+
+    def preview_quote(self, quote_id: int) -> CalculatedQuoteBase:
+        """Calculates a quote's totals without saving them or changing its status."""
+        logger.info(f"Delegating preview calculation for Quote ID: {quote_id} to QuoteCalculator.")
+        return self.calculator.calculate_quote_preview(quote_id, self.session)
 
     def get_calculated_quote(self, quote_id: int) -> Optional[CalculatedQuote]:
         """Retrieves the results of a previous calculation for a quote."""
@@ -562,16 +987,112 @@ class QuoteProcessService:
         if updated:
             try:
                 self.session.add(entry)
-                self.session.commit()
+                self._touch_quote(quote)
+                self._commit()
                 self.session.refresh(entry)
                 logger.info(f"Successfully updated QuoteProductEntry ID: {product_entry_id}")
+            except HTTPException:
+                self.session.rollback()
+                raise
             except Exception as e:
                 logger.error(f"Error updating entry {product_entry_id}: {e}", exc_info=True)
                 self.session.rollback()
                 raise HTTPException(status_code=500, detail="Failed to update product entry.")
         return self._materialize_product_entry(entry)
 
+    # === Operation Batches ===
+
+    def apply_quote_operations(
+        self,
+        quote_id: int,
+        operations: List[QuoteOperation],
+        calculate: bool = False,
+        force: bool = False,
+    ) -> FullQuote:
+        """
+        Applies an ordered list of operations to a quote in one transaction and returns
+        the resulting FullQuote, optionally after calculating it.
+
+        Each operation runs through the same method as its single-call endpoint, but the
+        session is only flushed in between, so the whole batch costs a single commit.
+        If any operation fails, none of them is applied. Errors from an operation are
+        prefixed with its index in the list.
+        """
+        logger.info(f"Applying {len(operations)} operations to Quote ID: {quote_id} (calculate={calculate})")
+        quote = self.session.get(Quote, quote_id)
+        if not quote:
+            raise HTTPException(status_code=404, detail=f"Quote {quote_id} not found")
+        self._check_quote_editable(quote)
+
+        added_entry_ids: Dict[int, int] = {}
+        self._in_batch = True
+        try:
+            for index, operation in enumerate(operations):
+                try:
+                    entry_id = self._apply_quote_operation(quote_id, operation, added_entry_ids)
+                except HTTPException as e:
+                    raise HTTPException(status_code=e.status_code, detail=f"Operation {index} ({operation.op}): {e.detail}")
+                except ValueError as e:
+                    raise ValueError(f"Operation {index} ({operation.op}): {e}") from e
+                if entry_id is not None:
+                    added_entry_ids[index] = entry_id
+            if calculate:
+                self.calculator.calculate_and_save_quote(quote_id, self.session, force=force, commit=False)
+            self.session.commit()
+        except StaleDataError as e:
+            logger.info(f"Concurrent change while applying operations to quote {quote_id}")
+            self.session.rollback()
+            raise HTTPException(status_code=409, detail=QUOTE_CONFLICT_DETAIL) from e
+        except Exception as e:
+            logger.error(f"Error applying operations to quote {quote_id}: {e}", exc_info=True)
+            self.session.rollback()
+            raise
+        finally:
+            self._in_batch = False
+
+        logger.info(f"Successfully applied {len(operations)} operations to Quote ID: {quote_id}")
+        return self.get_full_quote(quote_id)
+
+    def _resolve_operation_entry(self, quote_id: int, operation: EntryOperation, added_entry_ids: Dict[int, int]) -> int:
+        if operation.entry_ref is not None:
+            if operation.entry_ref not in added_entry_ids:
+                raise ValueError(f"entry_ref {operation.entry_ref} does not refer to an earlier add_entry operation.")
+            return added_entry_ids[operation.entry_ref]
+        entry = self.session.get(QuoteProductEntry, operation.product_entry_id)
+        if not entry or entry.quote_id != quote_id:
+            raise ValueError(f"QuoteProductEntry {operation.product_entry_id} does not belong to quote {quote_id}.")
+        return entry.id
+
+    def _apply_quote_operation(self, quote_id: int, operation: QuoteOperation, added_entry_ids: Dict[int, int]) -> Optional[int]:
+        """Runs one batch operation; returns the id of the entry it added, if any."""
+        if isinstance(operation, AddEntryOperation):
+            return self.add_quote_product_entry(quote_id, operation.product_id, operation.quantity, operation.role).id
+        if isinstance(operation, SetUiStateOperation):
+            self.update_quote_ui_state(quote_id, operation.ui_state)
+            return None
+        if isinstance(operation, SetStatusOperation):
+            self.set_quote_status(quote_id, operation.status)
+            return None
+
+        entry_id = self._resolve_operation_entry(quote_id, operation, added_entry_ids)
+        if isinstance(operation, UpdateEntryOperation):
+            self.update_quote_product_entry(entry_id, quantity=operation.quantity, notes=operation.notes)
+        elif isinstance(operation, DeleteEntryOperation):
+            self.delete_quote_product_entry(quote_id, entry_id)
+        elif isinstance(operation, ToggleVariationOperation):
+            self.set_quote_product_variation_option(entry_id, operation.variation_option_id)
+        elif isinstance(operation, SetVariationsOperation):
+            self.set_quote_product_variations({entry_id: operation.variation_option_ids})
+        return None
+
     # === Quote with Materialized Products ===
+
+    def get_quote_updated_at(self, quote_id: int) -> datetime:
+        """Reads only a quote's updated_at, e.g. to validate a cached copy before materializing it."""
+        updated_at = self.session.exec(select(Quote.updated_at).where(Quote.id == quote_id)).first()
+        if updated_at is None:
+            raise HTTPException(status_code=404, detail=f"Quote {quote_id} not found")
+        return updated_at
     
     def get_full_quote(self, quote_id: int) -> FullQuote:
         """
@@ -585,15 +1106,14 @@ class QuoteProcessService:
             logger.warning(f"Quote ID {quote_id} not found for full quote retrieval.")
             raise HTTPException(status_code=404, detail=f"Quote {quote_id} not found")
 
-        # Materialize all product entries for this quote
-        materialized_entries: List[MaterializedProductEntry] = []
-        for entry in quote.product_entries:
-            try:
-                materialized_entry = self._materialize_product_entry(entry)
-                materialized_entries.append(materialized_entry)
-            except Exception as e:
-                logger.error(f"Error materializing entry {entry.id}: {e}", exc_info=True)
-                # Continue with other entries if one fails
+        # Materialize all product entries for this quote, skipping any that cannot be
+        entries = self.session.exec(
+            select(QuoteProductEntry)
+            .where(QuoteProductEntry.quote_id == quote_id)
+            .options(selectinload(QuoteProductEntry.selected_variations))
+            .order_by(QuoteProductEntry.id)
+        ).all()
+        materialized_entries = self._materialize_product_entries(entries, skip_invalid=True)
 
         # Create and return the full quote with materialized entries
         return FullQuote(
@@ -603,6 +1123,7 @@ class QuoteProcessService:
             status=quote.status,
             quote_type=quote.quote_type,
             updated_at=quote.updated_at,
+            version=quote.version,
             product_entries=materialized_entries,
         )
 
@@ -0,0 +1,47 @@
+from typing import Any, Awaitable, Callable, TypeVar
+
+import anyio
+from sqlalchemy.util import await_only
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.services.quote_process import QuoteProcessService
+
+T = TypeVar("T")
+
+
+def offload_to_thread(work: Callable[[], T]) -> T:
+    """
+    `Offload` for code running inside `AsyncSession.run_sync`: suspends the calling
+    greenlet while `work` runs in anyio's worker threads, so the event loop keeps
+    serving other requests. `work` must not use the session.
+    """
+    return await_only(anyio.to_thread.run_sync(work))
+
+
+class AsyncQuoteProcessService:
+    """
+    Async facade over QuoteProcessService for routes running on the event loop.
+
+    Every public method of QuoteProcessService is available here as a coroutine with
+    the same arguments. It runs the sync implementation through `AsyncSession.run_sync`
+    on the session's own asyncpg connection, so the route awaits database I/O instead
+    of occupying a threadpool thread. The CPU-bound steps (calculating totals, building
+    entry DTOs) work on rows already loaded and are handed to a worker thread, so a
+    large quote does not stall the event loop. The wrapped service is created once per
+    session, so state such as checked quote versions carries over between calls.
+    """
+    def __init__(self, session: AsyncSession, **service_kwargs: Any):
+        self.session = session
+        service_kwargs.setdefault("offload", offload_to_thread)
+        self.service = QuoteProcessService(session=session.sync_session, **service_kwargs)
+
+    def __getattr__(self, name: str) -> Callable[..., Awaitable[Any]]:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        method = getattr(self.service, name)
+
+        async def call(*args: Any, **kwargs: Any) -> Any:
+            return await self.session.run_sync(lambda _session: method(*args, **kwargs))
+
+        call.__name__ = name
+        return call
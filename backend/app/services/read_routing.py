@@ -0,0 +1,87 @@
+import threading
+import time
+from typing import Dict, Optional, Set
+
+from sqlalchemy import event
+from sqlmodel import Session
+
+from app.models import CalculatedQuote, Quote, QuoteProductEntry, QuoteProductEntryVariation
+
+# Long enough for a healthy streaming replica to replay the write
+DEFAULT_STICKY_SECONDS = 5.0
+
+_WRITTEN_KEY = "read_your_writes"
+
+
+class ReadYourWritesTracker:
+    """
+    Remembers which quotes and product entries were written recently, so reads of them
+    go to the primary until the replica has had `sticky_seconds` to catch up.
+
+    `watch` hooks a primary session: every quote, entry, selected option or stored
+    calculation it flushes is recorded once the transaction commits. Like the caches,
+    the tracker is per process; a read served by another process can still hit the
+    replica within the window.
+    """
+    def __init__(self, sticky_seconds: float = DEFAULT_STICKY_SECONDS):
+        self.sticky_seconds = sticky_seconds
+        self._quotes: Dict[int, float] = {}
+        self._entries: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def mark_written(self, quote_ids: Set[int] = frozenset(), product_entry_ids: Set[int] = frozenset()) -> None:
+        now = time.monotonic()
+        until = now + self.sticky_seconds
+        with self._lock:
+            for written, ids in ((self._quotes, quote_ids), (self._entries, product_entry_ids)):
+                for expired in [key for key, expires_at in written.items() if expires_at <= now]:
+                    del written[expired]
+                for key in ids:
+                    written[key] = until
+
+    def recently_written(self, quote_id: Optional[int] = None, product_entry_id: Optional[int] = None) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            return (
+                quote_id is not None and self._quotes.get(quote_id, 0.0) > now
+                or product_entry_id is not None and self._entries.get(product_entry_id, 0.0) > now
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._quotes.clear()
+            self._entries.clear()
+
+    def watch(self, session: Session) -> Session:
+        """Records the quotes and entries written through `session` when it commits."""
+        event.listen(session, "after_flush", self._collect)
+        event.listen(session, "after_commit", self._publish)
+        event.listen(session, "after_rollback", self._drop)
+        return session
+
+    @staticmethod
+    def _collect(session: Session, flush_context) -> None:
+        quote_ids, entry_ids = session.info.setdefault(_WRITTEN_KEY, (set(), set()))
+        for instance in (*session.new, *session.dirty, *session.deleted):
+            if isinstance(instance, Quote):
+                quote_ids.add(instance.id)
+            elif isinstance(instance, (QuoteProductEntry, CalculatedQuote)):
+                quote_ids.add(instance.quote_id)
+                if isinstance(instance, QuoteProductEntry):
+                    entry_ids.add(instance.id)
+            elif isinstance(instance, QuoteProductEntryVariation):
+                entry_ids.add(instance.quote_product_entry_id)
+
+    def _publish(self, session: Session) -> None:
+        written = session.info.pop(_WRITTEN_KEY, None)
+        if written:
+            quote_ids, entry_ids = written
+            self.mark_written(quote_ids - {None}, entry_ids - {None})
+
+    @staticmethod
+    def _drop(session: Session) -> None:
+        session.info.pop(_WRITTEN_KEY, None)
+
+
+# Process-wide tracker shared by the primary and read session dependencies
+read_your_writes = ReadYourWritesTracker()
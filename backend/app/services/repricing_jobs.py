@@ -0,0 +1,236 @@
+import logging
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, List, Optional, Set
+
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql.elements import ColumnElement
+from sqlmodel import Session, select
+
+from app.models import RepricingJob, RepricingJobStatus
+from app.services.batch_calculator import BatchQuoteCalculator
+from app.services.quote_calculator import QuoteCalculator
+
+logger = logging.getLogger("app.services.repricing_jobs")
+
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_PENDING_JOBS = 20
+DEFAULT_CHUNK_SIZE = 50
+# A RUNNING job whose heartbeat is older than this is taken to belong to a dead process
+DEFAULT_LEASE_SECONDS = 300.0
+
+
+class RepricingQueueFull(RuntimeError):
+    """Raised when a job is enqueued while the runner already has its maximum of pending jobs."""
+
+
+class RepricingJobRunner:
+    """
+    Runs repricing jobs on a bounded thread pool, with the repricing_job table as the queue.
+
+    Each job recalculates its quotes in chunks through BatchQuoteCalculator on its own
+    session and commits its progress after every chunk. Several processes can share the
+    table: a runner claims a job with one conditional UPDATE that sets it RUNNING under
+    its `owner` id, so each job runs in one process at a time. The owner renews
+    `heartbeat_at` with every chunk and only writes progress while it still owns the job.
+    Queued jobs, and running jobs whose heartbeat is older than `lease_seconds` because
+    their process died, are picked up by `start` and by a periodic sweep, continuing
+    after the last committed chunk.
+    """
+    def __init__(
+        self,
+        engine: Engine,
+        calculator_factory: Callable[[], QuoteCalculator] = QuoteCalculator,
+        max_workers: int = DEFAULT_WORKERS,
+        max_pending_jobs: int = DEFAULT_MAX_PENDING_JOBS,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    ):
+        self.engine = engine
+        self.calculator_factory = calculator_factory
+        self.max_workers = max_workers
+        self.max_pending_jobs = max_pending_jobs
+        self.chunk_size = chunk_size
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._sweeper: Optional[threading.Thread] = None
+        self._pending: Set[int] = set()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def start(self) -> None:
+        """Starts the worker pool, resumes claimable jobs and sweeps for abandoned ones every lease period."""
+        self._stopping.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="repricing")
+        self.resume_jobs()
+        self._sweeper = threading.Thread(target=self._sweep, name="repricing-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stops taking work. Jobs that have not started stay queued; running jobs finish their
+        current chunk, go back to QUEUED and continue on the next start.
+        """
+        self._stopping.set()
+        if self._sweeper is not None:
+            self._sweeper.join()
+            self._sweeper = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+    @property
+    def pending_job_ids(self) -> List[int]:
+        with self._lock:
+            return sorted(self._pending)
+
+    def _claimable(self) -> ColumnElement[bool]:
+        """Queued jobs, and running jobs whose owner stopped renewing its lease."""
+        expired_before = datetime.now(timezone.utc) - timedelta(seconds=self.lease_seconds)
+        return or_(
+            RepricingJob.status == RepricingJobStatus.QUEUED,
+            and_(
+                RepricingJob.status == RepricingJobStatus.RUNNING,
+                or_(RepricingJob.heartbeat_at.is_(None), RepricingJob.heartbeat_at < expired_before),
+            ),
+        )
+
+    def resume_jobs(self) -> List[int]:
+        """Schedules the claimable jobs this runner does not already hold and returns their ids."""
+        with Session(self.engine) as session:
+            job_ids = session.exec(select(RepricingJob.id).where(self._claimable()).order_by(RepricingJob.id)).all()
+        pending = set(self.pending_job_ids)
+        job_ids = [job_id for job_id in job_ids if job_id not in pending]
+        if job_ids:
+            logger.info(f"Resuming {len(job_ids)} repricing jobs: {job_ids}")
+        for job_id in job_ids:
+            self._submit(job_id)
+        return job_ids
+
+    def _sweep(self) -> None:
+        while not self._stopping.wait(self.lease_seconds):
+            try:
+                self.resume_jobs()
+            except Exception as e:
+                logger.error(f"Failed to look for abandoned repricing jobs: {str(e)}", exc_info=True)
+
+    def enqueue(self, quote_ids: List[int], force: bool = False) -> RepricingJob:
+        """Persists a job for `quote_ids` and schedules it, or raises RepricingQueueFull."""
+        quote_ids = list(dict.fromkeys(quote_ids))
+        if not quote_ids:
+            raise ValueError("A repricing job needs at least one quote id.")
+        with self._lock:
+            if len(self._pending) >= self.max_pending_jobs:
+                raise RepricingQueueFull(
+                    f"{len(self._pending)} repricing jobs are already pending; try again later."
+                )
+            with Session(self.engine) as session:
+                job = RepricingJob(quote_ids=quote_ids, force=force)
+                session.add(job)
+                session.commit()
+                session.refresh(job)
+            # Reserve the slot before releasing the lock so concurrent enqueues see it
+            self._pending.add(job.id)
+        logger.info(f"Enqueued repricing job {job.id} for {len(quote_ids)} quotes")
+        self._submit(job.id)
+        return job
+
+    def _submit(self, job_id: int) -> None:
+        with self._lock:
+            self._pending.add(job_id)
+        if self._executor is None:
+            # Not started (or shutting down): the persisted job runs on the next start
+            return
+        self._executor.submit(self._run_and_release, job_id)
+
+    def _run_and_release(self, job_id: int) -> None:
+        try:
+            self.run_job(job_id)
+        except Exception as e:
+            logger.error(f"Repricing job {job_id} crashed: {str(e)}", exc_info=True)
+        finally:
+            with self._lock:
+                self._pending.discard(job_id)
+
+    def _claim(self, job_id: int) -> bool:
+        """Atomically makes this runner the owner of a claimable job; False if it is done or owned elsewhere."""
+        now = datetime.now(timezone.utc)
+        with self.engine.begin() as connection:
+            result = connection.execute(
+                update(RepricingJob)
+                .where(RepricingJob.id == job_id, self._claimable())
+                .values(
+                    status=RepricingJobStatus.RUNNING,
+                    owner=self.owner,
+                    heartbeat_at=now,
+                    started_at=func.coalesce(RepricingJob.started_at, now),
+                )
+            )
+        return result.rowcount == 1
+
+    def _update_owned(self, session: Session, job_id: int, **values: Any) -> bool:
+        """Writes `values` to the job and renews its heartbeat, unless another runner has reclaimed it."""
+        result = session.execute(
+            update(RepricingJob)
+            .where(
+                RepricingJob.id == job_id,
+                RepricingJob.owner == self.owner,
+                RepricingJob.status == RepricingJobStatus.RUNNING,
+            )
+            .values(heartbeat_at=datetime.now(timezone.utc), **values)
+            .execution_options(synchronize_session=False)
+        )
+        session.commit()
+        return result.rowcount == 1
+
+    def run_job(self, job_id: int) -> None:
+        """Claims one job and processes it to completion, or until the runner starts shutting down."""
+        if not self._claim(job_id):
+            logger.info(f"Repricing job {job_id} is finished or owned by another runner; skipping it")
+            return
+
+        with Session(self.engine) as session:
+            job = session.get(RepricingJob, job_id)
+            quote_ids, force = list(job.quote_ids), job.force
+            processed, calculated, unchanged = job.processed_count, job.calculated_count, job.unchanged_count
+            failed_quotes = dict(job.failed_quotes)
+
+            batch = BatchQuoteCalculator(self.calculator_factory())
+            try:
+                while processed < len(quote_ids):
+                    if self._stopping.is_set():
+                        logger.info(f"Repricing job {job_id} paused at {processed}/{len(quote_ids)} for shutdown")
+                        self._update_owned(session, job_id, status=RepricingJobStatus.QUEUED, owner=None)
+                        return
+
+                    chunk = quote_ids[processed:processed + self.chunk_size]
+                    result = batch.calculate_quotes(chunk, session, force=force)
+
+                    processed += len(chunk)
+                    calculated += len(result.calculated)
+                    unchanged += len(result.unchanged)
+                    failed_quotes.update({str(k): v for k, v in result.failed.items()})
+                    owned = self._update_owned(
+                        session, job_id,
+                        processed_count=processed, calculated_count=calculated, unchanged_count=unchanged,
+                        failed_quotes=failed_quotes,
+                    )
+                    if not owned:
+                        logger.warning(f"Repricing job {job_id} was reclaimed by another runner; stopping")
+                        return
+                    logger.debug(f"Repricing job {job_id} progress: {processed}/{len(quote_ids)}")
+
+                status, error = RepricingJobStatus.COMPLETED, None
+            except Exception as e:
+                logger.error(f"Repricing job {job_id} failed: {str(e)}", exc_info=True)
+                session.rollback()
+                status, error = RepricingJobStatus.FAILED, str(e)
+
+            self._update_owned(session, job_id, status=status, error=error, finished_at=datetime.now(timezone.utc))
+            logger.info(f"Repricing job {job_id} finished with status {status}")
@@ -0,0 +1,152 @@
+import hashlib
+import logging
+from datetime import datetime, timezone
+from typing import Callable, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.engine import Connection, Dialect, Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+logger = logging.getLogger("app.services.schema_migrations")
+
+# pg_advisory_lock key held while one process migrates; any constant unique to this app
+SCHEMA_LOCK_KEY = 727_140_021
+
+schema_version_table = Table(
+    "schema_version",
+    MetaData(),
+    Column("id", Integer, primary_key=True), # Always 1: the table holds a single row
+    Column("version", Integer, nullable=False),
+    Column("checksum", String(64), nullable=False),
+    Column("applied_at", DateTime(timezone=True), nullable=False),
+)
+
+
+class Migration(NamedTuple):
+    """One schema change; `apply` must be idempotent, since databases from before versioning run every migration."""
+    version: int
+    description: str
+    apply: Callable[[Connection], None]
+
+
+def schema_fingerprint(
+    metadata: MetaData, migrations: Sequence[Migration], dialect: Dialect, extra: Sequence[str] = (),
+) -> str:
+    """
+    SHA-256 over the DDL the models compile to for `dialect`, the migration list and
+    `extra` (e.g. trigger SQL). Computed without touching the database.
+    """
+    digest = hashlib.sha256()
+    for table in metadata.sorted_tables:
+        digest.update(str(CreateTable(table).compile(dialect=dialect)).encode())
+        for index in sorted(table.indexes, key=lambda index: index.name or ""):
+            digest.update(str(CreateIndex(index).compile(dialect=dialect)).encode())
+    for migration in migrations:
+        digest.update(f"{migration.version}:{migration.description}".encode())
+    for part in extra:
+        digest.update(part.encode())
+    return digest.hexdigest()
+
+
+def _read_schema_version(connection: Connection) -> Optional[Tuple[int, str]]:
+    row = connection.execute(
+        select(schema_version_table.c.version, schema_version_table.c.checksum).where(schema_version_table.c.id == 1)
+    ).first()
+    return (row.version, row.checksum) if row else None
+
+
+def stored_schema_version(engine: Engine) -> Optional[Tuple[int, str]]:
+    """(version, checksum) recorded by the last migration, or None if the database was never migrated."""
+    try:
+        with engine.connect() as connection:
+            return _read_schema_version(connection)
+    except DBAPIError:
+        return None # No schema_version table yet
+
+
+def _is_newer(stored: Optional[Tuple[int, str]], target: Tuple[int, str]) -> bool:
+    if stored is None or stored[0] <= target[0]:
+        return False
+    logger.warning(
+        f"Database schema is at version {stored[0]}, newer than this build's version {target[0]}; "
+        f"leaving it unchanged"
+    )
+    return True
+
+
+def migrate_schema(
+    engine: Engine,
+    metadata: MetaData,
+    migrations: Sequence[Migration],
+    after_create: Sequence[Callable[[Connection], None]] = (),
+    fingerprint_extra: Sequence[str] = (),
+) -> bool:
+    """
+    Brings the database up to date with the models and returns whether anything ran.
+
+    When the stored version and checksum match, the only database work is one SELECT
+    of the schema_version row: no reflection, no DDL. Otherwise, under a PostgreSQL
+    advisory lock so concurrent workers migrate once, it applies the migrations newer
+    than the stored version, runs `create_all` and the `after_create` steps, and
+    records the new fingerprint, all in one transaction. A database with no tables
+    skips the migrations, since `create_all` builds the current schema directly.
+
+    A database already at a newer version than `migrations` (an older build started
+    during a rolling deploy) is left untouched rather than stamped back down.
+    """
+    versions = [migration.version for migration in migrations]
+    if versions != sorted(set(versions)):
+        raise ValueError(f"Migration versions must be unique and ascending, got {versions}")
+    target = (versions[-1] if versions else 0, schema_fingerprint(metadata, migrations, engine.dialect, fingerprint_extra))
+
+    stored = stored_schema_version(engine)
+    if stored == target:
+        logger.info(f"Database schema is at version {target[0]}; skipping migrations")
+        return False
+    if _is_newer(stored, target):
+        return False
+
+    with engine.connect() as connection:
+        locked = connection.dialect.name == "postgresql"
+        if locked:
+            connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": SCHEMA_LOCK_KEY})
+            connection.commit()
+        try:
+            with connection.begin():
+                inspector = inspect(connection)
+                has_version_table = inspector.has_table(schema_version_table.name)
+                stored = _read_schema_version(connection) if has_version_table else None
+                if stored == target:
+                    logger.info(f"Database schema was migrated to version {target[0]} by another process")
+                    return False
+                if _is_newer(stored, target):
+                    return False
+
+                if stored is not None:
+                    from_version = stored[0]
+                elif set(inspector.get_table_names()) - {schema_version_table.name}:
+                    from_version = 0 # Tables from before versioning
+                else:
+                    from_version = target[0]
+
+                for migration in migrations:
+                    if migration.version > from_version:
+                        logger.info(f"Applying schema migration {migration.version}: {migration.description}")
+                        migration.apply(connection)
+                metadata.create_all(connection)
+                for step in after_create:
+                    step(connection)
+
+                schema_version_table.create(connection, checkfirst=True)
+                values = {"version": target[0], "checksum": target[1], "applied_at": datetime.now(timezone.utc)}
+                if stored is None:
+                    connection.execute(schema_version_table.insert().values(id=1, **values))
+                else:
+                    connection.execute(schema_version_table.update().where(schema_version_table.c.id == 1).values(**values))
+            logger.info(f"Database schema migrated to version {target[0]}")
+            return True
+        finally:
+            if locked:
+                connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": SCHEMA_LOCK_KEY})
+                connection.commit()
@@ -0,0 +1,142 @@
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import bindparam, or_, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.models import Quote, next_ui_state_sequence
+
+logger = logging.getLogger("app.services.ui_state_buffer")
+
+DEFAULT_FLUSH_SECONDS = 2.0
+DEFAULT_MAX_PENDING = 1000
+
+
+class UiStateBuffer:
+    """
+    Write-behind buffer for Quote.ui_state.
+
+    `set` only records the latest value per quote; a background thread writes all
+    pending values every `flush_seconds` (or as soon as `max_pending` quotes are
+    waiting) with one executemany UPDATE, and `stop` writes whatever is left. The
+    UPDATE keeps `updated_at` as it is: ui_state is not part of a quote's content or
+    its ETag.
+
+    Every value carries the `next_ui_state_sequence()` of its `set`, and the UPDATE
+    only replaces a stored ui_state with a lower `ui_state_sequence`. Direct ORM writes
+    take a new sequence too, so the newest write wins whichever order the flushes and
+    direct writes commit in, across processes as well. Values that lost are logged.
+
+    Values are buffered per process, so `get` only sees writes made through this
+    process; until a flush, other processes read the previous value.
+    """
+    def __init__(self, engine: Engine, flush_seconds: float = DEFAULT_FLUSH_SECONDS, max_pending: int = DEFAULT_MAX_PENDING):
+        self.engine = engine
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        # quote id -> (buffered ui_state, its sequence)
+        self._pending: Dict[int, Tuple[str, int]] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="ui-state-buffer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops the flush thread and writes the remaining values."""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def set(self, quote_id: int, ui_state: str) -> None:
+        with self._lock:
+            self._pending[quote_id] = (ui_state, next_ui_state_sequence())
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wakeup.set()
+
+    def get(self, quote_id: int) -> Optional[str]:
+        """The buffered ui_state of a quote, or None if nothing is waiting to be written."""
+        with self._lock:
+            pending = self._pending.get(quote_id)
+        return pending[0] if pending is not None else None
+
+    def overlay(self, quote: Quote) -> Quote:
+        """Shows a buffered ui_state on a loaded quote without marking it dirty in its session."""
+        buffered = self.get(quote.id)
+        if buffered is not None:
+            set_committed_value(quote, "ui_state", buffered)
+        return quote
+
+    def discard(self, quote_id: int) -> None:
+        """Drops a buffered value, e.g. because the quote's ui_state was just written directly."""
+        with self._lock:
+            self._pending.pop(quote_id, None)
+
+    @property
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self) -> int:
+        """
+        Writes all buffered values in one statement and returns how many quotes were
+        written; values superseded by a newer write, or of deleted quotes, are dropped.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        table = Quote.__table__
+        statement = (
+            update(table)
+            .where(table.c.id == bindparam("quote_id"))
+            .where(or_(table.c.ui_state_sequence.is_(None), table.c.ui_state_sequence < bindparam("sequence")))
+            .values(
+                ui_state=bindparam("new_ui_state"),
+                ui_state_sequence=bindparam("sequence"),
+                updated_at=table.c.updated_at, # Suppress the onupdate timestamp
+            )
+        )
+        try:
+            with self.engine.begin() as connection:
+                connection.execute(
+                    statement,
+                    [
+                        {"quote_id": quote_id, "new_ui_state": ui_state, "sequence": sequence}
+                        for quote_id, (ui_state, sequence) in pending.items()
+                    ],
+                )
+                # executemany rowcounts are not reliable on every driver, so read back which values landed
+                stored_sequences = dict(connection.execute(
+                    select(table.c.id, table.c.ui_state_sequence).where(table.c.id.in_(list(pending)))
+                ).all())
+        except Exception as e:
+            logger.error(f"Failed to write {len(pending)} buffered ui states: {str(e)}", exc_info=True)
+            with self._lock:
+                # Put the values back unless a newer one arrived in the meantime
+                for quote_id, values in pending.items():
+                    self._pending.setdefault(quote_id, values)
+            return 0
+        lost = sorted(quote_id for quote_id, (_, sequence) in pending.items() if stored_sequences.get(quote_id) != sequence)
+        if lost:
+            logger.info(f"Dropped {len(lost)} buffered ui states superseded by newer writes or deleted quotes: {lost}")
+        written = len(pending) - len(lost)
+        logger.debug(f"Wrote {written} buffered ui states")
+        return written
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_seconds)
+            self._wakeup.clear()
+            self.flush()
@@ -0,0 +1,115 @@
+"""
+Compares the sync and async quote-process paths under concurrency.
+
+Runs `--requests` full-quote reads (optionally calculations) of one quote with
+`--concurrency` requests in flight, once through a sync Session in the threadpool
+(how FastAPI runs sync endpoints) and once through AsyncQuoteProcessService on the
+asyncpg engine, and prints throughput, latency percentiles and pool waits.
+
+    python -m benchmarks.quote_process_concurrency --quote-id 1 --concurrency 32 --requests 500
+
+Needs the same environment variables as the application and a seeded database.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Awaitable, Callable, Dict, List
+
+import anyio.to_thread
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.database import async_engine, engine
+from app.services.db_pool import async_pool_wait_stats, pool_wait_stats
+from app.services.quote_process import QuoteProcessService
+from app.services.quote_process_async import AsyncQuoteProcessService
+
+
+def _sync_call(quote_id: int, calculate: bool) -> None:
+    with Session(engine) as session:
+        service = QuoteProcessService(session=session)
+        if calculate:
+            service.calculate_quote(quote_id, force=True)
+        else:
+            service.get_full_quote(quote_id)
+
+
+async def run_sync_request(quote_id: int, calculate: bool) -> None:
+    await anyio.to_thread.run_sync(_sync_call, quote_id, calculate)
+
+
+async def run_async_request(quote_id: int, calculate: bool) -> None:
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        service = AsyncQuoteProcessService(session)
+        if calculate:
+            await service.calculate_quote(quote_id, force=True)
+        else:
+            await service.get_full_quote(quote_id)
+
+
+async def measure(
+    request: Callable[[int, bool], Awaitable[None]],
+    quote_id: int,
+    calculate: bool,
+    concurrency: int,
+    requests: int,
+) -> Dict[str, float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def one() -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await request(quote_id, calculate)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    def percentile(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+
+    return {
+        "requests/s": requests / elapsed,
+        "mean ms": statistics.fmean(latencies) * 1000,
+        "p50 ms": percentile(0.50),
+        "p95 ms": percentile(0.95),
+        "p99 ms": percentile(0.99),
+    }
+
+
+async def main(quote_id: int, calculate: bool, concurrency: int, requests: int) -> None:
+    # One untimed round each, so both pools are warm
+    await measure(run_sync_request, quote_id, calculate, concurrency, concurrency)
+    await measure(run_async_request, quote_id, calculate, concurrency, concurrency)
+    pool_wait_stats.reset()
+    async_pool_wait_stats.reset()
+
+    results = {
+        "sync": await measure(run_sync_request, quote_id, calculate, concurrency, requests),
+        "async": await measure(run_async_request, quote_id, calculate, concurrency, requests),
+    }
+    waits = {"sync": pool_wait_stats.snapshot(), "async": async_pool_wait_stats.snapshot()}
+
+    operation = "calculate" if calculate else "get_full_quote"
+    print(f"{operation} of quote {quote_id}: {requests} requests, concurrency {concurrency}")
+    columns = list(results["sync"])
+    print(f"{'path':<6}" + "".join(f"{column:>12}" for column in columns) + f"{'pool waits':>12}")
+    for path, result in results.items():
+        print(f"{path:<6}" + "".join(f"{result[column]:>12.1f}" for column in columns) + f"{waits[path]['waited']:>12}")
+
+    engine.dispose()
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--quote-id", type=int, required=True)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--calculate", action="store_true", help="Benchmark forced calculations instead of reads")
+    args = parser.parse_args()
+    asyncio.run(main(args.quote_id, args.calculate, args.concurrency, args.requests))
@@ -1,13 +1,22 @@
 from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import logging
+from sqlalchemy.orm.exc import StaleDataError
 from sqlmodel import Session
 
-from app.database import create_db_and_tables, engine 
+from app.database import async_engine, async_replica_engine, create_db_and_tables, engine 
 # Import your API routers here when they are created, e.g.:
 from app.api_setup import router as api_router
 from app.config import settings
+from app.services.catalog_listener import CatalogChangeHandler, CatalogChangeListener
+from app.services.pricing_plan import pricing_plan_cache
+from app.services.product_configurator import product_configurator_cache
+from app.services.quote_aggregate import quote_aggregate_cache
+from app.services.quote_calculator import QuoteCalculator
+from app.services.repricing_jobs import RepricingJobRunner
+from app.services.ui_state_buffer import UiStateBuffer
 from seeders.seeder import run_all_seeders, should_seed
 
 
@@ -28,24 +37,59 @@ origins = [
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Code to run on startup
-    print("Creating database and tables...")
-    create_db_and_tables()
-    print("Database and tables created.")
+    if create_db_and_tables():
+        logger.info("Database schema migrated.")
+    else:
+        logger.info("Database schema is up to date.")
 
     if should_seed():
-        print("Seeding database...")
+        logger.info("Seeding database...")
         with Session(engine) as session:
             run_all_seeders(session)
             # No explicit commit here, as individual seeders commit after each type
             # or _get_or_create handles commit/rollback.
             # A final commit in seed.py's main is for script-based execution.
-        print("Database seeding completed.")
+        logger.info("Database seeding completed.")
     else:
-        print("Skipping database seeding based on environment variables.")
+        logger.info("Skipping database seeding based on environment variables.")
+
+    repricing_runner = RepricingJobRunner(
+        engine,
+        calculator_factory=lambda: QuoteCalculator(plan_cache=pricing_plan_cache, aggregate_cache=quote_aggregate_cache),
+        max_workers=settings.REPRICING_WORKERS,
+        max_pending_jobs=settings.REPRICING_MAX_PENDING_JOBS,
+        chunk_size=settings.REPRICING_CHUNK_SIZE,
+        lease_seconds=settings.REPRICING_LEASE_SECONDS,
+    )
+    repricing_runner.start()
+    app.state.repricing_runner = repricing_runner
+
+    app.state.catalog_handler = CatalogChangeHandler(engine, pricing_plan_cache, product_configurator_cache)
+    catalog_listener = None
+    if settings.CATALOG_LISTENER_ENABLED and engine.dialect.name == "postgresql":
+        catalog_listener = CatalogChangeListener(engine, app.state.catalog_handler)
+        catalog_listener.start()
+
+    ui_state_buffer = None
+    if settings.UI_STATE_FLUSH_SECONDS > 0:
+        ui_state_buffer = UiStateBuffer(engine, flush_seconds=settings.UI_STATE_FLUSH_SECONDS)
+        ui_state_buffer.start()
+    app.state.ui_state_buffer = ui_state_buffer
     
     yield
     # Code to run on shutdown (if any)
-    print("Application shutting down...")
+    logger.info("Application shutting down...")
+    if catalog_listener is not None:
+        catalog_listener.stop()
+    if ui_state_buffer is not None:
+        logger.info("Writing buffered ui states...")
+        ui_state_buffer.stop()
+    logger.info("Draining repricing jobs...")
+    repricing_runner.shutdown(wait=True)
+    logger.info("Repricing jobs drained.")
+    await async_engine.dispose()
+    if async_replica_engine is not async_engine:
+        await async_replica_engine.dispose()
 
 app = FastAPI(
     title="Construction CPQ API",
@@ -67,6 +111,11 @@ async def catch_exceptions_middleware(request: Request, call_next):
 
 app.middleware('http')(catch_exceptions_middleware)
 
+@app.exception_handler(StaleDataError)
+async def stale_data_handler(request: Request, exc: StaleDataError):
+    # A versioned row (quote, calculated quote) was changed by a concurrent request
+    return JSONResponse(status_code=409, content={"detail": "The record was changed by another request; reload it and try again."})
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], # Allows all origins for CORS todo - restrict this in production
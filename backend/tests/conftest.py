@@ -1,12 +1,23 @@
+import os
 import pytest
 from decimal import Decimal
 from unittest.mock import MagicMock
-from sqlmodel import Session
-from typing import Dict, Callable
+from sqlalchemy import event
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+from typing import Dict, Callable, List
 
 from app.services.quote_calculator import final_quantize_decimal
 from app.models import CalculatedQuote, QuoteConfig
 
+# Settings requires the connection variables at import; tests that import the app run it on SQLite
+for name, value in {
+    "POSTGRES_USER": "test", "POSTGRES_PASSWORD": "test", "POSTGRES_HOST": "localhost", "POSTGRES_PORT": "5432",
+    "POSTGRES_DB": "test", "BACKEND_PORT": "8000",
+    "DATABASE_URL": "sqlite://", "ASYNC_DATABASE_URL": "sqlite+aiosqlite://", "CATALOG_LISTENER_ENABLED": "false",
+}.items():
+    os.environ.setdefault(name, value)
+
 
 def D(value: str) -> Decimal:
     return Decimal(value)
@@ -31,6 +42,79 @@ def mock_session() -> MagicMock:
 
     return session
 
+@pytest.fixture
+def sqlite_engine():
+    """In-memory SQLite engine with all tables, for tests that need real SQL round trips."""
+    from app import models # noqa
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def statement_log(sqlite_engine) -> List[str]:
+    """Collects every SQL statement sent to `sqlite_engine`."""
+    statements: List[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(sqlite_engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(sqlite_engine, "before_cursor_execute", record)
+
+@pytest.fixture
+def seed_quote() -> Callable[..., int]:
+    """Returns a helper that creates a quote whose entries each use a different product with its own option."""
+    from app.models import (
+        Material, UnitType, Quote, QuoteProductEntry, QuoteProductEntryVariation,
+        Product, ProductMaterial, VariationGroup, VariationOption, VariationOptionMaterial,
+    )
+
+    def seed(session: Session, entry_count: int, prefix: str = "") -> int:
+        unit_type = UnitType(name=f"{prefix}each", category="count")
+        config = QuoteConfig(name=f"{prefix}Loader Test Config")
+        session.add_all([unit_type, config])
+        session.flush()
+
+        quote = Quote(name=f"Quote with {entry_count} entries", quote_config_id=config.id)
+        session.add(quote)
+        session.flush()
+
+        for index in range(entry_count):
+            material = Material(
+                name=f"{prefix}Material {index}", cost_per_supplier_unit=Decimal("10.00"),
+                quantity_in_supplier_unit=Decimal("1"), unit_type_id=unit_type.id, cull_rate=0.05,
+            )
+            extra_material = Material(
+                name=f"{prefix}Extra Material {index}", cost_per_supplier_unit=Decimal("2.00"),
+                quantity_in_supplier_unit=Decimal("1"), unit_type_id=unit_type.id,
+            )
+            product = Product(name=f"{prefix}Product {index}", product_unit_type_id=unit_type.id, unit_labor_cost=Decimal("3.00"))
+            session.add_all([material, extra_material, product])
+            session.flush()
+
+            group = VariationGroup(name="Style", product_id=product.id)
+            session.add(group)
+            session.flush()
+            option = VariationOption(name="Fancy", variation_group_id=group.id)
+            session.add(option)
+            session.flush()
+
+            entry = QuoteProductEntry(quote_id=quote.id, product_id=product.id, quantity_of_product_units=Decimal("4"))
+            session.add_all([
+                ProductMaterial(product_id=product.id, material_id=material.id, material_amount=Decimal("1.5")),
+                VariationOptionMaterial(variation_option_id=option.id, material_id=extra_material.id, quantity_of_material_base_units_added=Decimal("2")),
+                entry,
+            ])
+            session.flush()
+            session.add(QuoteProductEntryVariation(quote_product_entry_id=entry.id, variation_option_id=option.id))
+
+        session.commit()
+        return quote.id
+
+    return seed
+
 @pytest.fixture
 def quote_calculator_service():
     from app.services.quote_calculator import QuoteCalculator
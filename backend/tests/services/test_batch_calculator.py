@@ -0,0 +1,89 @@
+import pytest
+from decimal import Decimal
+from sqlmodel import Session, select
+
+from app.models import CalculatedQuote, Quote, QuoteConfig, QuoteStatus
+from app.services.batch_calculator import BatchQuoteCalculator
+from app.services.quote_calculator import QuoteCalculator
+
+pytestmark = pytest.mark.filterwarnings("ignore::sqlalchemy.exc.SAWarning")
+
+RESULT_FIELDS = {
+    "bill_of_materials_json", "applied_rates_info_json", "total_material_cost", "total_labor_cost",
+    "cost_of_goods_sold", "subtotal_before_tax", "tax_amount", "final_price",
+}
+
+
+def test_batch_matches_scalar_calculator_and_upserts(sqlite_engine, statement_log, seed_quote):
+    with Session(sqlite_engine) as session:
+        quote_ids = [seed_quote(session, count, prefix=f"{count}-") for count in (1, 3, 5)]
+        config = session.get(QuoteConfig, session.get(Quote, quote_ids[0]).quote_config_id)
+        config.margin_rate = Decimal("0.25")
+        config.tax_rate = Decimal("0.07")
+        session.commit()
+
+    with Session(sqlite_engine) as session:
+        scalar = {
+            quote_id: QuoteCalculator().calculate_and_save_quote(quote_id, session).model_dump(include=RESULT_FIELDS)
+            for quote_id in quote_ids
+        }
+
+    with Session(sqlite_engine) as session:
+        statement_log.clear()
+        result = BatchQuoteCalculator().calculate_quotes(quote_ids + [9999], session, force=True)
+        writes = [s for s in statement_log if not s.lstrip().upper().startswith("SELECT")]
+
+    assert result.failed == {9999: "Quote with id 9999 not found"}
+    assert sum(1 for s in writes if s.lstrip().upper().startswith("INSERT")) == 1
+    with Session(sqlite_engine) as session:
+        rows = session.exec(select(CalculatedQuote)).all()
+        assert len(rows) == len(quote_ids)
+        for row in rows:
+            assert row.model_dump(include=RESULT_FIELDS) == scalar[row.quote_id]
+            assert result.calculated[row.quote_id].model_dump(include=RESULT_FIELDS) == scalar[row.quote_id]
+        assert {session.get(Quote, quote_id).status for quote_id in quote_ids} == {QuoteStatus.CALCULATED}
+
+
+def test_batch_skips_quotes_with_unchanged_inputs(sqlite_engine, seed_quote):
+    with Session(sqlite_engine) as session:
+        quote_ids = [seed_quote(session, count, prefix=f"{count}-") for count in (1, 2)]
+
+    with Session(sqlite_engine) as session:
+        first = BatchQuoteCalculator().calculate_quotes(quote_ids, session)
+    with Session(sqlite_engine) as session:
+        entry = session.get(Quote, quote_ids[1]).product_entries[0]
+        entry.quantity_of_product_units = Decimal("9")
+        session.commit()
+    with Session(sqlite_engine) as session:
+        second = BatchQuoteCalculator().calculate_quotes(quote_ids, session)
+
+    assert sorted(first.calculated) == quote_ids
+    assert second.unchanged == [quote_ids[0]]
+    assert list(second.calculated) == [quote_ids[1]]
+
+
+def test_batch_does_not_overwrite_concurrent_edits_or_final_quotes(sqlite_engine, seed_quote):
+    with Session(sqlite_engine) as session:
+        quote_ids = [seed_quote(session, 1, prefix=f"{n}-") for n in range(3)]
+        session.get(Quote, quote_ids[2]).status = QuoteStatus.FINAL
+        session.commit()
+
+    def edit_during_calculation(work):
+        with Session(sqlite_engine) as other:
+            other.get(Quote, quote_ids[1]).name = "Edited meanwhile"
+            other.commit()
+        return work()
+
+    calculator = QuoteCalculator()
+    calculator.offload = edit_during_calculation
+    with Session(sqlite_engine) as session:
+        result = BatchQuoteCalculator(calculator).calculate_quotes(quote_ids, session, force=True)
+        assert session.get(Quote, quote_ids[0]).version == 2
+
+    assert list(result.calculated) == [quote_ids[0]]
+    assert set(result.failed) == {quote_ids[1], quote_ids[2]}
+    with Session(sqlite_engine) as session:
+        edited, final = session.get(Quote, quote_ids[1]), session.get(Quote, quote_ids[2])
+        assert (edited.name, edited.version, edited.status) == ("Edited meanwhile", 2, QuoteStatus.DRAFT)
+        assert final.status == QuoteStatus.FINAL
+        assert session.exec(select(CalculatedQuote.quote_id)).all() == [quote_ids[0]]
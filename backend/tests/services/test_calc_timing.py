@@ -0,0 +1,46 @@
+import pytest
+from sqlmodel import Session
+
+from app.services.calc_timing import CalcTimingHistogram, calc_phase, calc_timing_histogram, record_calc_timing
+from app.services.quote_calculator import QuoteCalculator
+
+pytestmark = pytest.mark.filterwarnings("ignore::sqlalchemy.exc.SAWarning")
+
+
+def test_calculation_records_phases_and_queries(sqlite_engine, seed_quote):
+    with Session(sqlite_engine) as session:
+        quote_id = seed_quote(session, 2)
+
+    calc_timing_histogram.reset()
+    with Session(sqlite_engine) as session:
+        with record_calc_timing() as timing:
+            QuoteCalculator().calculate_and_save_quote(quote_id, session)
+
+    assert list(timing.durations) == ["load", "fingerprint", "aggregate", "round", "rates", "serialize", "commit", "refresh"]
+    assert timing.query_counts["load"] > 0
+    assert timing.query_counts["aggregate"] == timing.query_counts["rates"] == 0
+    assert timing.total_queries >= sum(timing.query_counts.values())
+    assert timing.header_value().startswith("load;dur=")
+    assert timing.header_value().split(", ")[-1].startswith("total;dur=")
+
+    snapshot = calc_timing_histogram.snapshot()
+    assert snapshot["total"]["count"] == 1
+    assert snapshot["commit"]["buckets_ms"]["+Inf"] == 1
+
+
+def test_disabled_timing_records_nothing():
+    calc_timing_histogram.reset()
+    with record_calc_timing(enabled=False) as timing:
+        with calc_phase("load"):
+            pass
+    assert timing is None
+    assert calc_timing_histogram.snapshot() == {}
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = CalcTimingHistogram(buckets_ms=(1, 10))
+    for milliseconds in (0.5, 5, 50):
+        histogram._observe_phase("load", milliseconds, 1)
+    assert histogram.snapshot()["load"] == {
+        "count": 3, "sum_ms": 55.5, "sql_queries": 3, "buckets_ms": {"1": 1, "10": 2, "+Inf": 3},
+    }
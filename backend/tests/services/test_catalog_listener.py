@@ -0,0 +1,90 @@
+import pytest
+from sqlmodel import Session, select
+
+from app.models import Material, Quote, VariationGroup
+from app.services.catalog_listener import NOTIFY_FUNCTION_SQL, CatalogChangeHandler
+from app.services.pricing_plan import PricingPlanCache
+from app.services.product_configurator import ProductConfiguratorCache
+from app.services.quote_calculator import QuoteCalculator
+from app.services.quote_process import QuoteProcessService
+
+pytestmark = pytest.mark.filterwarnings("ignore::sqlalchemy.exc.SAWarning")
+
+
+@pytest.fixture
+def warm_caches(sqlite_engine, seed_quote):
+    """Plan and configurator caches filled from a two-entry quote, plus the ids involved."""
+    plan_cache, configurator_cache = PricingPlanCache(), ProductConfiguratorCache()
+    with Session(sqlite_engine) as session:
+        quote_id = seed_quote(session, 2)
+        QuoteCalculator(plan_cache=plan_cache).calculate_quote_preview(quote_id, session)
+        QuoteProcessService(session=session, configurator_cache=configurator_cache).get_full_quote(quote_id)
+        entries = session.get(Quote, quote_id).product_entries
+        ids = {
+            "products": [entry.product_id for entry in entries],
+            "options": [entry.selected_variations[0].variation_option_id for entry in entries],
+            "material": session.exec(select(Material.id).where(Material.name == "Material 0")).one(),
+            "extra_material": session.exec(select(Material.id).where(Material.name == "Extra Material 1")).one(),
+            "group": session.exec(select(VariationGroup.id).where(VariationGroup.product_id == entries[1].product_id)).one(),
+        }
+    handler = CatalogChangeHandler(sqlite_engine, plan_cache, configurator_cache)
+    return handler, ids
+
+
+def cached(handler: CatalogChangeHandler, ids) -> dict:
+    return {
+        "product_plans": [handler.plan_cache.get_product_plan(i) is not None for i in ids["products"]],
+        "option_plans": [handler.plan_cache.get_option_plan(i) is not None for i in ids["options"]],
+        "configurators": [i in handler.configurator_cache._trees for i in ids["products"]],
+    }
+
+
+def test_material_change_drops_only_dependent_plans(warm_caches):
+    handler, ids = warm_caches
+    handler.apply({"table": "material", "op": "UPDATE", "new": {"id": ids["material"]}, "old": {"id": ids["material"]}})
+    handler.apply({"table": "material", "op": "UPDATE", "new": {"id": ids["extra_material"]}, "old": {"id": ids["extra_material"]}})
+
+    assert cached(handler, ids) == {
+        "product_plans": [False, True],
+        "option_plans": [True, False],
+        "configurators": [True, True],
+    }
+    assert handler.version == 2
+
+
+def test_variation_changes_drop_configurator_trees(warm_caches):
+    handler, ids = warm_caches
+    handler.apply({"table": "variation_option", "op": "UPDATE", "new": {"id": ids["options"][1], "variation_group_id": ids["group"]}, "old": None})
+    handler.apply({"table": "product_material", "op": "DELETE", "new": None, "old": {"id": 1, "product_id": ids["products"][0]}})
+
+    assert cached(handler, ids) == {
+        "product_plans": [False, True],
+        "option_plans": [True, False],
+        "configurators": [True, False],
+    }
+
+
+def test_unknown_tables_are_ignored(warm_caches):
+    handler, ids = warm_caches
+    handler.apply({"table": "quote", "op": "UPDATE", "new": {"id": 1}, "old": {"id": 1}})
+    assert handler.version == 0
+    assert all(all(flags) for flags in cached(handler, ids).values())
+
+
+def test_notify_payload_keeps_only_key_columns():
+    assert "key = 'id' OR key LIKE '%\\_id'" in NOTIFY_FUNCTION_SQL
+    assert "pg_notify('catalog_changes'" in NOTIFY_FUNCTION_SQL
+
+
+def test_catalog_version_is_only_exposed_while_live(warm_caches):
+    handler, ids = warm_caches
+    assert handler.catalog_version is None
+
+    handler.live = True
+    before = handler.catalog_version
+    handler.apply({"table": "product_product_category_link", "op": "INSERT", "new": {"id": 1, "product_id": ids["products"][0]}, "old": None})
+    after_change = handler.catalog_version
+    handler.clear()
+
+    assert len({before, after_change, handler.catalog_version}) == 3
+    assert handler.catalog_version.split(":")[0] != before.split(":")[0]
@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.services.db_pool import (
+    TimedQueuePool, create_pooled_async_engine, create_pooled_engine, engine_pool_metrics, pool_status, pool_wait_stats,
+    replica_pool_wait_stats,
+)
+
+
+@pytest.fixture
+def small_engine(tmp_path):
+    engine = create_pooled_engine(f"sqlite:///{tmp_path / 'pool.db'}", pool_size=1, max_overflow=0, pool_timeout=0.05)
+    pool_wait_stats.reset()
+    yield engine
+    engine.dispose()
+    pool_wait_stats.reset()
+
+
+def test_pool_status_reports_occupancy_and_timeouts(small_engine):
+    assert isinstance(small_engine.pool, TimedQueuePool)
+    with small_engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        busy = pool_status(small_engine.pool)
+        with pytest.raises(PoolTimeoutError):
+            small_engine.connect()
+    idle = pool_status(small_engine.pool)
+
+    assert (busy["pool_size"], busy["max_overflow"], busy["checked_out"]) == (1, 0, 1)
+    assert (idle["checked_out"], idle["checked_in"]) == (0, 1)
+    assert idle["wait"]["checkouts"] == 1
+    assert idle["wait"]["timeouts"] == 1
+    assert idle["wait"]["max_wait_ms"] >= 50
+
+
+def test_replica_pools_are_reported_only_when_configured(small_engine, tmp_path):
+    pytest.importorskip("aiosqlite")
+    async_engine = create_pooled_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}", pool_size=1, max_overflow=0)
+    replica_engine = create_pooled_engine(
+        f"sqlite:///{tmp_path / 'replica.db'}", pool_size=2, max_overflow=0, wait_stats=replica_pool_wait_stats,
+    )
+    async_replica_engine = create_pooled_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}", pool_size=3, max_overflow=0,
+    )
+    try:
+        assert set(engine_pool_metrics(small_engine, async_engine, small_engine, async_engine)) == {"sync", "async"}
+
+        with replica_engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            metrics = engine_pool_metrics(small_engine, async_engine, replica_engine, async_replica_engine)
+        assert set(metrics) == {"sync", "async", "replica", "async_replica"}
+        assert (metrics["replica"]["pool_size"], metrics["replica"]["checked_out"]) == (2, 1)
+        assert metrics["replica"]["wait"] == replica_pool_wait_stats.snapshot()
+        assert metrics["async_replica"]["pool_size"] == 3
+    finally:
+        replica_engine.dispose()
+        replica_pool_wait_stats.reset()
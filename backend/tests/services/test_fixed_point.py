@@ -0,0 +1,100 @@
+import random
+import pytest
+from decimal import Decimal
+
+from app.models import (
+    Material,
+    UnitType,
+    Quote,
+    QuoteConfig,
+    QuoteProductEntry,
+    QuoteProductEntryVariation,
+    Product,
+    ProductMaterial,
+    VariationOption,
+    VariationOptionMaterial,
+)
+from app.services.fixed_point import FixedSum, round_half_up, to_scaled
+from app.services.quote_calculator import QuoteCalculator
+
+
+def random_decimal(rng: random.Random, places: int, high: int, allow_negative: bool = False) -> Decimal:
+    value = Decimal(rng.randint(0, high * 10 ** places)).scaleb(-places)
+    return -value if allow_negative and rng.random() < 0.3 else value
+
+
+def random_quote(rng: random.Random, round_up_materials: bool) -> Quote:
+    unit_types = [UnitType(id=1, name="ft", category="length"), UnitType(id=2, name="each", category="count")]
+    materials = [
+        Material(
+            id=index, name=f"Material {index}",
+            cost_per_supplier_unit=random_decimal(rng, 2, 300),
+            # Quantities like 3 or 7 give 28-digit repeating unit costs
+            quantity_in_supplier_unit=Decimal(rng.choice(["1", "3", "7", "8", "12.5", "0"])),
+            unit_type=rng.choice(unit_types),
+            cull_rate=rng.choice([None, 0.05, 0.1, 0.125]),
+        )
+        for index in range(1, 9)
+    ]
+    entries = []
+    for entry_id in range(1, rng.randint(1, 12) + 1):
+        product = Product(
+            id=entry_id, name=f"Product {entry_id}", unit_labor_cost=random_decimal(rng, 2, 40),
+            product_materials=[
+                ProductMaterial(id=entry_id * 10 + i, material=material, material_amount=random_decimal(rng, rng.choice([0, 2, 3]), 20))
+                for i, material in enumerate(rng.sample(materials, rng.randint(0, 4)))
+            ],
+        )
+        option = VariationOption(
+            id=entry_id, name=f"Option {entry_id}", additional_labor_cost_per_product_unit=random_decimal(rng, 2, 5),
+            variation_option_materials=[
+                VariationOptionMaterial(
+                    id=entry_id * 10 + i, material=material,
+                    quantity_of_material_base_units_added=random_decimal(rng, 3, 4, allow_negative=True),
+                )
+                for i, material in enumerate(rng.sample(materials, rng.randint(0, 3)))
+            ],
+        )
+        selected = [QuoteProductEntryVariation(id=entry_id, variation_option=option)] if rng.random() < 0.6 else []
+        entries.append(QuoteProductEntry(
+            id=entry_id, product=product, quantity_of_product_units=random_decimal(rng, 2, 60),
+            selected_variations=selected,
+        ))
+    config = QuoteConfig(
+        id=1, sales_commission_rate=Decimal("0.05"), franchise_fee_rate=Decimal("0.02"),
+        margin_rate=Decimal("0.35"), additional_fixed_fees=Decimal("150"), tax_rate=Decimal("0.0825"),
+        round_up_materials=round_up_materials,
+    )
+    return Quote(id=1, quote_config=config, product_entries=entries)
+
+
+@pytest.mark.parametrize("round_up_materials", [True, False])
+def test_fixed_point_matches_decimal(round_up_materials: bool):
+    rng = random.Random(20261017)
+    for _ in range(60):
+        quote = random_quote(rng, round_up_materials)
+        decimal_result = QuoteCalculator()._compute_calculated_quote(quote)
+        fixed_result = QuoteCalculator()._compute_calculated_quote(quote, fixed_point=True)
+        assert fixed_result.model_dump(mode="json", exclude={"calculated_at"}) == \
+            decimal_result.model_dump(mode="json", exclude={"calculated_at"})
+
+
+@pytest.mark.parametrize(
+    "value, places",
+    [("1.23445", 4), ("1.23455", 4), ("-1.23445", 4), ("-0.00004", 4), ("2.5", 0), ("-2.5", 0), ("17", 2)],
+)
+def test_round_half_up_matches_quantize(value: str, places: int):
+    quantum = Decimal(1).scaleb(-places)
+    expected = Decimal(value).quantize(quantum, rounding="ROUND_HALF_UP")
+    coefficient, negative = round_half_up(*to_scaled(Decimal(value)), -places)
+    result = Decimal(coefficient).scaleb(-places)
+    if negative and coefficient == 0:
+        result = result.copy_negate()
+    assert str(result) == str(expected)
+
+
+def test_fixed_sum_keeps_decimal_exponent():
+    total = FixedSum()
+    for value in ("1.5", "0.25", "-1.75"):
+        total.add(*to_scaled(Decimal(value)))
+    assert str(total.to_decimal()) == str(Decimal(0) + Decimal("1.5") + Decimal("0.25") + Decimal("-1.75"))
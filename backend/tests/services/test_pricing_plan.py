@@ -0,0 +1,163 @@
+import pytest
+from decimal import Decimal
+from unittest.mock import MagicMock
+from sqlalchemy import event
+from sqlmodel import Session, select
+
+from app.models import (
+    Material,
+    UnitType,
+    Quote,
+    QuoteConfig,
+    QuoteProductEntry,
+    QuoteProductEntryVariation,
+    Product,
+    ProductMaterial,
+    VariationOption,
+    VariationOptionMaterial,
+)
+from app.services.pricing_plan import (
+    PricingPlanCache,
+    compile_option_plan,
+    compile_product_plan,
+)
+from app.services.quote_calculator import QuoteCalculator, final_quantize_decimal
+
+
+@pytest.fixture
+def catalog(D_fixture):
+    D = D_fixture
+    unit_type = UnitType(id=1, name="each", category="count")
+    board = Material(
+        id=1, name="Board", cost_per_supplier_unit=D("12"), quantity_in_supplier_unit=D("4"),
+        unit_type=unit_type, cull_rate=0.1,
+    )
+    screw = Material(
+        id=2, name="Screw", cost_per_supplier_unit=D("0.10"), quantity_in_supplier_unit=D("1"),
+        unit_type=unit_type,
+    )
+    product = Product(
+        id=1, name="Panel", unit_labor_cost=D("5"),
+        product_materials=[
+            ProductMaterial(id=1, product_id=1, material_id=1, material=board, material_amount=D("2")),
+            ProductMaterial(id=2, product_id=1, material_id=2, material=screw, material_amount=D("10")),
+        ],
+    )
+    option = VariationOption(
+        id=7, name="Double Sided", additional_labor_cost_per_product_unit=D("1.50"),
+        variation_option_materials=[
+            VariationOptionMaterial(id=1, variation_option_id=7, material_id=1, material=board, quantity_of_material_base_units_added=D("1")),
+        ],
+    )
+    return product, option
+
+
+def make_quote(product, option, quantity):
+    entry = QuoteProductEntry(
+        id=1, quote_id=1, product_id=product.id, product=product,
+        quantity_of_product_units=quantity,
+        selected_variations=[
+            QuoteProductEntryVariation(id=1, quote_product_entry_id=1, variation_option_id=option.id, variation_option=option)
+        ],
+    )
+    config = QuoteConfig(
+        id=1, sales_commission_rate=Decimal("0"), franchise_fee_rate=Decimal("0"),
+        margin_rate=Decimal("0"), additional_fixed_fees=Decimal("0"), tax_rate=Decimal("0"),
+    )
+    return Quote(id=1, quote_config_id=1, quote_config=config, product_entries=[entry])
+
+
+def test_compile_product_plan_flattens_materials(catalog, D_fixture):
+    product, _ = catalog
+    plan = compile_product_plan(product)
+
+    assert plan.product_id == 1
+    assert plan.unit_labor_cost == D_fixture("5")
+    assert [line.material_id for line in plan.lines] == [1, 2]
+    board_line = plan.lines[0]
+    assert board_line.unit_cost == D_fixture("3")
+    assert board_line.cull_rate == D_fixture("0.1")
+    assert board_line.unit_name == "each"
+    assert plan.lines[1].cull_rate is None
+
+
+def test_compile_option_plan_missing_unit_type_raises(D_fixture):
+    material = Material(id=3, name="Loose", cost_per_supplier_unit=D_fixture("1"), quantity_in_supplier_unit=D_fixture("1"))
+    option = VariationOption(
+        id=9, name="Broken",
+        variation_option_materials=[VariationOptionMaterial(id=5, material=material, quantity_of_material_base_units_added=D_fixture("1"))],
+    )
+    with pytest.raises(ValueError, match="VariationOptionMaterial id 5"):
+        compile_option_plan(option)
+
+
+def test_shared_cache_reuses_plans_across_calculations(catalog, mock_session: MagicMock, D_fixture):
+    product, option = catalog
+    cache = PricingPlanCache()
+
+    mock_session.get.return_value = make_quote(product, option, D_fixture("2"))
+    first = QuoteCalculator(plan_cache=cache).calculate_and_save_quote(quote_id=1, session=mock_session)
+
+    # A cached plan must be used even though the ORM graph no longer matches it
+    product.product_materials = []
+    option.variation_option_materials = []
+    mock_session.get.return_value = make_quote(product, option, D_fixture("2"))
+    second = QuoteCalculator(plan_cache=cache).calculate_and_save_quote(quote_id=1, session=mock_session)
+
+    # Board: 2*2 + 10% cull + 1*2 + 10% cull = 6.6 -> 7 @ 3; Screw: 20 @ 0.10
+    assert final_quantize_decimal(first.total_material_cost) == D_fixture("23.00")
+    assert final_quantize_decimal(first.total_labor_cost) == D_fixture("13.00")
+    assert second.total_material_cost == first.total_material_cost
+    assert second.bill_of_materials_json == first.bill_of_materials_json
+
+
+def test_cache_invalidation_and_expiry(catalog):
+    product, option = catalog
+    cache = PricingPlanCache()
+    cache.put_product_plan(compile_product_plan(product))
+    cache.put_option_plan(compile_option_plan(option))
+
+    cache.invalidate_product(1)
+    assert cache.get_product_plan(1) is None
+    assert cache.get_option_plan(7) is not None
+
+    expired = PricingPlanCache(ttl_seconds=-1)
+    expired.put_option_plan(compile_option_plan(option))
+    assert expired.get_option_plan(7) is None
+
+
+def test_plans_put_with_a_stale_generation_are_dropped(catalog):
+    product, option = catalog
+    cache = PricingPlanCache()
+    generation = cache.generation
+    cache.invalidate_option(99)
+
+    cache.put_product_plan(compile_product_plan(product), generation=generation)
+    assert cache.get_product_plan(1) is None
+    cache.put_product_plan(compile_product_plan(product), generation=cache.generation)
+    assert cache.get_product_plan(1) is not None
+
+
+@pytest.mark.filterwarnings("ignore::sqlalchemy.exc.SAWarning")
+def test_plans_invalidated_between_load_and_put_are_not_cached(sqlite_engine, seed_quote):
+    with Session(sqlite_engine) as session:
+        quote_id = seed_quote(session, 1)
+        product_id = session.exec(select(QuoteProductEntry.product_id).where(QuoteProductEntry.quote_id == quote_id)).one()
+
+    cache = PricingPlanCache(ttl_seconds=None) # As while the catalog listener is connected
+
+    def invalidate_during_load(conn, cursor, statement, parameters, context, executemany):
+        if "FROM product " in statement:
+            cache.invalidate_product(product_id)
+
+    event.listen(sqlite_engine, "after_cursor_execute", invalidate_during_load)
+    try:
+        with Session(sqlite_engine) as session:
+            QuoteCalculator(plan_cache=cache).calculate_quote_preview(quote_id, session)
+    finally:
+        event.remove(sqlite_engine, "after_cursor_execute", invalidate_during_load)
+    assert cache.get_product_plan(product_id) is None
+
+    with Session(sqlite_engine) as session:
+        QuoteCalculator(plan_cache=cache).calculate_quote_preview(quote_id, session)
+    assert cache.get_product_plan(product_id) is not None
@@ -0,0 +1,92 @@
+import pytest
+from sqlalchemy import event
+from sqlmodel import Session, select
+
+from app.models import QuoteProductEntry
+from app.services.product_configurator import ProductConfigurator, ProductConfiguratorCache
+from app.services.quote_process import QuoteProcessService
+
+pytestmark = pytest.mark.filterwarnings("ignore::sqlalchemy.exc.SAWarning")
+
+
+def tree(product_id: int) -> ProductConfigurator:
+    return ProductConfigurator(product_id=product_id, product_name=f"Product {product_id}", product_unit="each", groups=())
+
+
+def test_cache_evicts_least_recently_used_and_counts_lookups():
+    cache = ProductConfiguratorCache(max_products=2)
+    cache.put(tree(1))
+    cache.put(tree(2))
+    assert cache.get(1) is not None
+    cache.put(tree(3))
+
+    assert cache.get(2) is None
+    assert cache.get(1).product_id == 1
+    cache.invalidate(1)
+    assert cache.get(1) is None
+    assert cache.stats() == {"size": 1, "max_size": 2, "hits": 2, "misses": 2}
+
+
+def test_expired_trees_are_reloaded():
+    cache = ProductConfiguratorCache(ttl_seconds=0)
+    cache.put(tree(1))
+    assert cache.get(1) is None
+
+
+def test_materialization_reuses_cached_trees(sqlite_engine, statement_log, seed_quote):
+    with Session(sqlite_engine) as session:
+        quote_id = seed_quote(session, 3)
+
+    cache = ProductConfiguratorCache()
+    product_queries = []
+    for _ in range(2):
+        with Session(sqlite_engine) as session:
+            statement_log.clear()
+            full_quote = QuoteProcessService(session=session, configurator_cache=cache).get_full_quote(quote_id)
+            product_queries.append(sum(1 for s in statement_log if "FROM product " in s or "FROM variation_group" in s))
+
+    assert product_queries[0] > 0 and product_queries[1] == 0
+    assert cache.stats()["hits"] == 3 and cache.stats()["misses"] == 3
+    assert all(option.is_selected for entry in full_quote.product_entries for group in entry.variation_groups for option in group.options)
+
+
+
+def test_single_entry_reads_its_tree_from_the_cache(sqlite_engine, statement_log, seed_quote):
+    with Session(sqlite_engine) as session:
+        quote_id = seed_quote(session, 1)
+        entry_id = session.exec(select(QuoteProductEntry.id).where(QuoteProductEntry.quote_id == quote_id)).one()
+
+    cache = ProductConfiguratorCache()
+    catalog_queries = []
+    for _ in range(2):
+        with Session(sqlite_engine) as session:
+            statement_log.clear()
+            entry = QuoteProcessService(session=session, configurator_cache=cache).get_quote_product_entry(entry_id)
+            catalog_queries.append(sum(1 for s in statement_log if "FROM product " in s or "FROM variation_group" in s))
+
+    assert catalog_queries[0] > 0 and catalog_queries[1] == 0
+    assert entry.id == entry_id and entry.variation_groups
+
+def test_trees_invalidated_while_loading_are_not_cached(sqlite_engine, seed_quote):
+    with Session(sqlite_engine) as session:
+        quote_id = seed_quote(session, 2)
+
+    cache = ProductConfiguratorCache()
+
+    def invalidate_during_load(conn, cursor, statement, parameters, context, executemany):
+        if "FROM product " in statement:
+            cache.invalidate(-1) # Any catalog change notification bumps the generation
+
+    event.listen(sqlite_engine, "after_cursor_execute", invalidate_during_load)
+    try:
+        with Session(sqlite_engine) as session:
+            full_quote = QuoteProcessService(session=session, configurator_cache=cache).get_full_quote(quote_id)
+    finally:
+        event.remove(sqlite_engine, "after_cursor_execute", invalidate_during_load)
+
+    assert len(full_quote.product_entries) == 2
+    assert cache.stats()["size"] == 0
+
+    with Session(sqlite_engine) as session:
+        QuoteProcessService(session=session, configurator_cache=cache).get_full_quote(quote_id)
+    assert cache.stats()["size"] == 2
@@ -0,0 +1,128 @@
+import pytest
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+from app.models import (
+    Material,
+    UnitType,
+    Quote,
+    QuoteConfig,
+    QuoteProductEntry,
+    QuoteProductEntryVariation,
+    Product,
+    ProductMaterial,
+    VariationOption,
+    VariationOptionMaterial,
+)
+from app.services import quote_calculator as quote_calculator_module
+from app.services.quote_aggregate import DecimalSum, QuoteAggregateCache
+from app.services.quote_calculator import QuoteCalculator
+
+
+@pytest.fixture
+def fence_catalog(D_fixture):
+    D = D_fixture
+    foot = UnitType(id=1, name="ft", category="length")
+    rail = Material(id=1, name="Rail", cost_per_supplier_unit=D("16"), quantity_in_supplier_unit=D("8"), unit_type=foot, cull_rate=0.05)
+    post = Material(id=2, name="Post", cost_per_supplier_unit=D("24.50"), quantity_in_supplier_unit=D("1"), unit_type=foot)
+    cap = Material(id=3, name="Cap", cost_per_supplier_unit=D("3.25"), quantity_in_supplier_unit=D("1"), unit_type=foot)
+    section = Product(
+        id=1, name="Section", unit_labor_cost=D("12.75"),
+        product_materials=[
+            ProductMaterial(id=1, product_id=1, material_id=1, material=rail, material_amount=D("2.5")),
+            ProductMaterial(id=2, product_id=1, material_id=2, material=post, material_amount=D("0.125")),
+        ],
+    )
+    capped = VariationOption(
+        id=5, name="Capped", additional_labor_cost_per_product_unit=D("0.40"),
+        variation_option_materials=[
+            VariationOptionMaterial(id=1, variation_option_id=5, material_id=3, material=cap, quantity_of_material_base_units_added=D("0.125")),
+            VariationOptionMaterial(id=2, variation_option_id=5, material_id=1, material=rail, quantity_of_material_base_units_added=D("-0.5")),
+        ],
+    )
+    return section, capped
+
+
+def make_quote(section, capped, quantities, capped_entry_ids=()):
+    entries = []
+    for entry_id, quantity in quantities.items():
+        selected = []
+        if entry_id in capped_entry_ids:
+            selected.append(QuoteProductEntryVariation(
+                id=entry_id, quote_product_entry_id=entry_id, variation_option_id=capped.id, variation_option=capped,
+            ))
+        entries.append(QuoteProductEntry(
+            id=entry_id, quote_id=1, product_id=section.id, product=section,
+            quantity_of_product_units=quantity, selected_variations=selected,
+        ))
+    config = QuoteConfig(
+        id=1, sales_commission_rate=Decimal("0.05"), franchise_fee_rate=Decimal("0"),
+        margin_rate=Decimal("0.3"), additional_fixed_fees=Decimal("0"), tax_rate=Decimal("0.0825"),
+    )
+    return Quote(id=1, quote_config_id=1, quote_config=config, product_entries=entries)
+
+
+def calculate(calculator, mock_session, quote):
+    mock_session.get.return_value = quote
+    return calculator.calculate_and_save_quote(quote_id=1, session=mock_session)
+
+
+def test_incremental_edits_match_full_recalculation(fence_catalog, mock_session: MagicMock, D_fixture):
+    section, capped = fence_catalog
+    D = D_fixture
+    calculator = QuoteCalculator()
+    quantities = {entry_id: D("8") for entry_id in range(1, 11)}
+    calculate(calculator, mock_session, make_quote(section, capped, quantities, capped_entry_ids={2, 3}))
+
+    edits = [
+        ({**quantities, 4: D("6.333")}, {2, 3}),   # quantity change
+        ({**quantities, 4: D("6.333")}, {3}),      # option removed
+        ({k: v for k, v in quantities.items() if k != 7}, {3, 9}),  # entry removed, option added
+        ({**quantities, 11: D("0.5")}, {11}),      # entry added
+    ]
+    for edited_quantities, capped_ids in edits:
+        incremental = calculate(calculator, mock_session, make_quote(section, capped, edited_quantities, capped_ids))
+        full = calculate(QuoteCalculator(), mock_session, make_quote(section, capped, edited_quantities, capped_ids))
+        assert incremental.model_dump(exclude={"calculated_at"}) == full.model_dump(exclude={"calculated_at"})
+
+
+def test_unchanged_entries_reuse_their_contribution(fence_catalog, mock_session: MagicMock, D_fixture):
+    section, capped = fence_catalog
+    calculator = QuoteCalculator()
+    quantities = {entry_id: D_fixture("4") for entry_id in range(1, 6)}
+    calculate(calculator, mock_session, make_quote(section, capped, quantities))
+
+    with patch.object(
+        quote_calculator_module, "build_entry_contribution", wraps=quote_calculator_module.build_entry_contribution
+    ) as build:
+        calculate(calculator, mock_session, make_quote(section, capped, {**quantities, 2: D_fixture("5")}))
+    assert build.call_count == 1
+
+
+def test_decimal_sum_keeps_full_calculation_exponent():
+    total = DecimalSum()
+    total.add(Decimal("1.50"))
+    total.add(Decimal("0.0001"))
+    total.remove(Decimal("0.0001"))
+    assert str(total.value()) == str(Decimal(0) + Decimal("1.50"))
+
+
+def test_unchanged_recalculation_reuses_the_bom_order(fence_catalog, mock_session: MagicMock, D_fixture):
+    section, capped = fence_catalog
+    aggregate_cache = QuoteAggregateCache()
+    calculator = QuoteCalculator(aggregate_cache=aggregate_cache)
+    quantities = {entry_id: D_fixture("4") for entry_id in range(1, 6)}
+    calculate(calculator, mock_session, make_quote(section, capped, quantities, capped_entry_ids={3}))
+    state = aggregate_cache.take(1)
+    bom_order = state.bom_order
+    aggregate_cache.put(1, state)
+
+    calculate(calculator, mock_session, make_quote(section, capped, quantities, capped_entry_ids={3}))
+    state = aggregate_cache.take(1)
+    assert state.bom_order is bom_order
+    aggregate_cache.put(1, state)
+
+    # Dropping the only capped entry removes the cap line from the re-derived order
+    calculate(calculator, mock_session, make_quote(section, capped, {k: v for k, v in quantities.items() if k != 3}))
+    state = aggregate_cache.take(1)
+    assert [bom_key for bom_key, _ in state.bom_order] == [(1, "ft"), (2, "ft")]
@@ -15,6 +15,7 @@ from app.models import (
     VariationOption,
     VariationOptionMaterial,
     CalculatedQuote,
+    QuoteStatus,
     BillOfMaterialEntry, 
     AppliedRateInfoEntry, 
 )
@@ -289,6 +290,60 @@ def test_calculate_and_save_quote_error_margin_rate_too_high(
     with pytest.raises(ValueError, match="Margin rate cannot be 100% or more."):
         quote_calculator_service.calculate_and_save_quote(quote_id=1, session=mock_session)
 
+def test_calculate_quote_preview_does_not_write(
+    quote_calculator_service: QuoteCalculator, mock_session: MagicMock, D_fixture
+):
+    D = D_fixture
+    mock_product = Product(id=1, name="Prod", unit_labor_cost=D("10"), product_materials=[])
+    mock_entry = QuoteProductEntry(id=1, product_id=1, product=mock_product, quantity_of_product_units=D("2"), selected_variations=[])
+    mock_config = QuoteConfig(
+        id=1, sales_commission_rate=D("0"), franchise_fee_rate=D("0"),
+        margin_rate=D("0"), additional_fixed_fees=D("0"), tax_rate=D("0"),
+    )
+    mock_quote = Quote(id=1, status="draft", quote_config=mock_config, product_entries=[mock_entry])
+    mock_session.get.return_value = mock_quote
+
+    preview = quote_calculator_service.calculate_quote_preview(quote_id=1, session=mock_session)
+
+    assert not isinstance(preview, CalculatedQuote)
+    assert preview.quote_id == 1
+    assert final_quantize_decimal(preview.final_price) == final_quantize_decimal(D("20"))
+    assert mock_quote.status == "draft"
+    mock_session.add.assert_not_called()
+    mock_session.commit.assert_not_called()
+    mock_session.refresh.assert_not_called()
+
+def test_calculate_and_save_quote_returns_stored_result_for_unchanged_inputs(
+    quote_calculator_service: QuoteCalculator, mock_session: MagicMock, D_fixture
+):
+    D = D_fixture
+    mock_product = Product(id=1, name="Prod", unit_labor_cost=D("10"), product_materials=[])
+    mock_entry = QuoteProductEntry(id=1, product_id=1, product=mock_product, quantity_of_product_units=D("2"), selected_variations=[])
+    mock_config = QuoteConfig(
+        id=1, sales_commission_rate=D("0"), franchise_fee_rate=D("0"),
+        margin_rate=D("0"), additional_fixed_fees=D("0"), tax_rate=D("0"),
+    )
+    mock_quote = Quote(id=1, status=QuoteStatus.CALCULATED, quote_config=mock_config, product_entries=[mock_entry])
+    mock_session.get.return_value = mock_quote
+    stored = CalculatedQuote(
+        id=5, quote_id=1, total_material_cost=D("0"), total_labor_cost=D("20"), cost_of_goods_sold=D("20"),
+        subtotal_before_tax=D("20"), tax_amount=D("0"), final_price=D("20"),
+        input_fingerprint=quote_calculator_service.fingerprint_inputs(mock_quote),
+    )
+    mock_session.exec.side_effect = None
+    mock_session.exec.return_value.first.return_value = stored
+
+    assert quote_calculator_service.calculate_and_save_quote(quote_id=1, session=mock_session) is stored
+    mock_session.commit.assert_not_called()
+
+    mock_entry.quantity_of_product_units = D("3")
+    changed = quote_calculator_service.calculate_and_save_quote(quote_id=1, session=mock_session)
+    assert final_quantize_decimal(changed.final_price) == final_quantize_decimal(D("30"))
+    mock_session.commit.assert_called_once()
+
+    quote_calculator_service.calculate_and_save_quote(quote_id=1, session=mock_session, force=True)
+    assert mock_session.commit.call_count == 2
+
 # TODO: Add more tests:
 # - Test with multiple product entries
 # - Test with multiple variations per product entry
@@ -0,0 +1,58 @@
+import pytest
+from sqlmodel import Session, select
+
+from app.models import CalculatedQuote, Quote, QuoteProductEntry, QuoteProductEntryVariation, QuoteStatus
+from app.services.quote_process import QuoteProcessService
+
+pytestmark = pytest.mark.filterwarnings("ignore::sqlalchemy.exc.SAWarning")
+
+
+def selections(session: Session, quote_id: int):
+    return session.exec(
+        select(QuoteProductEntry.product_id, QuoteProductEntry.quantity_of_product_units, QuoteProductEntryVariation.variation_option_id)
+        .join(QuoteProductEntryVariation, QuoteProductEntryVariation.quote_product_entry_id == QuoteProductEntry.id)
+        .where(QuoteProductEntry.quote_id == quote_id)
+        .order_by(QuoteProductEntry.id)
+    ).all()
+
+
+def test_clone_copies_entries_and_selections_in_constant_statements(sqlite_engine, statement_log, seed_quote):
+    with Session(sqlite_engine) as session:
+        small_id = seed_quote(session, 2, prefix="small-")
+        large_id = seed_quote(session, 30, prefix="large-")
+
+    statement_counts = {}
+    clone_ids = {}
+    for quote_id in (small_id, large_id):
+        with Session(sqlite_engine) as session:
+            statement_log.clear()
+            clone = QuoteProcessService(session=session).clone_quote(quote_id)
+            statement_counts[quote_id] = len([s for s in statement_log if s.lstrip().upper().startswith("INSERT")])
+            clone_ids[quote_id] = clone.id
+            assert clone.name.startswith("Copy of Quote with")
+            assert clone.status == QuoteStatus.DRAFT
+
+    assert statement_counts[small_id] == statement_counts[large_id] == 3
+    with Session(sqlite_engine) as session:
+        assert selections(session, clone_ids[large_id]) == selections(session, large_id)
+        assert len(selections(session, clone_ids[large_id])) == 30
+
+
+def test_clone_optionally_copies_the_calculation(sqlite_engine, seed_quote):
+    with Session(sqlite_engine) as session:
+        quote_id = seed_quote(session, 2)
+        service = QuoteProcessService(session=session)
+        original = service.calculate_quote(quote_id)
+        original_price = original.final_price
+
+        clone = service.clone_quote(quote_id, name="Template", include_calculation=True)
+        copied = session.exec(select(CalculatedQuote).where(CalculatedQuote.quote_id == clone.id)).one()
+        without = service.clone_quote(quote_id)
+
+        assert clone.name == "Template"
+        assert clone.status == QuoteStatus.CALCULATED
+        assert copied.final_price == original_price
+        assert copied.bill_of_materials_json == original.bill_of_materials_json
+        assert copied.input_fingerprint is None
+        assert service.get_calculated_quote(without.id) is None
+        assert service.calculate_quote(clone.id).final_price == original_price
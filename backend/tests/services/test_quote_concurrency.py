@@ -0,0 +1,90 @@
+import pytest
+from decimal import Decimal
+from fastapi import HTTPException
+from sqlmodel import Session, select
+
+from app.models import CalculatedQuote, Quote
+from app.services.quote_calculator import upsert_calculated_quotes
+from app.services.quote_process import QuoteProcessService
+
+pytestmark = pytest.mark.filterwarnings("ignore::sqlalchemy.exc.SAWarning")
+
+
+def test_edits_bump_the_quote_version_and_if_match_is_checked(sqlite_engine, seed_quote):
+    with Session(sqlite_engine) as session:
+        quote_id = seed_quote(session, 1)
+        service = QuoteProcessService(session=session)
+        entry_id = session.get(Quote, quote_id).product_entries[0].id
+        assert session.get(Quote, quote_id).version == 1
+
+        service.check_entry_quote_version(entry_id, 1)
+        service.update_quote_product_entry(entry_id, quantity=Decimal("5"))
+        assert service.get_full_quote(quote_id).version == 2
+
+        with pytest.raises(HTTPException) as excinfo:
+            service.check_quote_version(quote_id, 1)
+        service.check_quote_version(quote_id, None)
+
+    assert excinfo.value.status_code == 412
+
+
+
+def test_bulk_if_match_is_checked_against_every_affected_quote(sqlite_engine, seed_quote):
+    with Session(sqlite_engine) as session:
+        quote_ids = [seed_quote(session, 1, prefix=prefix) for prefix in ("a-", "b-")]
+        entry_ids = [session.get(Quote, quote_id).product_entries[0].id for quote_id in quote_ids]
+        QuoteProcessService(session=session).update_quote_product_entry(entry_ids[1], quantity=Decimal("5"))
+
+    with Session(sqlite_engine) as session:
+        service = QuoteProcessService(session=session)
+        service.check_entries_quote_version(entry_ids[:1], 1)
+        service.check_entries_quote_version(entry_ids, None)
+        with pytest.raises(HTTPException) as stale:
+            service.check_entries_quote_version(entry_ids, 1)
+        with pytest.raises(HTTPException) as missing:
+            service.check_entries_quote_version([entry_ids[0], 999], 1)
+
+    assert stale.value.status_code == 412
+    assert str(quote_ids[1]) in stale.value.detail
+    assert missing.value.status_code == 404
+
+def test_concurrent_edit_of_the_same_quote_is_rejected(sqlite_engine, seed_quote):
+    with Session(sqlite_engine) as session:
+        quote_id = seed_quote(session, 1)
+        entry_id = session.get(Quote, quote_id).product_entries[0].id
+
+    with Session(sqlite_engine) as first, Session(sqlite_engine) as second:
+        first_service, second_service = QuoteProcessService(session=first), QuoteProcessService(session=second)
+        first_service.check_quote_version(quote_id, 1)
+        second_service.check_quote_version(quote_id, 1)
+
+        first_service.update_quote_product_entry(entry_id, quantity=Decimal("5"))
+        with pytest.raises(HTTPException) as excinfo:
+            second_service.update_quote_product_entry(entry_id, quantity=Decimal("9"))
+
+    assert excinfo.value.status_code == 409
+    with Session(sqlite_engine) as session:
+        quote = session.get(Quote, quote_id)
+        assert quote.version == 2
+        assert quote.product_entries[0].quantity_of_product_units == Decimal("5")
+
+
+def test_calculation_results_are_upserted_atomically(sqlite_engine, seed_quote):
+    with Session(sqlite_engine) as session:
+        quote_id = seed_quote(session, 2)
+        calculated = QuoteProcessService(session=session).calculate_quote(quote_id)
+        assert calculated.version == 1
+        result = CalculatedQuote.model_validate(calculated)
+
+    # A writer that did not see the existing row updates it instead of failing on quote_id
+    with Session(sqlite_engine) as session:
+        result.final_price = Decimal("1.00")
+        upsert_calculated_quotes([result], session)
+        session.commit()
+        rows = session.exec(select(CalculatedQuote).where(CalculatedQuote.quote_id == quote_id)).all()
+
+    assert [(row.final_price, row.version) for row in rows] == [(Decimal("1.00"), 2)]
+    with Session(sqlite_engine) as session:
+        recalculated = QuoteProcessService(session=session).calculate_quote(quote_id, force=True)
+        assert recalculated.version == 3
+        assert recalculated.final_price == calculated.final_price
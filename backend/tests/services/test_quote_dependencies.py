@@ -0,0 +1,47 @@
+import pytest
+from sqlmodel import Session, select
+
+from app.models import Material, Quote, QuoteStatus
+from app.services.quote_process import QuoteProcessService
+
+pytestmark = pytest.mark.filterwarnings("ignore::sqlalchemy.exc.SAWarning")
+
+
+@pytest.fixture
+def catalog_quotes(sqlite_engine, seed_quote):
+    """Two calculated quotes and a draft one, each with its own products and materials."""
+    with Session(sqlite_engine) as session:
+        quote_ids = [seed_quote(session, 2, prefix=prefix) for prefix in ("a-", "b-", "c-")]
+        for quote_id in quote_ids[:2]:
+            session.get(Quote, quote_id).status = QuoteStatus.CALCULATED
+        session.commit()
+    return quote_ids
+
+
+def material_id(session: Session, name: str) -> int:
+    return session.exec(select(Material.id).where(Material.name == name)).one()
+
+
+def test_stale_quotes_follow_product_and_option_materials(sqlite_engine, catalog_quotes):
+    calculated_a, calculated_b, draft_c = catalog_quotes
+    with Session(sqlite_engine) as session:
+        service = QuoteProcessService(session=session)
+
+        base = service.get_stale_quotes(material_ids=[material_id(session, "a-Material 1")])
+        option = service.get_stale_quotes(material_ids=[material_id(session, "b-Extra Material 0")])
+        draft = service.get_stale_quotes(material_ids=[material_id(session, "c-Material 0")])
+        combined = service.get_stale_quotes(
+            material_ids=[material_id(session, "a-Material 0")],
+            product_ids=[session.get(Quote, calculated_b).product_entries[0].product_id],
+        )
+
+    assert [q.id for q in base] == [calculated_a]
+    assert [q.id for q in option] == [calculated_b]
+    assert draft == []
+    assert [q.id for q in combined] == [calculated_a, calculated_b]
+
+
+def test_stale_quotes_require_a_catalog_change(sqlite_engine):
+    with Session(sqlite_engine) as session:
+        with pytest.raises(ValueError, match="At least one"):
+            QuoteProcessService(session=session).get_stale_quotes()
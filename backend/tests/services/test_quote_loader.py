@@ -0,0 +1,46 @@
+import pytest
+from sqlmodel import Session
+
+from app.services.pricing_plan import PricingPlanCache
+from app.services.quote_calculator import QuoteCalculator
+
+pytestmark = pytest.mark.filterwarnings("ignore::sqlalchemy.exc.SAWarning")
+
+
+def count_calculation_selects(engine, statement_log, seed_quote, entry_count: int, plan_cache: PricingPlanCache):
+    with Session(engine) as session:
+        quote_id = seed_quote(session, entry_count, prefix=f"{entry_count}-")
+    with Session(engine) as session:
+        statement_log.clear()
+        calculated = QuoteCalculator(plan_cache=plan_cache).calculate_and_save_quote(quote_id, session)
+        selects = [s for s in statement_log if s.lstrip().upper().startswith("SELECT")]
+    return calculated, len(selects)
+
+
+def test_calculation_query_count_is_constant_as_entries_grow(sqlite_engine, statement_log, seed_quote):
+    small, small_selects = count_calculation_selects(sqlite_engine, statement_log, seed_quote, 2, PricingPlanCache())
+    large, large_selects = count_calculation_selects(sqlite_engine, statement_log, seed_quote, 12, PricingPlanCache())
+
+    assert len(small.bill_of_materials_json) == 4
+    assert len(large.bill_of_materials_json) == 24
+    assert small_selects == large_selects
+
+
+def test_warm_plan_cache_skips_catalog_queries(sqlite_engine, statement_log, seed_quote):
+    plan_cache = PricingPlanCache()
+    with Session(sqlite_engine) as session:
+        quote_id = seed_quote(session, 3)
+
+    with Session(sqlite_engine) as session:
+        statement_log.clear()
+        cold = QuoteCalculator(plan_cache=plan_cache).calculate_and_save_quote(quote_id, session)
+        cold_selects = sum(1 for s in statement_log if s.lstrip().upper().startswith("SELECT"))
+
+    with Session(sqlite_engine) as session:
+        statement_log.clear()
+        warm = QuoteCalculator(plan_cache=plan_cache).calculate_and_save_quote(quote_id, session)
+        catalog_selects = [s for s in statement_log if "FROM material" in s or "FROM product " in s]
+
+    assert catalog_selects == []
+    assert sum(1 for s in statement_log if s.lstrip().upper().startswith("SELECT")) < cold_selects
+    assert warm.final_price == cold.final_price
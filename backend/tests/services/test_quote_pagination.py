@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlmodel import Session
+
+from app.models import Quote, QuoteConfig, QuoteType
+from app.services.quote_pagination import decode_quote_cursor, encode_quote_cursor
+from app.services.quote_process import QuoteProcessService
+
+
+@pytest.fixture
+def quotes(sqlite_engine):
+    """25 quotes where groups of three share an updated_at, so ties are broken by id."""
+    start = datetime(2026, 1, 1, 12, 0, 0, 123456, tzinfo=timezone.utc)
+    with Session(sqlite_engine) as session:
+        config = QuoteConfig(name="Pagination Config")
+        session.add(config)
+        session.flush()
+        for index in range(25):
+            session.add(Quote(
+                name=f"Quote {index}", quote_config_id=config.id,
+                quote_type=QuoteType.FENCE_PROJECT if index % 2 else QuoteType.DECK_PROJECT,
+                updated_at=start + timedelta(minutes=index // 3),
+            ))
+        session.commit()
+    return sqlite_engine
+
+
+def test_cursor_pages_match_offset_listing(quotes):
+    with Session(quotes) as session:
+        service = QuoteProcessService(session=session)
+        expected = [q.id for q in service.get_quotes(limit=100)]
+
+        seen, cursor = [], None
+        while True:
+            page = service.get_quotes_page(cursor=cursor, limit=4)
+            seen.extend(q.id for q in page.items)
+            if page.next_cursor is None:
+                break
+            cursor = page.next_cursor
+
+        fence = service.get_quotes_page(quote_type=QuoteType.FENCE_PROJECT, limit=100)
+
+    assert seen == expected
+    assert len(seen) == 25
+    assert all(q.quote_type == QuoteType.FENCE_PROJECT for q in fence.items) and len(fence.items) == 12
+    assert fence.next_cursor is None
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    quote = Quote(id=42, updated_at=datetime(2026, 3, 4, 5, 6, 7, 890, tzinfo=timezone.utc))
+    assert decode_quote_cursor(encode_quote_cursor(quote)) == (quote.updated_at, 42)
+    with pytest.raises(ValueError, match="Invalid quote cursor"):
+        decode_quote_cursor("not-a-cursor")
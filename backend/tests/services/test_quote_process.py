@@ -1,6 +1,7 @@
 import pytest 
 from unittest.mock import MagicMock, call, patch
 from decimal import Decimal
+from typing import List
 from datetime import datetime, timezone
 from fastapi import HTTPException
 
@@ -8,7 +9,7 @@ from app.models import (
     Quote, QuoteConfig, QuoteType, Product, ProductCategory, 
     QuoteProductEntry, ProductRole, VariationGroup, VariationOption, 
     CalculatedQuote, QuoteProductEntryVariation, ProductProductCategoryLink,
-    UnitType, VariationSelectionType
+    UnitType, VariationSelectionType, QuoteStatus
 )
 from app.services.quote_process import (
     QuoteProcessService, QuotePreview, CategoryPreview, ProductPreview, 
@@ -273,13 +274,10 @@ class TestQuoteProcessService:
             return MagicMock() 
         mock_session.get.side_effect = get_side_effect
         
-        mock_main_check_exec = MagicMock()
-        mock_main_check_exec.first.return_value = None
+        mock_materialize_products_exec = MagicMock()
+        mock_materialize_products_exec.all.return_value = [mock_product]
         
-        mock_materialize_vg_exec = MagicMock()
-        mock_materialize_vg_exec.all.return_value = []
-        
-        mock_session.exec.side_effect = [mock_main_check_exec, mock_materialize_vg_exec]
+        mock_session.exec.side_effect = [mock_materialize_products_exec]
 
         original_refresh_side_effect = mock_session.refresh.side_effect
         def refresh_side_effect(obj_to_refresh):
@@ -331,22 +329,11 @@ class TestQuoteProcessService:
         mock_get_entries_exec = MagicMock()
         mock_get_entries_exec.all.return_value = [mock_entry_1, mock_entry_2]
         
-        mock_materialize_vg_entry1_exec = MagicMock()
-        mock_materialize_vg_entry1_exec.all.return_value = []
-        mock_materialize_vg_entry2_exec = MagicMock()
-        mock_materialize_vg_entry2_exec.all.return_value = []
+        # All products of the page are loaded by a single materialization query
+        mock_materialize_products_exec = MagicMock()
+        mock_materialize_products_exec.all.return_value = [mock_product_1, mock_product_2]
 
-        mock_session.exec.side_effect = [mock_get_entries_exec, mock_materialize_vg_entry1_exec, mock_materialize_vg_entry2_exec]
-        
-        original_get_side_effect = mock_session.get.side_effect
-
-        def get_side_effect(model, pk):
-            if model == Product and pk == 101: return mock_product_1
-            if model == Product and pk == 102: return mock_product_2
-            if model == UnitType and pk == 1: return mock_product_1.product_unit_type
-            if original_get_side_effect: return original_get_side_effect(model, pk)
-            return MagicMock()
-        mock_session.get.side_effect = get_side_effect
+        mock_session.exec.side_effect = [mock_get_entries_exec, mock_materialize_products_exec]
 
         results = quote_process_service.get_quote_product_entries(quote_id)
 
@@ -354,6 +341,8 @@ class TestQuoteProcessService:
         assert results[0].id == mock_entry_1.id
         assert results[1].product_name == mock_product_2.name
         assert "ROLE = " not in str(mock_session.exec.call_args_list[0][0][0]).upper()
+        assert mock_session.exec.call_count == 2
+        mock_session.get.assert_not_called()
 
     def test_get_quote_product_entries_with_role_filter(self, quote_process_service: QuoteProcessService, mock_session: MagicMock, D_fixture):
         D = D_fixture
@@ -363,17 +352,9 @@ class TestQuoteProcessService:
         
         mock_get_entries_exec = MagicMock()
         mock_get_entries_exec.all.return_value = [mock_main_entry]
-        mock_materialize_vg_exec = MagicMock()
-        mock_materialize_vg_exec.all.return_value = []
-        mock_session.exec.side_effect = [mock_get_entries_exec, mock_materialize_vg_exec]
-
-        original_get_side_effect = mock_session.get.side_effect
-        def get_side_effect(model, pk):
-            if model == Product and pk == 101: return mock_product_1
-            if model == UnitType and pk == 1: return mock_product_1.product_unit_type
-            if original_get_side_effect: return original_get_side_effect(model, pk)
-            return MagicMock()
-        mock_session.get.side_effect = get_side_effect
+        mock_materialize_products_exec = MagicMock()
+        mock_materialize_products_exec.all.return_value = [mock_product_1]
+        mock_session.exec.side_effect = [mock_get_entries_exec, mock_materialize_products_exec]
 
         results = quote_process_service.get_quote_product_entries(quote_id, role=ProductRole.MAIN)
 
@@ -462,7 +443,7 @@ class TestQuoteProcessService:
         mock_entry_fetch_exec = MagicMock()
         mock_entry_fetch_exec.first.return_value = entry
         mock_materialize_vg_exec = MagicMock()
-        mock_materialize_vg_exec.all.return_value = product.variation_groups
+        mock_materialize_vg_exec.all.return_value = [product]
         
         mock_session.exec.side_effect = [mock_entry_fetch_exec, mock_materialize_vg_exec]
 
@@ -496,7 +477,7 @@ class TestQuoteProcessService:
         mock_exec_existing_selection = MagicMock()
         mock_exec_existing_selection.all.return_value = [] 
         mock_exec_materialize_groups = MagicMock()
-        mock_exec_materialize_groups.all.return_value = product.variation_groups
+        mock_exec_materialize_groups.all.return_value = [product]
         
         mock_exec_refresh_entry = MagicMock()
         mock_exec_refresh_entry.one.return_value = entry
@@ -530,7 +511,7 @@ class TestQuoteProcessService:
         mock_exec_for_refresh.one.return_value = entry
 
         mock_exec_materialize_groups = MagicMock()
-        mock_exec_materialize_groups.all.return_value = product.variation_groups
+        mock_exec_materialize_groups.all.return_value = [product]
 
         mock_session.exec.side_effect = [mock_exec_existing_selection, mock_exec_materialize_groups]
 
@@ -556,7 +537,7 @@ class TestQuoteProcessService:
         mock_exec_specific_selection = MagicMock()
         mock_exec_specific_selection.first.return_value = initial_selection_gps
         mock_exec_materialize_groups = MagicMock()
-        mock_exec_materialize_groups.all.return_value = product.variation_groups
+        mock_exec_materialize_groups.all.return_value = [product]
         
         mock_exec_refresh_entry = MagicMock()
         mock_exec_refresh_entry.one.return_value = entry
@@ -586,7 +567,7 @@ class TestQuoteProcessService:
         mock_exec_specific_selection = MagicMock()
         mock_exec_specific_selection.first.return_value = None
         mock_exec_materialize_groups = MagicMock()
-        mock_exec_materialize_groups.all.return_value = product.variation_groups
+        mock_exec_materialize_groups.all.return_value = [product]
         
         mock_exec_refresh_entry = MagicMock()
         mock_exec_refresh_entry.one.return_value = entry
@@ -803,7 +784,7 @@ class TestFinalizedQuoteProtection:
         mock_session.refresh = MagicMock(side_effect=lambda entry: setattr(entry, 'id', 999))
         mock_session.exec = MagicMock()
         mock_exec_result = MagicMock()
-        mock_exec_result.all.return_value = []
+        mock_exec_result.all.return_value = [mock_product]
         mock_session.exec.return_value = mock_exec_result
         
         # This should not raise an exception
@@ -813,3 +794,169 @@ class TestFinalizedQuoteProtection:
         mock_session.get.assert_any_call(Quote, quote_id)
         mock_session.add.assert_called_once()
         mock_session.commit.assert_called_once()
+
+
+@pytest.mark.filterwarnings("ignore::sqlalchemy.exc.SAWarning")
+def test_full_quote_materializes_entries_in_constant_queries(sqlite_engine, statement_log, seed_quote):
+    from sqlmodel import Session
+
+    with Session(sqlite_engine) as session:
+        small_quote_id = seed_quote(session, 2, prefix="small-")
+        large_quote_id = seed_quote(session, 40, prefix="large-")
+
+    query_counts = {}
+    for quote_id in (small_quote_id, large_quote_id):
+        with Session(sqlite_engine) as session:
+            statement_log.clear()
+            full_quote = QuoteProcessService(session=session).get_full_quote(quote_id)
+            query_counts[quote_id] = len(statement_log)
+
+    assert query_counts[small_quote_id] == query_counts[large_quote_id]
+    assert len(full_quote.product_entries) == 40
+    selected = [
+        option.name for entry in full_quote.product_entries
+        for group in entry.variation_groups for option in group.options if option.is_selected
+    ]
+    assert len(selected) == 40
+
+
+@pytest.mark.filterwarnings("ignore::sqlalchemy.exc.SAWarning")
+def test_entry_changes_bump_quote_updated_at(sqlite_engine, seed_quote):
+    from sqlmodel import Session
+
+    with Session(sqlite_engine) as session:
+        quote_id = seed_quote(session, 1)
+        service = QuoteProcessService(session=session)
+        before = service.get_quote_updated_at(quote_id)
+        entry_id = session.get(Quote, quote_id).product_entries[0].id
+        service.update_quote_product_entry(entry_id, quantity=Decimal("7"))
+        after = service.get_quote_updated_at(quote_id)
+
+        with pytest.raises(HTTPException) as excinfo:
+            service.get_quote_updated_at(9999)
+
+    assert after > before
+    assert excinfo.value.status_code == 404
+
+
+@pytest.mark.filterwarnings("ignore::sqlalchemy.exc.SAWarning")
+def test_set_variations_diffs_selections_in_one_commit(sqlite_engine, seed_quote):
+    from sqlmodel import Session, select
+
+    with Session(sqlite_engine) as session:
+        quote_id = seed_quote(session, 2)
+        first, second = sorted(session.get(Quote, quote_id).product_entries, key=lambda e: e.id)
+        fancy = first.selected_variations[0].variation_option_id
+        group_id = session.get(VariationOption, fancy).variation_group_id
+        size_group = VariationGroup(name="Size", product_id=first.product_id, selection_type=VariationSelectionType.MULTI_SELECT)
+        session.add(size_group)
+        session.flush()
+        small, large = VariationOption(name="Small", variation_group_id=size_group.id), VariationOption(name="Large", variation_group_id=size_group.id)
+        plain = VariationOption(name="Plain", variation_group_id=group_id)
+        session.add_all([small, large, plain])
+        session.commit()
+        first_id, second_id = first.id, second.id
+        option_ids = {"small": small.id, "large": large.id, "plain": plain.id}
+
+    with Session(sqlite_engine) as session:
+        service = QuoteProcessService(session=session)
+        with patch.object(session, "commit", wraps=session.commit) as commit:
+            entries = service.set_quote_product_variations({
+                first_id: [option_ids["plain"], option_ids["small"], option_ids["large"]],
+                second_id: [],
+            })
+        stored = session.exec(
+            select(QuoteProductEntryVariation.quote_product_entry_id, QuoteProductEntryVariation.variation_option_id)
+        ).all()
+
+    assert commit.call_count == 1
+    assert sorted(stored) == sorted([(first_id, option_ids[name]) for name in ("plain", "small", "large")])
+    assert [entry.id for entry in entries] == [first_id, second_id]
+    selected = {option.name for group in entries[0].variation_groups for option in group.options if option.is_selected}
+    assert selected == {"Plain", "Small", "Large"}
+    assert not any(option.is_selected for group in entries[1].variation_groups for option in group.options)
+
+
+@pytest.mark.filterwarnings("ignore::sqlalchemy.exc.SAWarning")
+def test_set_variations_rejects_invalid_sets_without_writing(sqlite_engine, seed_quote):
+    from sqlmodel import Session
+
+    with Session(sqlite_engine) as session:
+        quote_id = seed_quote(session, 2)
+        first, second = sorted(session.get(Quote, quote_id).product_entries, key=lambda e: e.id)
+        fancy = first.selected_variations[0].variation_option_id
+        other_product_option = second.selected_variations[0].variation_option_id
+        plain = VariationOption(name="Plain", variation_group_id=session.get(VariationOption, fancy).variation_group_id)
+        session.add(plain)
+        session.commit()
+        first_id, plain_id = first.id, plain.id
+
+    with Session(sqlite_engine) as session:
+        service = QuoteProcessService(session=session)
+        with pytest.raises(ValueError, match="allows a single option"):
+            service.set_quote_product_variations({first_id: [fancy, plain_id]})
+        with pytest.raises(ValueError, match="does not belong"):
+            service.set_quote_product_variations({first_id: [other_product_option]})
+        with pytest.raises(ValueError, match="not found"):
+            service.set_quote_product_variations({9999: []})
+        selected = [sel.variation_option_id for sel in session.get(QuoteProductEntry, first_id).selected_variations]
+
+    assert selected == [fancy]
+
+
+@pytest.mark.filterwarnings("ignore::sqlalchemy.exc.SAWarning")
+def test_apply_quote_operations_commits_once_and_calculates(sqlite_engine, seed_quote):
+    from sqlmodel import Session
+    from pydantic import TypeAdapter
+    from app.services.quote_process import QuoteOperation
+
+    with Session(sqlite_engine) as session:
+        quote_id = seed_quote(session, 2)
+        first, second = sorted(session.get(Quote, quote_id).product_entries, key=lambda e: e.id)
+        first_id, second_id, product_id = first.id, second.id, second.product_id
+        option_id = second.selected_variations[0].variation_option_id
+
+    operations = TypeAdapter(List[QuoteOperation]).validate_python([
+        {"op": "add_entry", "product_id": product_id, "quantity": "2"},
+        {"op": "set_variations", "entry_ref": 0, "variation_option_ids": [option_id]},
+        {"op": "update_entry", "product_entry_id": first_id, "quantity": "6", "notes": "corner"},
+        {"op": "delete_entry", "product_entry_id": second_id},
+        {"op": "set_ui_state", "ui_state": "step-3"},
+    ])
+    with Session(sqlite_engine) as session:
+        service = QuoteProcessService(session=session)
+        with patch.object(session, "commit", wraps=session.commit) as commit:
+            full_quote = service.apply_quote_operations(quote_id, operations, calculate=True)
+        calculated = service.get_calculated_quote(quote_id)
+        ui_state = session.get(Quote, quote_id).ui_state
+
+    assert commit.call_count == 1
+    assert full_quote.status == QuoteStatus.CALCULATED
+    assert ui_state == "step-3"
+    assert [(e.quantity_of_product_units, e.notes) for e in full_quote.product_entries] == [(Decimal("6"), "corner"), (Decimal("2"), None)]
+    added = full_quote.product_entries[1]
+    assert [o.id for g in added.variation_groups for o in g.options if o.is_selected] == [option_id]
+    assert calculated is not None
+
+
+@pytest.mark.filterwarnings("ignore::sqlalchemy.exc.SAWarning")
+def test_apply_quote_operations_rolls_back_on_failure(sqlite_engine, seed_quote):
+    from sqlmodel import Session
+    from pydantic import TypeAdapter
+    from app.services.quote_process import QuoteOperation
+
+    with Session(sqlite_engine) as session:
+        quote_id = seed_quote(session, 1)
+        other_quote_id = seed_quote(session, 1, prefix="other-")
+        entry_id = session.get(Quote, quote_id).product_entries[0].id
+        foreign_entry_id = session.get(Quote, other_quote_id).product_entries[0].id
+
+    operations = TypeAdapter(List[QuoteOperation]).validate_python([
+        {"op": "update_entry", "product_entry_id": entry_id, "quantity": "9"},
+        {"op": "delete_entry", "product_entry_id": foreign_entry_id},
+    ])
+    with Session(sqlite_engine) as session:
+        with pytest.raises(ValueError, match="Operation 1 \\(delete_entry\\)"):
+            QuoteProcessService(session=session).apply_quote_operations(quote_id, operations)
+        assert session.get(QuoteProductEntry, entry_id).quantity_of_product_units == Decimal("4")
+        assert session.get(QuoteProductEntry, foreign_entry_id) is not None
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from decimal import Decimal
+
+pytest.importorskip("greenlet")
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models import Quote
+from app.services.calc_timing import record_calc_timing
+from app.services.quote_calculator import QuoteCalculator
+from app.services.quote_process_async import AsyncQuoteProcessService
+
+pytestmark = pytest.mark.filterwarnings("ignore::sqlalchemy.exc.SAWarning")
+
+
+def test_async_facade_runs_the_service_on_the_async_session(tmp_path, seed_quote):
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'async.db'}")
+        async with engine.begin() as connection:
+            await connection.run_sync(SQLModel.metadata.create_all)
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            quote_id = await session.run_sync(lambda sync_session: seed_quote(sync_session, 2))
+            service = AsyncQuoteProcessService(session)
+            entry_id = (await service.get_full_quote(quote_id)).product_entries[0].id
+
+            await service.check_quote_version(quote_id, 1)
+            await service.update_quote_product_entry(entry_id, quantity=Decimal("6"))
+            full_quote = await service.get_full_quote(quote_id)
+            calculated = await service.calculate_quote(quote_id)
+        await engine.dispose()
+        return full_quote, calculated
+
+    full_quote, calculated = asyncio.run(scenario())
+    assert full_quote.version == 2
+    assert full_quote.product_entries[0].quantity_of_product_units == Decimal("6")
+    assert calculated.final_price > 0
+
+
+def test_cpu_bound_steps_run_off_the_event_loop(tmp_path, seed_quote, monkeypatch):
+    compute_threads = []
+    compute = QuoteCalculator._compute_calculated_quote
+
+    def slow_compute(self, quote, fixed_point=False):
+        compute_threads.append(threading.get_ident())
+        time.sleep(0.2)
+        return compute(self, quote, fixed_point)
+
+    monkeypatch.setattr(QuoteCalculator, "_compute_calculated_quote", slow_compute)
+
+    async def ticker(ticks, stop):
+        while not stop.is_set():
+            ticks.append(time.perf_counter())
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'async.db'}")
+        async with engine.begin() as connection:
+            await connection.run_sync(SQLModel.metadata.create_all)
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            quote_id = await session.run_sync(lambda sync_session: seed_quote(sync_session, 3))
+            service = AsyncQuoteProcessService(session)
+            ticks, stop = [], asyncio.Event()
+            ticking = asyncio.create_task(ticker(ticks, stop))
+            with record_calc_timing() as timing:
+                preview = await service.preview_quote(quote_id)
+                full_quote = await service.get_full_quote(quote_id)
+            stop.set()
+            await ticking
+        await engine.dispose()
+        return threading.get_ident(), ticks, timing, preview, full_quote
+
+    loop_thread, ticks, timing, preview, full_quote = asyncio.run(scenario())
+    assert compute_threads and loop_thread not in compute_threads
+    # The loop kept running other tasks while the calculation slept in its worker thread
+    assert len(ticks) >= 10
+    # Phases timed in the worker thread are recorded in the request's timing
+    assert {"load", "aggregate", "rates"} <= set(timing.durations)
+    assert preview.final_price > 0
+    assert len(full_quote.product_entries) == 3
@@ -0,0 +1,88 @@
+from decimal import Decimal
+
+import pytest
+from sqlmodel import Session, select
+
+from app.models import QuoteProductEntry
+from app.services.pricing_plan import PricingPlanCache
+from app.services.product_configurator import ProductConfiguratorCache
+from app.services.quote_calculator import QuoteCalculator
+from app.services.quote_process import QuoteProcessService
+from app.services.read_routing import ReadYourWritesTracker
+
+pytestmark = pytest.mark.filterwarnings("ignore::sqlalchemy.exc.SAWarning")
+
+
+def test_committed_writes_are_sticky_per_quote_and_entry(sqlite_engine, seed_quote):
+    tracker = ReadYourWritesTracker(sticky_seconds=60)
+    with Session(sqlite_engine) as session:
+        quote_id = seed_quote(session, 1)
+        other_quote_id = seed_quote(session, 1, prefix="other-")
+        entry_id = session.exec(select(QuoteProductEntry.id).where(QuoteProductEntry.quote_id == quote_id)).one()
+    assert not tracker.recently_written(quote_id=quote_id)
+
+    with Session(sqlite_engine) as session:
+        service = QuoteProcessService(session=tracker.watch(session))
+        service.update_quote_product_entry(entry_id, quantity=Decimal("6"))
+
+    assert tracker.recently_written(quote_id=quote_id)
+    assert tracker.recently_written(product_entry_id=entry_id)
+    assert not tracker.recently_written(quote_id=other_quote_id)
+
+
+def test_rolled_back_and_read_only_sessions_are_not_sticky(sqlite_engine, seed_quote):
+    tracker = ReadYourWritesTracker(sticky_seconds=60)
+    with Session(sqlite_engine) as session:
+        quote_id = seed_quote(session, 1)
+
+    with Session(sqlite_engine) as session:
+        service = QuoteProcessService(session=tracker.watch(session))
+        service.get_full_quote(quote_id)
+        quote = service.get_quote_by_id(quote_id)
+        quote.name = "Renamed"
+        session.flush()
+        session.rollback()
+
+    assert not tracker.recently_written(quote_id=quote_id)
+
+
+def test_stickiness_expires(sqlite_engine, seed_quote):
+    tracker = ReadYourWritesTracker(sticky_seconds=0)
+    with Session(sqlite_engine) as session:
+        quote_id = seed_quote(session, 1)
+
+    with Session(sqlite_engine) as session:
+        QuoteProcessService(session=tracker.watch(session)).set_quote_status(quote_id, "CALCULATED")
+
+    assert not tracker.recently_written(quote_id=quote_id)
+
+
+def test_replica_services_read_but_do_not_populate_shared_caches(sqlite_engine, seed_quote):
+    plan_cache = PricingPlanCache()
+    configurator_cache = ProductConfiguratorCache()
+    with Session(sqlite_engine) as session:
+        quote_id = seed_quote(session, 2)
+        product_ids = set(session.exec(select(QuoteProductEntry.product_id).where(QuoteProductEntry.quote_id == quote_id)).all())
+
+    with Session(sqlite_engine) as session:
+        service = QuoteProcessService(
+            session=session,
+            calculator=QuoteCalculator(plan_cache=plan_cache, populate_caches=False),
+            configurator_cache=configurator_cache,
+            populate_caches=False,
+        )
+        service.get_full_quote(quote_id)
+        service.preview_quote(quote_id)
+    assert all(plan_cache.get_product_plan(product_id) is None for product_id in product_ids)
+    assert configurator_cache.stats()["size"] == 0
+
+    with Session(sqlite_engine) as session:
+        service = QuoteProcessService(
+            session=session,
+            calculator=QuoteCalculator(plan_cache=plan_cache),
+            configurator_cache=configurator_cache,
+        )
+        service.get_full_quote(quote_id)
+        service.preview_quote(quote_id)
+    assert all(plan_cache.get_product_plan(product_id) is not None for product_id in product_ids)
+    assert configurator_cache.stats()["size"] == len(product_ids)
@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlmodel import Session
+
+from app.models import RepricingJob, RepricingJobStatus
+from app.services.repricing_jobs import RepricingJobRunner, RepricingQueueFull
+
+pytestmark = pytest.mark.filterwarnings("ignore::sqlalchemy.exc.SAWarning")
+
+
+def test_job_processes_quotes_in_chunks(sqlite_engine, seed_quote):
+    with Session(sqlite_engine) as session:
+        quote_ids = [seed_quote(session, count, prefix=f"{count}-") for count in (1, 2, 3)]
+
+    runner = RepricingJobRunner(sqlite_engine, chunk_size=2)
+    job = runner.enqueue(quote_ids + [9999])
+    runner.run_job(job.id)
+    again = runner.enqueue(quote_ids)
+    runner.run_job(again.id)
+
+    with Session(sqlite_engine) as session:
+        job = session.get(RepricingJob, job.id)
+        assert job.status == RepricingJobStatus.COMPLETED
+        assert (job.processed_count, job.calculated_count, job.unchanged_count) == (4, 3, 0)
+        assert job.failed_quotes == {"9999": "Quote with id 9999 not found"}
+        assert job.started_at is not None and job.finished_at is not None
+
+        again = session.get(RepricingJob, again.id)
+        assert (again.status, again.calculated_count, again.unchanged_count) == (RepricingJobStatus.COMPLETED, 0, 3)
+
+
+def test_enqueue_applies_backpressure(sqlite_engine):
+    runner = RepricingJobRunner(sqlite_engine, max_pending_jobs=1)
+    runner.enqueue([1])
+
+    with pytest.raises(RepricingQueueFull):
+        runner.enqueue([2])
+    with pytest.raises(ValueError, match="at least one quote id"):
+        runner.enqueue([])
+    assert len(runner.pending_job_ids) == 1
+
+
+def test_shutdown_leaves_unfinished_jobs_queued(sqlite_engine, seed_quote):
+    with Session(sqlite_engine) as session:
+        quote_id = seed_quote(session, 1)
+
+    runner = RepricingJobRunner(sqlite_engine)
+    job = runner.enqueue([quote_id])
+    runner.shutdown()
+    runner.run_job(job.id)
+
+    with Session(sqlite_engine) as session:
+        job = session.get(RepricingJob, job.id)
+        assert (job.status, job.processed_count, job.finished_at) == (RepricingJobStatus.QUEUED, 0, None)
+
+
+def test_jobs_are_claimed_by_one_runner_until_its_lease_expires(sqlite_engine, seed_quote):
+    with Session(sqlite_engine) as session:
+        quote_id = seed_quote(session, 1)
+
+    first = RepricingJobRunner(sqlite_engine, lease_seconds=60)
+    second = RepricingJobRunner(sqlite_engine, lease_seconds=60)
+    job_id = first.enqueue([quote_id]).id
+    assert first._claim(job_id)
+
+    # A live owner keeps the job: the second runner neither schedules nor runs it
+    assert second.resume_jobs() == []
+    assert not second._claim(job_id)
+    second.run_job(job_id)
+    with Session(sqlite_engine) as session:
+        job = session.get(RepricingJob, job_id)
+        assert (job.status, job.owner, job.processed_count) == (RepricingJobStatus.RUNNING, first.owner, 0)
+
+        job.heartbeat_at = datetime.now(timezone.utc) - timedelta(seconds=120)
+        session.add(job)
+        session.commit()
+
+    # Once the heartbeat is stale the job is taken over, and the old owner can no longer write
+    assert second.resume_jobs() == [job_id]
+    second.run_job(job_id)
+    with Session(sqlite_engine) as session:
+        assert not first._update_owned(session, job_id, processed_count=0)
+        job = session.get(RepricingJob, job_id)
+        assert (job.status, job.owner, job.processed_count) == (RepricingJobStatus.COMPLETED, second.owner, 1)
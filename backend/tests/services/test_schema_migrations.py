@@ -0,0 +1,103 @@
+from typing import List
+
+import pytest
+from sqlalchemy import Column, Integer, MetaData, String, Table, event, inspect, text
+from sqlalchemy.pool import StaticPool
+from sqlmodel import create_engine
+
+from app.services.schema_migrations import Migration, migrate_schema, stored_schema_version
+
+
+@pytest.fixture
+def empty_engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    yield engine
+    engine.dispose()
+
+
+def record_statements(engine) -> List[str]:
+    statements: List[str] = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+    return statements
+
+
+def widget_metadata(with_color: bool = False) -> MetaData:
+    metadata = MetaData()
+    columns = [Column("id", Integer, primary_key=True), Column("name", String(50))]
+    if with_color:
+        columns.append(Column("color", String(20)))
+    Table("widget", metadata, *columns)
+    return metadata
+
+
+def add_widget_color(connection) -> None:
+    if "color" not in {column["name"] for column in inspect(connection).get_columns("widget")}:
+        connection.execute(text("ALTER TABLE widget ADD COLUMN color VARCHAR(20)"))
+
+
+def test_fresh_database_is_created_once_and_then_skipped(empty_engine):
+    applied = []
+    migrations = [Migration(1, "Record", lambda connection: applied.append(1))]
+
+    assert migrate_schema(empty_engine, widget_metadata(), migrations) is True
+    # create_all builds the current schema, so a fresh database needs no migrations
+    assert applied == []
+    assert inspect(empty_engine).has_table("widget")
+    assert stored_schema_version(empty_engine)[0] == 1
+
+    statements = record_statements(empty_engine)
+    assert migrate_schema(empty_engine, widget_metadata(), migrations) is False
+    assert len(statements) == 1
+    assert "schema_version" in statements[0]
+
+
+def test_changed_models_apply_only_newer_migrations(empty_engine):
+    first = Migration(1, "Record", lambda connection: pytest.fail("migration 1 already applied"))
+    migrate_schema(empty_engine, widget_metadata(), [first])
+    with empty_engine.begin() as connection:
+        connection.execute(text("INSERT INTO widget (name) VALUES ('gear')"))
+
+    migrations = [first, Migration(2, "Add widget.color", add_widget_color)]
+    assert migrate_schema(empty_engine, widget_metadata(with_color=True), migrations) is True
+
+    assert "color" in {column["name"] for column in inspect(empty_engine).get_columns("widget")}
+    with empty_engine.connect() as connection:
+        assert connection.execute(text("SELECT name FROM widget")).scalar_one() == "gear"
+    assert stored_schema_version(empty_engine)[0] == 2
+    assert migrate_schema(empty_engine, widget_metadata(with_color=True), migrations) is False
+
+
+def test_older_build_leaves_a_newer_schema_alone(empty_engine):
+    migrations = [Migration(1, "Record", lambda connection: None), Migration(2, "Add widget.color", add_widget_color)]
+    migrate_schema(empty_engine, widget_metadata(with_color=True), migrations)
+    newer = stored_schema_version(empty_engine)
+
+    assert migrate_schema(empty_engine, widget_metadata(), migrations[:1]) is False
+    assert stored_schema_version(empty_engine) == newer
+    assert "color" in {column["name"] for column in inspect(empty_engine).get_columns("widget")}
+
+
+def test_unversioned_database_runs_every_migration(empty_engine):
+    widget_metadata().create_all(empty_engine)
+
+    migrations = [Migration(1, "Add widget.color", add_widget_color)]
+    assert migrate_schema(empty_engine, widget_metadata(with_color=True), migrations) is True
+    assert "color" in {column["name"] for column in inspect(empty_engine).get_columns("widget")}
+
+
+def test_failed_migration_leaves_version_unchanged(empty_engine):
+    migrate_schema(empty_engine, widget_metadata(), [])
+    before = stored_schema_version(empty_engine)
+
+    def broken(connection):
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        migrate_schema(empty_engine, widget_metadata(with_color=True), [Migration(1, "Broken", broken)])
+    assert stored_schema_version(empty_engine) == before
+
+
+def test_migration_versions_must_ascend(empty_engine):
+    noop = lambda connection: None
+    with pytest.raises(ValueError):
+        migrate_schema(empty_engine, widget_metadata(), [Migration(2, "b", noop), Migration(1, "a", noop)])
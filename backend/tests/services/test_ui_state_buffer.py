@@ -0,0 +1,123 @@
+import threading
+
+import pytest
+from sqlalchemy import event
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.models import Quote
+from app.services.quote_process import QuoteProcessService
+from app.services.ui_state_buffer import UiStateBuffer
+
+pytestmark = pytest.mark.filterwarnings("ignore::sqlalchemy.exc.SAWarning")
+
+
+def stored(sqlite_engine, quote_id: int) -> Quote:
+    with Session(sqlite_engine) as session:
+        quote = session.get(Quote, quote_id)
+        session.expunge(quote)
+        return quote
+
+
+def test_buffered_ui_state_is_coalesced_and_read_back(sqlite_engine, statement_log, seed_quote):
+    with Session(sqlite_engine) as session:
+        quote_ids = [seed_quote(session, 1, prefix=prefix) for prefix in ("a-", "b-")]
+    before = stored(sqlite_engine, quote_ids[0])
+    buffer = UiStateBuffer(sqlite_engine)
+
+    with Session(sqlite_engine) as session:
+        service = QuoteProcessService(session=session, ui_state_buffer=buffer)
+        statement_log.clear()
+        for ui_state in ("step-1", "step-2", "step-3"):
+            service.update_quote_ui_state(quote_ids[0], ui_state)
+        service.update_quote_ui_state(quote_ids[1], "review")
+        assert not any(s.lstrip().upper().startswith("UPDATE") for s in statement_log)
+        assert service.get_quote_by_id(quote_ids[0]).ui_state == "step-3"
+        assert not session.dirty
+
+    assert stored(sqlite_engine, quote_ids[0]).ui_state is None
+    statement_log.clear()
+    assert buffer.flush() == 2
+    assert len([s for s in statement_log if s.lstrip().upper().startswith("UPDATE")]) == 1
+    assert buffer.pending_count == 0
+
+    after = stored(sqlite_engine, quote_ids[0])
+    assert after.ui_state == "step-3"
+    assert after.updated_at == before.updated_at
+    assert stored(sqlite_engine, quote_ids[1]).ui_state == "review"
+
+
+def test_stop_writes_pending_values_and_direct_writes_supersede_them(sqlite_engine, seed_quote):
+    with Session(sqlite_engine) as session:
+        quote_id = seed_quote(session, 1)
+    buffer = UiStateBuffer(sqlite_engine, flush_seconds=60)
+    buffer.start()
+
+    with Session(sqlite_engine) as session:
+        QuoteProcessService(session=session, ui_state_buffer=buffer).update_quote_ui_state(quote_id, "buffered")
+    buffer.stop()
+    assert stored(sqlite_engine, quote_id).ui_state == "buffered"
+
+    with Session(sqlite_engine) as session:
+        buffered_service = QuoteProcessService(session=session, ui_state_buffer=buffer)
+        buffered_service.update_quote_ui_state(quote_id, "stale")
+        buffer.discard(quote_id)
+        QuoteProcessService(session=session).update_quote_ui_state(quote_id, "direct")
+    buffer.flush()
+    assert stored(sqlite_engine, quote_id).ui_state == "direct"
+
+
+def test_direct_write_during_an_in_flight_flush_is_not_overwritten(tmp_path, seed_quote):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ui_state.db'}", connect_args={"check_same_thread": False})
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        quote_id = seed_quote(session, 1)
+    buffer = UiStateBuffer(engine, flush_seconds=60)
+    with Session(engine) as session:
+        QuoteProcessService(session=session, ui_state_buffer=buffer).update_quote_ui_state(quote_id, "stale")
+
+    update_started, direct_written = threading.Event(), threading.Event()
+
+    def pause_flush(conn, cursor, statement, parameters, context, executemany):
+        if threading.current_thread() is flushing and statement.lstrip().upper().startswith("UPDATE"):
+            update_started.set()
+            direct_written.wait(5)
+
+    event.listen(engine, "before_cursor_execute", pause_flush)
+    flushing = threading.Thread(target=buffer.flush)
+    flushing.start()
+    try:
+        assert update_started.wait(5)
+        # The value was already taken by the flush, so discarding it cannot stop the write
+        buffer.discard(quote_id)
+        with Session(engine) as session:
+            QuoteProcessService(session=session).update_quote_ui_state(quote_id, "direct")
+    finally:
+        direct_written.set()
+        flushing.join()
+        event.remove(engine, "before_cursor_execute", pause_flush)
+
+    assert stored(engine, quote_id).ui_state == "direct"
+    engine.dispose()
+
+
+def test_newest_write_wins_whatever_order_buffers_flush_in(sqlite_engine, seed_quote):
+    with Session(sqlite_engine) as session:
+        quote_id = seed_quote(session, 1)
+    first_worker, second_worker = UiStateBuffer(sqlite_engine), UiStateBuffer(sqlite_engine)
+
+    first_worker.set(quote_id, "older")
+    second_worker.set(quote_id, "newer")
+    assert second_worker.flush() == 1
+    assert first_worker.flush() == 0 # Superseded, so dropped rather than written
+    assert stored(sqlite_engine, quote_id).ui_state == "newer"
+
+    # A direct write after buffering wins; a value buffered after a direct write replaces it
+    first_worker.set(quote_id, "buffered-before")
+    with Session(sqlite_engine) as session:
+        QuoteProcessService(session=session).update_quote_ui_state(quote_id, "direct")
+    first_worker.flush()
+    assert stored(sqlite_engine, quote_id).ui_state == "direct"
+
+    second_worker.set(quote_id, "buffered-after")
+    assert second_worker.flush() == 1
+    assert stored(sqlite_engine, quote_id).ui_state == "buffered-after"
@@ -0,0 +1,35 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.api import internal
+from app.services.db_pool import create_pooled_engine, replica_pool_wait_stats
+from main import app
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def test_db_pool_metrics_report_the_primary_pools(client):
+    response = client.get("/api/v1/internal/metrics/db-pool")
+
+    assert response.status_code == 200
+    assert set(response.json()) == {"sync", "async"}
+    assert response.json()["sync"]["pool_class"] == "TimedQueuePool"
+
+
+def test_db_pool_metrics_report_a_configured_replica(client, monkeypatch):
+    replica_engine = create_pooled_engine("sqlite://", pool_size=2, max_overflow=0, wait_stats=replica_pool_wait_stats)
+    monkeypatch.setattr(internal, "replica_engine", replica_engine)
+    monkeypatch.setattr(internal, "async_replica_engine", create_async_engine("sqlite+aiosqlite://"))
+    try:
+        response = client.get("/api/v1/internal/metrics/db-pool")
+    finally:
+        replica_engine.dispose()
+
+    assert response.status_code == 200
+    metrics = response.json()
+    assert set(metrics) == {"sync", "async", "replica", "async_replica"}
+    assert metrics["replica"]["pool_size"] == 2